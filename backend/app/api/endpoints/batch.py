@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import tempfile
+import uuid
+import zipfile
+import zlib
+from typing import List, Optional
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from backend.app.core.config import settings
+from backend.app.core.errors import AppError, PayloadTooLarge, StorageFull, ValidationError
+from backend.app.services.jobs.base import get_job_queue, Job, QUEUED, RUNNING, DONE, FAILED
+from backend.app.services.storage import StorageService
+from loguru import logger
+
+router = APIRouter()
+
+ZIP_SIGNATURE = b"PK\x03\x04"
+
+# Raised by ZipFile.open/read for one bad member: encrypted (RuntimeError), unsupported
+# compression method (NotImplementedError), bad CRC or truncated/corrupt data
+UNREADABLE_MEMBER = (RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error, EOFError)
+
+async def _save_zip_members(archive: UploadFile, saved: list, skipped: list):
+    """Saves every image inside a zip upload as its own job input."""
+    zf = await asyncio.to_thread(zipfile.ZipFile, archive.file)
+    try:
+        for member in zf.infolist():
+            name = member.filename
+            if member.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                continue
+            if member.file_size > settings.MAX_UPLOAD_MB * 1024 * 1024:
+                skipped.append({"filename": name, "reason": f"larger than {settings.MAX_UPLOAD_MB} MB"})
+                continue
+            if len(saved) >= settings.BATCH_MAX_FILES:
+                raise ValidationError(f"A batch may contain at most {settings.BATCH_MAX_FILES} images")
+
+            try:
+                member_file = await asyncio.to_thread(zf.open, member)
+            except UNREADABLE_MEMBER as e:
+                skipped.append({"filename": name, "reason": f"unreadable zip member: {e}"})
+                continue
+
+            async def read(size: int) -> bytes:
+                try:
+                    return await asyncio.to_thread(member_file.read, size)
+                except UNREADABLE_MEMBER as e:
+                    raise ValidationError(f"unreadable zip member: {e}")
+
+            try:
+                job_id, _, _ = await StorageService.save_stream(read)
+                saved.append((job_id, name))
+            except (ValidationError, PayloadTooLarge) as e:
+                # Not an image, bigger than its header claimed, or corrupt
+                skipped.append({"filename": name, "reason": e.message})
+            finally:
+                member_file.close()
+    finally:
+        zf.close()
+
+def _summary(batch_id: str, jobs: List[Job]) -> dict:
+    counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+    for job in jobs:
+        counts[job.state] = counts.get(job.state, 0) + 1
+    finished = counts[DONE] + counts[FAILED]
+
+    if finished < len(jobs):
+        status = "processing"
+    else:
+        status = "completed" if counts[FAILED] == 0 else "completed_with_errors"
+
+    return {
+        "batch_id": batch_id,
+        "status": status,
+        "total": len(jobs),
+        "finished": finished,
+        "progress": round(finished / len(jobs), 3),
+        "counts": counts,
+        "jobs": [
+            {"job_id": job.job_id, "filename": job.payload.get("filename"), "status": job.status}
+            for job in jobs
+        ],
+        "archive": f"{settings.API_V1_STR}/batch/{batch_id}/archive",
+    }
+
+def _build_archive(jobs: List[Job], path: str):
+    """diagram.mmd/diagram.png of every finished job, one folder per input image, plus a manifest."""
+    used, manifest = set(), []
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for job in jobs:
+            filename = job.payload.get("filename") or job.job_id
+            folder = os.path.splitext(os.path.basename(filename))[0] or job.job_id
+            if folder in used:
+                folder = f"{folder}_{job.job_id[:8]}"
+            used.add(folder)
+
+            job_dir = StorageService.get_job_dir(job.job_id)
+            StorageService.touch_job_dir(job_dir)
+            files = []
+            for output in ("diagram.mmd", "diagram.png"):
+                source = os.path.join(job_dir, output)
+                if os.path.exists(source):
+                    # PNGs are already compressed
+                    compression = zipfile.ZIP_STORED if output.endswith(".png") else zipfile.ZIP_DEFLATED
+                    zf.write(source, f"{folder}/{output}", compress_type=compression)
+                    files.append(f"{folder}/{output}")
+            manifest.append({"job_id": job.job_id, "filename": filename, "status": job.status, "files": files})
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+@router.post("/batch")
+async def create_batch(files: List[UploadFile] = File(...), parallelism: Optional[int] = Form(None)):
+    """
+    Upload many images (or zip archives of images) and queue them all.
+    At most `parallelism` of the batch run at once (capped by BATCH_PARALLELISM).
+    """
+    limit = settings.BATCH_PARALLELISM
+    if parallelism is None or parallelism <= 0:
+        parallelism = limit
+    elif limit > 0:
+        parallelism = min(parallelism, limit)
+
+    saved, skipped = [], []
+    try:
+        for file in files:
+            header = await file.read(len(ZIP_SIGNATURE))
+            await file.seek(0)
+            if header == ZIP_SIGNATURE:
+                await _save_zip_members(file, saved, skipped)
+                continue
+            if len(saved) >= settings.BATCH_MAX_FILES:
+                raise ValidationError(f"A batch may contain at most {settings.BATCH_MAX_FILES} images")
+            try:
+                job_id, _, _ = await StorageService.save_upload(file)
+                saved.append((job_id, file.filename))
+            except (ValidationError, PayloadTooLarge) as e:
+                skipped.append({"filename": file.filename, "reason": e.message})
+    except (AppError, zipfile.BadZipFile) as e:
+        for job_id, _ in saved:
+            StorageService.remove_job_dir(StorageService.get_job_dir(job_id))
+        if isinstance(e, zipfile.BadZipFile):
+            e = ValidationError(f"Invalid zip archive: {e}")
+        logger.error(f"Batch upload failed: {e.message}")
+        headers = {"Retry-After": str(e.retry_after)} if isinstance(e, StorageFull) else None
+        raise HTTPException(status_code=e.status_code, detail=e.message, headers=headers)
+    except Exception:
+        # Unexpected: still don't leave inputs behind that no job will ever own
+        for job_id, _ in saved:
+            StorageService.remove_job_dir(StorageService.get_job_dir(job_id))
+        raise
+
+    if not saved:
+        raise HTTPException(status_code=400, detail={"message": "No images found in the upload", "skipped": skipped})
+
+    batch_id = str(uuid.uuid4())
+    job_queue = get_job_queue()
+
+    def enqueue_all():
+        for job_id, filename in saved:
+            job_queue.enqueue(job_id, payload={"filename": filename, "parallelism": parallelism}, batch_id=batch_id)
+
+    await asyncio.to_thread(enqueue_all)
+    logger.info(f"Queued batch {batch_id} with {len(saved)} jobs (parallelism {parallelism or 'unlimited'})")
+
+    return {
+        "batch_id": batch_id,
+        "jobs": [{"job_id": job_id, "filename": filename} for job_id, filename in saved],
+        "skipped": skipped,
+        "parallelism": parallelism,
+        "next_step": f"{settings.API_V1_STR}/batch/{batch_id}",
+    }
+
+@router.get("/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """
+    Aggregate progress of a batch plus the status of each job.
+    """
+    jobs = await asyncio.to_thread(get_job_queue().list_batch, batch_id)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _summary(batch_id, jobs)
+
+@router.get("/batch/{batch_id}/archive")
+async def get_batch_archive(batch_id: str):
+    """
+    Download a zip of every result produced so far (see manifest.json inside for per-job status).
+    """
+    jobs = await asyncio.to_thread(get_job_queue().list_batch, batch_id)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    fd, path = tempfile.mkstemp(suffix=".zip")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(_build_archive, jobs, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return FileResponse(
+        path,
+        media_type="application/zip",
+        filename=f"batch_{batch_id}.zip",
+        background=BackgroundTask(os.remove, path),
+    )
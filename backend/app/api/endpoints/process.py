@@ -1,121 +1,192 @@
 
+import asyncio
+import json
 import os
-import glob
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import time
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from backend.app.core.config import settings
+from backend.app.services.delivery import version
 from backend.app.services.storage import StorageService
-from backend.app.services.preprocessing import ImagePreprocessor
-from backend.app.services.ocr import OCRService
-from backend.app.services.vision.stub import StubVisionProvider
-from backend.app.services.vision.prompts import FLOWCHART_PROMPT
-from backend.app.services.inference import InferenceEngine
-from backend.app.services.mermaid.generator import MermaidGenerator
-from backend.app.services.mermaid.renderer import MermaidRenderer
+from backend.app.services.jobs.base import get_job_queue, RUNNING, DONE
+from backend.app.services.jobs.events import JobEventWriter, get_event_hub, is_final_status
+from backend.app.services.pipeline.flowchart import build_flowchart_graph
 from loguru import logger
 
 router = APIRouter()
 
-# In-memory status store for MVP (use Redis/DB in prod)
-JOB_STATUS = {}
-
-async def run_pipeline(job_id: str):
+async def run_pipeline(job_id: str, debug: bool = False, worker_id: Optional[str] = None) -> str:
+    """
+    Runs every stage for a job and returns its final status.
+    Intermediate statuses are written to the shared job queue as the job progresses.
+    `debug` also writes the preprocessing intermediates to the job dir.
+    With `worker_id`, status updates are dropped once that worker no longer holds the job's lease.
+    """
     logger.info(f"Starting pipeline for job {job_id}")
-    JOB_STATUS[job_id] = "processing"
+    # Progress is written from a background task so SQLite never blocks the event loop
+    writer = JobEventWriter(get_job_queue(), job_id, worker_id)
     
     try:
         job_dir = StorageService.get_job_dir(job_id)
-        # Find input file
-        input_files = glob.glob(os.path.join(job_dir, "*.*"))
-        # Exclude generated outputs
-        common_outputs = ["diagram.mmd", "diagram.png", "diagram.svg"]
-        input_path = next((f for f in input_files if os.path.basename(f) not in common_outputs and not os.path.basename(f).startswith("debug_")), None)
-        
+        input_path = StorageService.find_input(job_dir)
         if not input_path:
             raise FileNotFoundError("Input file not found")
 
-        # 1. Preprocessing
-        logger.info(f"Step 1: Preprocessing {input_path}")
-        image = ImagePreprocessor.load_image(input_path)
-        processed_image = ImagePreprocessor.preprocess(image, debug_output_dir=job_dir)
-        
-        # 2. OCR (Optional dependency, might skip if vision is strong)
-        logger.info("Step 2: OCR Extraction")
-        ocr_service = OCRService() # Should be singleton in prod
-        ocr_results = ocr_service.extract_text(processed_image)
-        logger.info(f"OCR found {len(ocr_results)} text items")
-
-        # 3. Vision Analysis
-        logger.info(f"Step 3: Vision Analysis (Provider: {settings.VISION_PROVIDER})")
-        
-        vision_provider = None
-        if settings.VISION_PROVIDER == "openai":
-            from backend.app.services.vision.openai import OpenAIVisionProvider
-            vision_provider = OpenAIVisionProvider()
-        elif settings.VISION_PROVIDER == "gemini":
-            from backend.app.services.vision.gemini import GeminiVisionProvider
-            vision_provider = GeminiVisionProvider()
-        else:
-            from backend.app.services.vision.stub import StubVisionProvider
-            vision_provider = StubVisionProvider()
-
-        vision_data = await vision_provider.analyze(
-            image, 
-            FLOWCHART_PROMPT,
-            status_callback=lambda status: JOB_STATUS.update({job_id: status})
+        graph = build_flowchart_graph(
+            input_path,
+            job_dir,
+            status_callback=writer.set_status,
+            debug=debug,
+            # Diagram previews while the vision response streams in
+            event_callback=writer.add_event,
+        )
+        # Stage transitions are pushed to clients following /events/{job_id}
+        results, report = await graph.run(
+            listener=lambda stage, state, duration: writer.add_event(
+                "stage", {"stage": stage, "state": state, "duration": None if duration is None else round(duration, 3)}
+            )
         )
 
-        # 4. Structure Inference
-        logger.info("Step 4: Structure Inference")
-        inference_engine = InferenceEngine()
-        diagram = inference_engine.build_graph(vision_data, ocr_results)
-
-        # 5. Code Generation
-        logger.info("Step 5: Mermaid Code Generation")
-        mermaid_code = MermaidGenerator.generate_code(diagram)
-        
-        mermaid_path = os.path.join(job_dir, "diagram.mmd")
-        with open(mermaid_path, "w") as f:
-            f.write(mermaid_code)
-
-        # 6. Rendering
-        logger.info("Step 6: Rendering")
-        renderer = MermaidRenderer()
-        try:
-            png_path = await renderer.render(mermaid_code, output_format="png")
-            # Move result to job dir if not already there (renderer returns path)
-            final_png_path = os.path.join(job_dir, "diagram.png")
-            if png_path != final_png_path:
-                import shutil
-                shutil.move(png_path, final_png_path)
-        except Exception as e:
-            logger.warning(f"Rendering failed (likely missing CLI): {e}")
-            # Non-fatal if we just want the code
-            JOB_STATUS[job_id] = "completed_with_warnings" 
-            return
-
-        JOB_STATUS[job_id] = "completed"
+        # Per-stage timings and critical path, served from /results/{job_id}/timings
+        await asyncio.to_thread(StorageService.write_text, os.path.join(job_dir, "timings.json"), report.model_dump_json(indent=2))
+        logger.info(f"Job {job_id} critical path ({report.total_seconds:.2f}s): {report.breakdown()}")
+        writer.add_event("timings", report.model_dump())
+
+        if not results["render"]:
+            return "completed_with_warnings"
+
         logger.info(f"Job {job_id} completed successfully")
+        return "completed"
 
     except Exception as e:
         logger.error(f"Job {job_id} failed: {e}")
-        JOB_STATUS[job_id] = f"failed: {str(e)}"
+        return f"failed: {str(e)}"
+    finally:
+        # Everything reported must be stored before the worker completes the job
+        await writer.aclose()
 
 @router.post("/process/{job_id}")
-async def process_diagram(job_id: str, background_tasks: BackgroundTasks):
+async def process_diagram(job_id: str, debug: bool = False):
     """
-    Trigger the processing pipeline for a given job ID.
+    Queue the processing pipeline for a given job ID.
+    Any API or worker process sharing the job queue may pick it up.
+    `debug=true` keeps the preprocessing intermediates (step_*.png) in the job dir.
     """
-    if job_id in JOB_STATUS and JOB_STATUS[job_id] in ["processing", "completed"]:
-        return {"message": "Job already exists", "job_id": job_id, "status": JOB_STATUS[job_id]}
+    job_queue = get_job_queue()
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job and job.state in [RUNNING, DONE]:
+        return {"message": "Job already exists", "job_id": job_id, "status": job.status}
+
+    if not os.path.isdir(StorageService.get_job_dir(job_id)):
+        raise HTTPException(status_code=404, detail="Job not found. Upload an image first.")
+
+    job = await asyncio.to_thread(job_queue.enqueue, job_id, {"debug": True} if debug else None)
+    return {"message": "Processing started", "job_id": job_id, "status": job.status}
 
-    background_tasks.add_task(run_pipeline, job_id)
-    JOB_STATUS[job_id] = "queued"
-    return {"message": "Processing started", "job_id": job_id}
+def _status_payload(status: str, detail: dict) -> dict:
+    payload = {"status": status}
+    # Set while the job is held by the vision rate limiter
+    dispatch_at = detail.get("dispatch_at")
+    if dispatch_at and status.startswith("waiting_rate_limit"):
+        payload["dispatch_eta_seconds"] = round(max(0.0, dispatch_at - time.time()), 1)
+    return payload
+
+def _result_links(job_id: str) -> dict:
+    """
+    Result URLs carrying their content version (`?v=`), so browsers and CDNs may cache them
+    as immutable; a retry that rewrites a file gives it a new URL. Blocking (hashes files).
+    """
+    job_dir = StorageService.get_job_dir(job_id)
+    # The SVG is rendered on first request, so it is offered (and versioned) by the Mermaid code
+    outputs = {"mermaid": "diagram.mmd", "png": "diagram.png", "svg": "diagram.mmd", "timings": "timings.json"}
+    links = {}
+    for name, filename in outputs.items():
+        try:
+            links[name] = f"{settings.API_V1_STR}/results/{job_id}/{name}?v={version(os.path.join(job_dir, filename))}"
+        except FileNotFoundError:
+            pass
+    return links
+
+def _sse(event_type: str, data: dict, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event_type}\ndata: {json.dumps(data)}\n\n"
 
 @router.get("/status/{job_id}")
 async def get_status(job_id: str):
     """
     Get the status of a processing job.
     """
-    status = JOB_STATUS.get(job_id, "not_found")
-    return {"status": status, "job_id": job_id}
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if not job:
+        return {"status": "not_found", "job_id": job_id}
+
+    payload = {**_status_payload(job.status, job.detail), "job_id": job_id, "attempts": job.attempts}
+    if job.status.startswith("completed"):
+        payload["links"] = await asyncio.to_thread(_result_links, job_id)
+    return payload
+
+@router.get("/events/{job_id}")
+async def stream_events(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of a job's progress: "status" (including rate-limit
+    waits), "stage" (start/finish of each pipeline stage), "partial" (the diagram
+    read so far, as Mermaid code, while the vision response streams in) and
+    "timings" events, then a final "result" event with the result links, after
+    which the stream ends.
+    Reconnecting clients resume after the Last-Event-ID they received.
+    """
+    job_queue = get_job_queue()
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        last_id = int(request.headers.get("last-event-id") or 0)
+    except ValueError:
+        last_id = 0
+
+    async def stream():
+        nonlocal job, last_id
+        hub = get_event_hub()
+        inbox = await hub.subscribe(job_id)
+        try:
+            yield "retry: 2000\n\n"
+            # Anything stored before we subscribed, then live events from the hub
+            backlog = await asyncio.to_thread(job_queue.events, job_id, last_id)
+            final = is_final_status(job.status)
+            if last_id == 0 and (final or not backlog):
+                yield _sse("status", _status_payload(job.status, job.detail))
+            while not final:
+                for event in backlog:
+                    if event.id <= last_id:
+                        continue
+                    last_id = event.id
+                    data = _status_payload(event.data["status"], event.data) if event.type == "status" else event.data
+                    yield _sse(event.type, data, event.id)
+                    if event.type == "status" and is_final_status(event.data["status"]):
+                        final = True
+                if final:
+                    break
+                try:
+                    backlog = [await asyncio.wait_for(inbox.get(), timeout=settings.SSE_HEARTBEAT_SECONDS)]
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    # Safety net in case a final status was written without an event
+                    job = await asyncio.to_thread(job_queue.get, job_id)
+                    final = job is None or is_final_status(job.status)
+                    backlog = []
+
+            job = await asyncio.to_thread(job_queue.get, job_id)
+            status = job.status if job else "failed: job disappeared"
+            links = await asyncio.to_thread(_result_links, job_id)
+            yield _sse("result", {"status": status, "links": links})
+        finally:
+            hub.unsubscribe(job_id, inbox)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,32 +1,117 @@
-
+import asyncio
 import os
-from fastapi import APIRouter, HTTPException
+from typing import Dict, Union
+from fastapi import APIRouter, HTTPException, Request
+from loguru import logger
+from backend.app.core.errors import AppError
+from backend.app.core.executor import cpu_executor
+from backend.app.services.delivery import file_response, precompress, precompressed
+from backend.app.services.inference import Diagram
+from backend.app.services.mermaid.renderer import MermaidRenderer
+from backend.app.services.native.renderer import NativeRenderer
 from backend.app.services.storage import StorageService
 
 router = APIRouter()
 
+# SVG renders in progress per job dir, shared by concurrent requests
+_svg_renders: Dict[str, asyncio.Task] = {}
+
+def _available(job_dir: str, path: str) -> bool:
+    """Whether `path` exists; a hit marks the job as recently used (blocking)."""
+    if not os.path.exists(path):
+        return False
+    StorageService.touch_job_dir(job_dir)
+    return True
+
 @router.get("/results/{job_id}/png")
-async def get_png(job_id: str):
+async def get_png(job_id: str, request: Request):
     """
     Download the generated PNG flowchart.
     """
     job_dir = StorageService.get_job_dir(job_id)
     file_path = os.path.join(job_dir, "diagram.png")
-    if not os.path.exists(file_path):
+    if not await asyncio.to_thread(_available, job_dir, file_path):
         raise HTTPException(status_code=404, detail="Diagram not found or not yet generated")
-    
-    from fastapi.responses import FileResponse
-    return FileResponse(file_path, media_type="image/png", filename="flowchart.png")
+
+    return await file_response(request, file_path, "image/png", "flowchart.png", artifact="png")
 
 @router.get("/results/{job_id}/mermaid")
-async def get_mermaid(job_id: str):
+async def get_mermaid(job_id: str, request: Request):
     """
     Download the generated Mermaid code.
     """
     job_dir = StorageService.get_job_dir(job_id)
     file_path = os.path.join(job_dir, "diagram.mmd")
-    if not os.path.exists(file_path):
+    if not await asyncio.to_thread(_available, job_dir, file_path):
+        raise HTTPException(status_code=404, detail="Mermaid code not found")
+
+    # Jobs from before precompression (or rewritten by a retry) get their variants now
+    if not await asyncio.to_thread(precompressed, file_path):
+        await cpu_executor.run(precompress, file_path, stage="precompress")
+    return await file_response(request, file_path, "text/plain", "flowchart.mmd", artifact="mermaid", compressible=True)
+
+@router.get("/results/{job_id}/svg")
+async def get_svg(job_id: str, request: Request):
+    """
+    Download the flowchart as SVG, rendered on first request (natively from diagram.json
+    when RENDER_BACKEND selects it, else from the Mermaid code) and kept in the job dir
+    (re-rendered if the Mermaid code changes).
+    """
+    job_dir = StorageService.get_job_dir(job_id)
+    mmd_path = os.path.join(job_dir, "diagram.mmd")
+    svg_path = os.path.join(job_dir, "diagram.svg")
+    if not await asyncio.to_thread(_available, job_dir, mmd_path):
         raise HTTPException(status_code=404, detail="Mermaid code not found")
-        
-    from fastapi.responses import FileResponse
-    return FileResponse(file_path, media_type="text/plain", filename="flowchart.mmd")
+
+    if await asyncio.to_thread(_svg_stale, mmd_path, svg_path):
+        task = _svg_renders.get(job_dir)
+        if task is None:
+            task = asyncio.create_task(_render_svg(mmd_path, svg_path))
+            _svg_renders[job_dir] = task
+            task.add_done_callback(lambda _: _svg_renders.pop(job_dir, None))
+        try:
+            # Shielded so one client disconnecting doesn't cancel the render for the others
+            await asyncio.shield(task)
+        except AppError as e:
+            logger.error(f"SVG render failed for job {job_id}: {e.message}")
+            raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    # The SVG is derived from the Mermaid code, so its URL is versioned by that
+    return await file_response(
+        request, svg_path, "image/svg+xml", "flowchart.svg", artifact="svg", compressible=True, version_of=mmd_path
+    )
+
+def _svg_stale(mmd_path: str, svg_path: str) -> bool:
+    try:
+        return os.path.getmtime(svg_path) < os.path.getmtime(mmd_path)
+    except FileNotFoundError:
+        return True
+
+def _read_svg_source(mmd_path: str) -> Union[Diagram, str]:
+    """The diagram to render: diagram.json for the native renderer, else the Mermaid code (blocking)."""
+    diagram_path = os.path.join(os.path.dirname(mmd_path), "diagram.json")
+    if NativeRenderer.selected() and os.path.exists(diagram_path):
+        with open(diagram_path) as f:
+            return Diagram.model_validate_json(f.read())
+    with open(mmd_path) as f:
+        return f.read()
+
+async def _render_svg(mmd_path: str, svg_path: str):
+    source = await asyncio.to_thread(_read_svg_source, mmd_path)
+    if isinstance(source, Diagram):
+        await NativeRenderer().render(source, output_format="svg", output_path=svg_path)
+    else:
+        await MermaidRenderer().render(source, output_format="svg", output_path=svg_path)
+    await cpu_executor.run(precompress, svg_path, stage="precompress")
+
+@router.get("/results/{job_id}/timings")
+async def get_timings(job_id: str, request: Request):
+    """
+    Per-stage timings and the critical path of the job's last run.
+    """
+    job_dir = StorageService.get_job_dir(job_id)
+    file_path = os.path.join(job_dir, "timings.json")
+    if not await asyncio.to_thread(os.path.exists, file_path):
+        raise HTTPException(status_code=404, detail="Timings not found or job not finished")
+
+    return await file_response(request, file_path, "application/json", None, artifact="timings")
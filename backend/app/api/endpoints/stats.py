@@ -0,0 +1,29 @@
+
+import asyncio
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from backend.app.core.metrics import metrics
+from backend.app.services.jobs.base import get_job_queue
+from backend.app.services.jobs.worker import report_queue_depth
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter()
+
+@router.get("/stats")
+async def get_stats():
+    """
+    Snapshot of the in-process metrics (render latency, busy workers, ...).
+    """
+    return metrics.snapshot()
+
+async def prometheus_metrics() -> PlainTextResponse:
+    """
+    Metrics of this process in Prometheus text format, mounted at /metrics.
+    Each API/worker process keeps its own counters, so scrape every process.
+    """
+    try:
+        await asyncio.to_thread(report_queue_depth, get_job_queue())
+    except Exception:
+        pass # Queue gauges just keep their last value
+    return PlainTextResponse(metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
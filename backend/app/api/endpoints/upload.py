@@ -1,7 +1,7 @@
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from backend.app.services.storage import StorageService
-from backend.app.core.errors import AppError
+from backend.app.core.errors import AppError, StorageFull
 from loguru import logger
 
 router = APIRouter()
@@ -11,21 +11,20 @@ async def upload_image(file: UploadFile = File(...)):
     """
     Upload an image to start a new processing job.
     """
-    # Validation
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
-    
+    # Type (magic bytes) and size are checked while the file streams to disk
     try:
-        job_id, file_path = await StorageService.save_upload(file)
+        job_id, file_path, sha256 = await StorageService.save_upload(file)
         return {
             "job_id": job_id,
             "filename": file.filename,
+            "sha256": sha256,
             "message": "Upload successful",
             "next_step": f"/api/v1/process/{job_id}"
         }
     except AppError as e:
         logger.error(f"Upload failed: {e.message}")
-        raise HTTPException(status_code=e.status_code, detail=e.message)
+        headers = {"Retry-After": str(e.retry_after)} if isinstance(e, StorageFull) else None
+        raise HTTPException(status_code=e.status_code, detail=e.message, headers=headers)
     except Exception as e:
         logger.error(f"Unexpected upload error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -21,19 +21,142 @@ class Settings(BaseSettings):
 
     # Storage
     TEMP_DIR: str = os.path.join(os.getcwd(), "temp")
+    CACHE_DIR: str = os.path.join(os.getcwd(), "cache")
+    MAX_UPLOAD_MB: int = 20 # Larger uploads are rejected with 413
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024 # Bytes read/written per step while streaming an upload
+
+    # Job Storage Retention (job dirs in TEMP_DIR)
+    JOB_RETENTION_HOURS: float = 72.0 # Delete job dirs untouched for longer (0 = keep forever)
+    JOB_STORAGE_MAX_MB: int = 10240 # GC deletes least recently used job dirs above this (0 = no limit)
+    JOB_STORAGE_QUOTA_MB: int = 12288 # Uploads get 503 + Retry-After above this (0 = no quota)
+    JOB_GC_INTERVAL: float = 300.0 # Seconds between GC passes in each API process (0 = off)
+    JOB_GC_MIN_AGE: float = 600.0 # Job dirs touched more recently are never deleted
+
+    # Batch Submission
+    BATCH_MAX_FILES: int = 200 # Images per batch, after unpacking zip archives
+    BATCH_MAX_UPLOAD_MB: int = 500 # Whole batch request
+    BATCH_PARALLELISM: int = 4 # Jobs of one batch running at once across all workers (0 = unlimited)
+
+    # Result Delivery (/results endpoints)
+    RESULTS_CACHE_CONTROL: str = "no-cache" # Plain result URLs are rewritten by a retry, so caches revalidate with the ETag
+    RESULTS_VERSIONED_CACHE_CONTROL: str = "public, max-age=31536000, immutable" # URLs with ?v=<content hash> never change
+
+    # Result Cache (vision JSON + OCR output keyed by image content)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_MB: int = 512
+    RENDER_CACHE_ENABLED: bool = True # Rendered PNG/SVG keyed by normalized Mermaid code
+    RENDER_CACHE_MAX_MB: int = 256
     
     # Logging
     LOG_LEVEL: str = "INFO"
+
+    # Metrics & Tracing
+    TRACE_EXPORTER: str = "" # "" (spans only feed /metrics), file, otlp
+    TRACE_FILE: str = os.path.join(os.getcwd(), "data", "traces.jsonl")
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACE_SERVICE_NAME: str = "sketch2flow"
+    WORKER_METRICS_PORT: int = 0 # /metrics port for `python -m backend.worker` (process i uses port + i; 0 = off)
     
     # AI Providers
-    VISION_PROVIDER: str = "stub" # stub, openai, gemini
+    VISION_PROVIDER: str = "stub" # stub, openai, gemini, replay, local
     OPENAI_API_KEY: str = ""
     GEMINI_API_KEY: str = ""
+    OPENAI_BASE_URL: str = "" # Override the API endpoint, e.g. a local mock (benchmarks/mock_vision_api.py)
+    GEMINI_BASE_URL: str = ""
+    VISION_REQUEST_TIMEOUT: float = 120.0
+    VISION_MAX_CONNECTIONS: int = 20 # Per provider HTTP connection pool
+    VISION_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    GEMINI_MAX_CONCURRENCY: int = 8 # Concurrent in-flight calls per process (0 = unlimited)
+    OPENAI_MAX_CONCURRENCY: int = 8
+    VISION_STREAMING: bool = True # Stream OpenAI/Gemini answers; the graph is built as nodes and edges arrive
+    VISION_PARTIAL_INTERVAL: float = 0.5 # Min seconds between "partial" diagram events while streaming (0 = no events)
+
+    # Hedged Vision Requests (a backup call for answers slower than usual)
+    VISION_HEDGE_PROVIDER: str = "" # Backup for VISION_PROVIDER, as provider or provider:model, e.g. openai or gemini:gemini-2.5-pro ("" = off)
+    VISION_HEDGE_PERCENTILE: float = 0.95 # Send the backup once the call is slower than this share of recent calls
+    VISION_HEDGE_BUDGET: float = 0.1 # At most this fraction of calls get a backup for being slow (failures always do)
+    VISION_HEDGE_DELAY: float = 10.0 # Seconds before hedging until enough latencies are known
+
+    # Vision Rate Limits (0 = unlimited)
+    RATE_LIMIT_STORE: str = "sqlite" # sqlite (shared with every process using JOB_QUEUE_DB), memory (per process)
+    GEMINI_RPM: int = 10
+    GEMINI_TPM: int = 250000
+    OPENAI_RPM: int = 500
+    OPENAI_TPM: int = 30000
+    VISION_EXPECTED_OUTPUT_TOKENS: int = 1024
+
+    # Vision Payload (image as uploaded to the provider)
+    VISION_MAX_LONG_EDGE: int = 1536 # Downscale so the longest side fits (0 = keep size)
+    VISION_AUTOCROP: bool = True # Crop to the drawing before resizing
+    VISION_CROP_MARGIN: int = 16 # Pixels kept around the drawing
+    VISION_IMAGE_FORMAT: str = "jpeg" # jpeg, webp, png
+    VISION_IMAGE_QUALITY: int = 85 # jpeg/webp quality
+
+    # Replay provider (recorded responses, no network)
+    VISION_REPLAY_FILE: str = os.path.join(os.getcwd(), "data", "vision_replay.json")
+    VISION_REPLAY_LATENCY: float = 0.0 # Seconds added per call
+
+    # Local vision (OpenCV contours, no API call)
+    VISION_LOCAL_FIRST: bool = False # Try the local detector before VISION_PROVIDER; escalate when unsure
+    LOCAL_VISION_MIN_CONFIDENCE: float = 0.85 # Below this the image goes to VISION_PROVIDER
+    LOCAL_VISION_MAX_SIDE: int = 1280 # Detection runs on a copy downscaled to fit (bboxes are scaled back)
+    LOCAL_VISION_MAX_NODES: int = 10 # Charts with more nodes go straight to VISION_PROVIDER without being traced
 
     # Feature Toggles
     ENABLE_PREPROCESSING: bool = True
+    PREPROCESS_OUTPUT: str = "closing" # Operator whose output is handed to OCR and the vision payload
+    DEBUG_ARTIFACTS: bool = False # Write step_*.png intermediates for every job (per job: POST /process/{id}?debug=true)
     ENABLE_OCR_FALLBACK: bool = False
 
+    # CPU Executor (preprocessing, OCR, ...)
+    CPU_EXECUTOR: str = "thread" # thread, process
+    CPU_EXECUTOR_WORKERS: int = 0 # 0 = one per CPU core
+
+    # OCR Engine Pool
+    OCR_LANGUAGES: List[str] = ["en"]
+    OCR_POOL_SIZE: int = 1 # Number of EasyOCR readers kept in memory
+    OCR_WARMUP_ON_STARTUP: bool = True
+    OCR_ACQUIRE_TIMEOUT: float = 120.0 # Seconds a job waits for a free reader
+
+    # OCR Tiling (large scans are read as overlapping tiles, in parallel)
+    OCR_TILE_THRESHOLD: int = 3000 # Tile images whose longer side exceeds this (0 = never tile)
+    OCR_TILE_SIZE: int = 1600 # Tile side in pixels
+    OCR_TILE_OVERLAP: int = 200 # Should be longer than any line of text, so each is whole in some tile
+    OCR_TILE_PARALLELISM: int = 0 # Tiles of one image recognized at once (0 = one per CPU core); thread mode loads that many readers on the first tiled image
+
+    # OCR <-> Vision Reconciliation
+    OCR_RECONCILE: bool = True # Use OCR text to fill/correct node labels and label edges
+    OCR_MIN_CONFIDENCE: float = 0.3 # Ignore OCR results below this
+    OCR_NODE_CONTAINMENT: float = 0.6 # Fraction of a text box inside a node to count as its label
+    OCR_LABEL_OVERRIDE_CONFIDENCE: float = 0.9 # Replace a similar-but-different vision label above this OCR confidence
+    OCR_EDGE_LABEL_DISTANCE: int = 40 # Max pixels between floating text and an edge to become its label
+
+    # Job Queue
+    JOB_QUEUE_BACKEND: str = "sqlite"
+    JOB_QUEUE_DB: str = os.path.join(os.getcwd(), "data", "jobs.db")
+    JOB_WORKERS_EMBEDDED: bool = True # Run a worker inside each API process; disable when using `python -m backend.worker`
+    JOB_WORKER_PROCESSES: int = 1 # Processes started by `python -m backend.worker`
+    JOB_CONCURRENCY: int = 2 # Jobs run at once per worker process
+    JOB_VISIBILITY_TIMEOUT: float = 300.0 # Lease length; renewed while the job runs
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_POLL_INTERVAL: float = 0.5
+    JOB_EVENTS_POLL_INTERVAL: float = 0.25 # How often /events streams check the shared queue for new events
+    SSE_HEARTBEAT_SECONDS: float = 15.0 # Comment sent on idle event streams to keep proxies from closing them
+
+    # Rendering
+    RENDER_BACKEND: str = "auto" # mermaid (mmdc), native (built-in layout, no Node/Chromium), auto (native only where Mermaid CLI is missing)
+    NATIVE_RENDER_SCALE: float = 1.0 # PNG pixels per SVG unit for the native renderer (1 = mmdc's default size)
+
+    # Mermaid Rendering
+    MERMAID_RENDER_MODE: str = "pool" # pool (warm workers, falls back to oneshot), oneshot (mmdc per diagram)
+    MERMAID_POOL_SIZE: int = 2
+    MERMAID_WORKER_MAX_RENDERS: int = 200 # Recycle a worker after this many renders
+    MERMAID_RENDER_TIMEOUT: float = 30.0
+    MERMAID_WORKER_START_TIMEOUT: float = 30.0
+    MERMAID_POOL_RETRY_AFTER: float = 60.0 # Cooldown before retrying workers that failed to start
+    MERMAID_CLI_DIR: str = "" # Defaults to the package behind `mmdc` in PATH
+    MERMAID_PUPPETEER_CONFIG: str = "" # Optional puppeteer launch config JSON (e.g. --no-sandbox)
+
     # Server
     PORT: int = 8000
 
@@ -16,6 +16,17 @@ class ValidationError(AppError):
     def __init__(self, message: str):
         super().__init__(message, status_code=400)
 
+class PayloadTooLarge(AppError):
+    """Raised when an upload exceeds MAX_UPLOAD_MB."""
+    def __init__(self, message: str):
+        super().__init__(message, status_code=413)
+
+class StorageFull(AppError):
+    """Raised when job storage is over its quota; the client should retry after `retry_after` seconds."""
+    def __init__(self, message: str, retry_after: int = 60):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
+
 class OCRFailure(AppError):
     """Raised when OCR extraction fails."""
     def __init__(self, message: str = "Text extraction failed"):
@@ -0,0 +1,90 @@
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from typing import Any, Callable, Optional, Tuple
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+
+queue_depth = metrics.gauge("cpu_executor_queue_depth", "CPU tasks submitted but waiting for a free executor worker")
+inflight = metrics.gauge("cpu_executor_inflight", "CPU tasks submitted and not yet finished")
+wait_seconds = metrics.histogram("cpu_executor_wait_seconds", "Time a CPU task waited before an executor worker picked it up")
+run_seconds = metrics.histogram("cpu_executor_run_seconds", "Time a CPU task spent executing")
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict) -> Tuple[float, float, Any]:
+    # Module-level so it can be pickled into process pool workers.
+    # Wall-clock time is used because the start time crosses process boundaries.
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time(), result
+
+def _init_process_worker():
+    from backend.app.core.logging import setup_logging
+    setup_logging()
+
+class CPUExecutor:
+    """
+    Runs CPU-bound stage functions (OpenCV, EasyOCR/torch) off the event loop,
+    in either a thread pool or a process pool (CPU_EXECUTOR).
+    Functions and arguments must be picklable in process mode.
+    """
+    def __init__(self, kind: str = "thread", max_workers: int = 0):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown CPU_EXECUTOR: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers or (os.cpu_count() or 4)
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                # spawn avoids forking a parent that already holds torch/OpenCV threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=get_context("spawn"),
+                    initializer=_init_process_worker,
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cpu")
+            logger.info(f"CPU executor started ({self.kind}, {self.max_workers} workers)")
+        return self._pool
+
+    def _track(self, delta: int):
+        self._pending += delta
+        inflight.set(self._pending)
+        queue_depth.set(max(0, self._pending - self.max_workers))
+
+    async def run(self, fn: Callable, *args, stage: str = "cpu", **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        self._track(1)
+        try:
+            started, finished, result = await loop.run_in_executor(
+                self._get_pool(), partial(_timed_call, fn, args, kwargs)
+            )
+        finally:
+            self._track(-1)
+        wait_seconds.observe(max(0.0, started - submitted), stage=stage)
+        run_seconds.observe(finished - started, stage=stage)
+        return result
+
+    async def broadcast(self, fn: Callable, stage: str = "warmup") -> list:
+        """
+        Runs `fn` once per worker process (process mode, best effort: a fast
+        worker may take two calls) or once in this process (thread mode).
+        Used to load per-process state such as OCR models.
+        """
+        calls = self.max_workers if self.kind == "process" else 1
+        return await asyncio.gather(*(self.run(fn, stage=stage) for _ in range(calls)))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+cpu_executor = CPUExecutor(kind=settings.CPU_EXECUTOR, max_workers=settings.CPU_EXECUTOR_WORKERS)
@@ -0,0 +1,182 @@
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple, Any, Iterator, Sequence
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _escape_label(value: str) -> str:
+    return _escape(value).replace('"', '\\"')
+
+def _format_labels(key: LabelKey, **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(str(v))}"' for k, v in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> Dict[LabelKey, Any]:
+        with self._lock:
+            return dict(self._values)
+
+class Counter(_Metric):
+    """Monotonically increasing count (requests served, cache hits, ...)."""
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+class Gauge(_Metric):
+    """Point-in-time value that can go up and down (busy workers, queue depth, ...)."""
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies, sizes) over fixed buckets."""
+    type = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, Dict[str, Any]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+                self._series[key] = series
+            series["count"] += 1
+            series["sum"] += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def value(self, **labels) -> float:
+        series = self._series.get(_label_key(labels))
+        return float(series["count"]) if series else 0.0
+
+    def samples(self) -> Dict[LabelKey, Any]:
+        with self._lock:
+            return {
+                key: {
+                    "count": s["count"],
+                    "sum": s["sum"],
+                    "buckets": dict(zip(self.buckets, s["buckets"])),
+                }
+                for key, s in self._series.items()
+            }
+
+class MetricsRegistry:
+    """
+    Process-wide collection of named metrics.
+    Metrics are created on first use, so modules can declare them at import time.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type}")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = "", buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def all(self) -> Dict[str, _Metric]:
+        with self._lock:
+            return dict(self._metrics)
+
+    def render_prometheus(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, metric in sorted(self.all().items()):
+            if metric.description:
+                lines.append(f"# HELP {name} {_escape(metric.description)}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for key, value in sorted(metric.samples().items()):
+                if isinstance(metric, Histogram):
+                    # Bucket counts are already cumulative (each observation counts in every bucket >= it)
+                    for bound, count in value["buckets"].items():
+                        lines.append(f"{name}_bucket{_format_labels(key, le=_format_value(bound))} {count}")
+                    lines.append(f'{name}_bucket{_format_labels(key, le="+Inf")} {value["count"]}')
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view of every metric and its labelled samples."""
+        result = {}
+        for name, metric in sorted(self.all().items()):
+            result[name] = {
+                "type": metric.type,
+                "description": metric.description,
+                "samples": [
+                    {"labels": dict(key), "value": value}
+                    for key, value in metric.samples().items()
+                ],
+            }
+        return result
+
+metrics = MetricsRegistry()
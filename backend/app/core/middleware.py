@@ -0,0 +1,60 @@
+
+from typing import Dict
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+class BodyTooLarge(Exception):
+    """Raised into the app by UploadSizeLimitMiddleware once a body passes its limit."""
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects POST bodies over the limit: up front when the Content-Length says so,
+    otherwise as soon as the bytes actually received pass it (chunked uploads
+    carry no Content-Length, and the header may lie). Multipart parsing spools
+    the whole body before the endpoint runs, so this is the only place an
+    oversized upload can be stopped early.
+    """
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits # path -> max body bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        max_bytes = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = JSONResponse({"detail": "Upload is larger than the allowed size"}, status_code=413)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    exceeded = True
+                    raise BodyTooLarge(f"request body passed {max_bytes} bytes")
+            return message
+
+        async def guarded_send(message: Message):
+            nonlocal started
+            # The body parser may turn BodyTooLarge into its own error response; the 413 below replaces it
+            if exceeded and not started:
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except BodyTooLarge:
+            pass
+        if exceeded and not started:
+            await too_large(scope, receive, send)
@@ -0,0 +1,184 @@
+
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+
+span_seconds = metrics.histogram("span_duration_seconds", "Duration of traced operations by span name and outcome")
+
+# Copied from a parent span to every child so all spans of a job can be found by job_id
+_INHERITED = ("job_id",)
+
+class Span:
+    """One timed operation. Children share the trace id of the span they were started under."""
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = {k: parent.attributes[k] for k in _INHERITED if parent and k in parent.attributes}
+        self.attributes.update(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def incr(self, key: str, amount: int = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Span in OTLP/JSON shape."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class FileExporter:
+    """Appends one OTLP-shaped span per line (jq-friendly)."""
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps({"service": settings.TRACE_SERVICE_NAME, **span.to_otlp()}) + "\n")
+
+class OTLPExporter:
+    """Posts batches to an OTLP/HTTP JSON endpoint (e.g. an OpenTelemetry Collector on :4318)."""
+    def __init__(self, endpoint: str):
+        import httpx
+        self.endpoint = endpoint
+        self.client = httpx.Client(timeout=10)
+
+    def export(self, spans: List[Span]):
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.TRACE_SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": "backend"}, "spans": [span.to_otlp() for span in spans]}],
+            }]
+        }
+        self.client.post(self.endpoint, json=body).raise_for_status()
+
+class Tracer:
+    """
+    Records spans for pipeline stages, provider calls and jobs.
+    Every finished span feeds span_duration_seconds; if an exporter is
+    configured (TRACE_EXPORTER) spans are also exported in batches from a
+    background thread, so the event loop never waits on file or network I/O.
+    """
+    def __init__(self, exporter: Optional[Any] = None, batch_size: int = 256, flush_interval: float = 2.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[Span]:
+        return self._current.get()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        span = Span(name, self._current.get(), attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._current.reset(token)
+            span.end_ns = time.time_ns()
+            outcome = "error" if span.error else span.attributes.get("outcome", "ok")
+            span_seconds.observe(span.duration, span=name, outcome=outcome)
+            self._export(span)
+
+    def _export(self, span: Span):
+        if self.exporter is None:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            logger.warning("Trace export queue full, dropping span")
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._drain, name="trace-export", daemon=True)
+                self._thread.start()
+
+    def _drain(self):
+        stop = False
+        while not stop:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stop = True
+                    break
+                batch.append(span)
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning(f"Trace export failed ({len(batch)} spans dropped): {e}")
+
+    def shutdown(self):
+        """Flushes pending spans."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+        self._thread = None
+
+def current_span() -> Optional[Span]:
+    return tracer.current()
+
+def _build_exporter() -> Optional[Any]:
+    if settings.TRACE_EXPORTER == "file":
+        return FileExporter(settings.TRACE_FILE)
+    if settings.TRACE_EXPORTER == "otlp":
+        return OTLPExporter(settings.TRACE_OTLP_ENDPOINT)
+    if settings.TRACE_EXPORTER:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {settings.TRACE_EXPORTER}")
+    return None
+
+tracer = Tracer(_build_exporter())
@@ -0,0 +1,241 @@
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+
+cache_requests = metrics.counter("result_cache_requests_total", "Cache lookups by cache (results, renders), stage and outcome (hit, miss, coalesced)")
+cache_evictions = metrics.counter("result_cache_evictions_total", "Cache entries evicted to stay under the size budget, by cache")
+cache_bytes = metrics.gauge("result_cache_bytes", "Bytes currently stored in each cache")
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache for expensive stage outputs (vision JSON, OCR boxes).
+    Entries are JSON files named by their key; recency is tracked through the file
+    mtime so eviction is LRU and survives restarts. Concurrent computations of the
+    same key share one in-flight task.
+    """
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True, name: str = "results"):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Stable key for an ordered set of inputs (hashes, provider, model, ...)."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+            os.utime(path) # Mark as recently used
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+            self._remove(path)
+            return None
+
+    def set(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+            self._account(os.path.getsize(path))
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {key}: {e}")
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]], stage: str) -> Any:
+        """
+        Returns the cached value for `key`, or runs `compute` once and caches it.
+        Callers arriving while the computation runs await the same task.
+        Disk reads, writes and evictions run in a thread.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            cache_requests.inc(cache=self.name, stage=stage, outcome="coalesced")
+            return await asyncio.shield(inflight)
+
+        value = await asyncio.to_thread(self.get, key)
+        if value is not None:
+            cache_requests.inc(cache=self.name, stage=stage, outcome="hit")
+            logger.info(f"Result cache hit for {stage} ({key[:12]})")
+            return value
+
+        cache_requests.inc(cache=self.name, stage=stage, outcome="miss")
+
+        async def run():
+            result = await compute()
+            await asyncio.to_thread(self.set, key, result)
+            return result
+
+        # A separate task keeps the computation alive for followers if the leader is cancelled
+        task = asyncio.create_task(run())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def _account(self, added: int):
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += added
+            over_budget = self._size > self.max_bytes
+            cache_bytes.set(self._size, cache=self.name)
+        if over_budget:
+            self.evict()
+
+    def _scan_size(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits its budget."""
+        with self._lock:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                cache_evictions.inc(cache=self.name)
+
+            self._size = total
+            cache_bytes.set(total, cache=self.name)
+
+class RenderCache(ResultCache):
+    """
+    Rendered diagrams (PNG/SVG files) keyed by normalized Mermaid code, format and
+    render options. Entries are plain files handed out by hard link, so a hit costs
+    no copy when the cache and the job dirs share a filesystem.
+    """
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.bin")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached render, or None."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            os.utime(path) # Mark as recently used
+            return path
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, rendered_path: str) -> str:
+        """Moves a freshly rendered file into the cache and returns its cache path."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.move(rendered_path, tmp_path)
+        os.replace(tmp_path, path)
+        self._account(os.path.getsize(path))
+        return path
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[str]], stage: str) -> str:
+        """
+        Cache path of the render for `key`, running `render` (which returns the path
+        of a new file) once on a miss. Concurrent misses share one render.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            cache_requests.inc(cache=self.name, stage=stage, outcome="coalesced")
+            return await asyncio.shield(inflight)
+
+        path = await asyncio.to_thread(self.get, key)
+        if path is not None:
+            cache_requests.inc(cache=self.name, stage=stage, outcome="hit")
+            return path
+
+        cache_requests.inc(cache=self.name, stage=stage, outcome="miss")
+
+        async def run():
+            rendered = await render()
+            return await asyncio.to_thread(self.set, key, rendered)
+
+        task = asyncio.create_task(run())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def link(cached_path: str, dest: str):
+        """
+        Places a cached render at `dest` atomically: hard link, or a copy across filesystems.
+        Blocking; async callers run it in a thread.
+        """
+        tmp_path = os.path.join(os.path.dirname(dest), f".{os.path.basename(dest)}.{os.getpid()}.tmp")
+        try:
+            os.link(cached_path, tmp_path)
+        except FileNotFoundError:
+            raise # Evicted meanwhile
+        except OSError:
+            shutil.copyfile(cached_path, tmp_path)
+        # Shared inode: this also marks the cache entry as used. Outputs must look newer than their inputs
+        os.utime(tmp_path)
+        os.replace(tmp_path, dest)
+
+result_cache = ResultCache(
+    directory=os.path.join(settings.CACHE_DIR, "results"),
+    max_bytes=settings.RESULT_CACHE_MAX_MB * 1024 * 1024,
+    enabled=settings.RESULT_CACHE_ENABLED,
+)
+
+render_cache = RenderCache(
+    directory=os.path.join(settings.CACHE_DIR, "renders"),
+    max_bytes=settings.RENDER_CACHE_MAX_MB * 1024 * 1024,
+    enabled=settings.RENDER_CACHE_ENABLED,
+    name="renders",
+)
@@ -0,0 +1,167 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import shutil
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+
+try:
+    import brotli
+except ImportError: # Optional: without it only .gz variants are written and served
+    brotli = None
+
+# Content-Encoding and file suffix of precompressed variants, most preferred first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+result_responses = metrics.counter("result_responses_total", "Result downloads by artifact, status (200, 304) and content encoding")
+
+def precompress(path: str):
+    """
+    Writes <path>.br and <path>.gz next to a text artifact (diagram.mmd, diagram.svg)
+    so they can be sent as-is. Variants at least as new as the file are kept.
+    """
+    source_mtime = os.stat(path).st_mtime_ns
+    with open(path, "rb") as f:
+        data = f.read()
+    for encoding, suffix in ENCODINGS:
+        if encoding == "br" and brotli is None:
+            continue
+        if _fresh(path + suffix, source_mtime):
+            continue
+        body = brotli.compress(data, quality=11) if encoding == "br" else gzip.compress(data, compresslevel=9, mtime=0)
+        tmp_path = f"{path}{suffix}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path + suffix)
+
+def precompressed(path: str) -> bool:
+    """Whether every precompressed variant of `path` exists and is at least as new as it."""
+    source_mtime = os.stat(path).st_mtime_ns
+    return all(
+        _fresh(path + suffix, source_mtime)
+        for encoding, suffix in ENCODINGS
+        if encoding != "br" or brotli is not None
+    )
+
+def store(src: str, dest: str):
+    """Moves a finished file into place atomically, so readers never see it half written."""
+    tmp_path = os.path.join(os.path.dirname(dest), f".{os.path.basename(dest)}.{os.getpid()}.tmp")
+    shutil.move(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+def etag(path: str) -> str:
+    """Strong ETag from the file's SHA-256 (hashed once per content version)."""
+    stat = os.stat(path)
+    return _content_etag(path, stat.st_mtime_ns, stat.st_size)
+
+def version(path: str) -> str:
+    """Content version for result URLs (`?v=`): the ETag without its quotes."""
+    return etag(path).strip('"')
+
+@lru_cache(maxsize=4096)
+def _content_etag(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()[:32]}"'
+
+async def file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: Optional[str],
+    artifact: str,
+    cache_control: Optional[str] = None,
+    compressible: bool = False,
+    version_of: Optional[str] = None,
+) -> Response:
+    """
+    Serves a result file with a content-hash ETag (304 when If-None-Match matches) and
+    Cache-Control. Compressible files are served from their precompressed variant when
+    the client accepts it; each encoding gets its own ETag.
+
+    A request whose `?v=` is the current `version()` of `version_of` (default `path`)
+    is cached as immutable; plain or outdated URLs must be revalidated.
+    """
+    # Hashing and stat calls hit the disk, so they run in a thread
+    tag, current, (encoding, body_path) = await asyncio.to_thread(
+        _inspect, path, version_of or path, request.headers.get("accept-encoding", "") if compressible else None
+    )
+    if encoding:
+        tag = f'{tag[:-1]}-{encoding}"'
+
+    if cache_control is None:
+        versioned = request.query_params.get("v") == current
+        cache_control = settings.RESULTS_VERSIONED_CACHE_CONTROL if versioned else settings.RESULTS_CACHE_CONTROL
+    headers = {"ETag": tag, "Cache-Control": cache_control}
+    if compressible:
+        headers["Vary"] = "Accept-Encoding"
+    if _matches(request.headers.get("if-none-match"), tag):
+        result_responses.inc(artifact=artifact, status="304", encoding=encoding or "identity")
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    result_responses.inc(artifact=artifact, status="200", encoding=encoding or "identity")
+    return FileResponse(body_path, media_type=media_type, filename=filename, headers=headers)
+
+def _inspect(path: str, version_of: str, accept_encoding: Optional[str]) -> Tuple[str, str, Tuple[Optional[str], str]]:
+    """
+    ETag of `path`, version of `version_of` and the (content encoding, file to send) pair;
+    no negotiation without `accept_encoding`.
+    """
+    negotiated = _negotiate(accept_encoding, path) if accept_encoding is not None else (None, path)
+    return etag(path), version(version_of), negotiated
+
+def _negotiate(accept_encoding: str, path: str) -> Tuple[Optional[str], str]:
+    """(content encoding, file to send): the client's highest-q encoding we have a fresh variant for."""
+    accepted = _parse_accept_encoding(accept_encoding)
+    source_mtime = None
+    best: Tuple[float, Optional[str], str] = (0.0, None, path)
+    for encoding, suffix in ENCODINGS:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q <= best[0]:
+            continue
+        if source_mtime is None:
+            source_mtime = os.stat(path).st_mtime_ns
+        if _fresh(path + suffix, source_mtime):
+            best = (q, encoding, path + suffix)
+    return best[1], best[2]
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+def _matches(if_none_match: Optional[str], tag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes added by proxies still match
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+def _fresh(variant: str, source_mtime_ns: int) -> bool:
+    try:
+        return os.stat(variant).st_mtime_ns >= source_mtime_ns
+    except OSError:
+        return False
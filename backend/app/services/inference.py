@@ -1,8 +1,12 @@
 
+import difflib
 from typing import List, Optional, Dict, Any
+import numpy as np
 from pydantic import BaseModel
 from loguru import logger
+from backend.app.core.config import settings
 from backend.app.core.errors import GraphBuildFailure
+from backend.app.services import reconcile
 
 # --- Canonical Schema ---
 class Node(BaseModel):
@@ -22,11 +26,26 @@ class Diagram(BaseModel):
     nodes: List[Node]
     edges: List[Edge]
 
+# Labels the vision model uses when it couldn't read the text
+GENERIC_LABELS = {"", "node", "text", "label", "?", "..."}
+
 # --- Inference Engine ---
 
 class InferenceEngine:
+    """
+    Builds the canonical graph from vision output and OCR. Nodes and edges can be
+    fed one at a time while a vision response is still streaming in (`add_node`,
+    `add_edge`, `snapshot` for a preview), then `finish` completes the graph once
+    OCR is in. `build_graph` does it all in one go.
+    """
     def __init__(self):
-        pass
+        self.reset()
+
+    def reset(self):
+        self.id_map: Dict[str, str] = {} # Maps original_id -> normalized_id
+        self.nodes: List[Node] = []
+        self.raw_edges: List[Dict[str, Any]] = []
+        self.raw_node_count = 0
 
     def build_graph(self, vision_data: Dict[str, Any], ocr_data: List[Dict[str, Any]]) -> Diagram:
         """
@@ -35,71 +54,69 @@ class InferenceEngine:
         """
         try:
             logger.info("Building graph from vision data...")
-            
-            id_map = {} # Maps original_id -> normalized_id
-            nodes = []
-            
-            # 1. Process Nodes
-            raw_nodes = vision_data.get("nodes", [])
-            for i, n_data in enumerate(raw_nodes):
-                original_id = str(n_data.get("id", f"gen_{i}"))
-                
-                # Deduplicate based on ID
-                if original_id in id_map:
-                    continue
-                    
-                # Generate safe, unique internal ID
-                new_id = f"node_{i}"
-                id_map[original_id] = new_id
-                
-                # Sanitize label (basic cleanup before Mermaid generator handles the rest)
-                label = str(n_data.get("label", "Node"))
-                
-                nodes.append(Node(
-                    id=new_id,
-                    label=label,
-                    shape=n_data.get("shape", "rectangle"),
-                    bbox=n_data.get("bbox")
-                ))
-
-            # 2. Process Edges
-            edges = []
-            raw_edges = vision_data.get("edges", [])
-            seen_edges = set()
-
-            for e_data in raw_edges:
-                src_orig = str(e_data.get("from"))
-                tgt_orig = str(e_data.get("to"))
-                
-                # Resolve to new IDs
-                src_new = id_map.get(src_orig)
-                tgt_new = id_map.get(tgt_orig)
-                
-                # VALIDATION: Drop edges where nodes don't exist
-                if not src_new or not tgt_new:
-                    logger.warning(f"Skipping edge {src_orig} -> {tgt_orig}: node not found.")
-                    continue
-                
-                # Prevent self-loops if they aren't meaningful (Mermaid handles them, but safer to check)
-                # if src_new == tgt_new: continue 
-
-                # Deduplicate edges
-                edge_key = (src_new, tgt_new)
-                if edge_key in seen_edges:
-                    continue
-                seen_edges.add(edge_key)
-
-                edges.append(Edge(
-                    source=src_new,
-                    target=tgt_new,
-                    label=e_data.get("label"),
-                    type=e_data.get("type", "arrow")
-                ))
-            
+            self.reset()
+            for n_data in vision_data.get("nodes", []):
+                self.add_node(n_data)
+            for e_data in vision_data.get("edges", []):
+                self.add_edge(e_data)
+        except Exception as e:
+            logger.error(f"Inference failed: {e}")
+            raise GraphBuildFailure(str(e))
+        return self.finish(ocr_data, vision_data.get("diagram_type", "flowchart"))
+
+    def add_node(self, n_data: Dict[str, Any]):
+        i = self.raw_node_count
+        self.raw_node_count += 1
+        original_id = str(n_data.get("id", f"gen_{i}"))
+
+        # Deduplicate based on ID
+        if original_id in self.id_map:
+            return
+
+        # Generate safe, unique internal ID
+        new_id = f"node_{i}"
+        self.id_map[original_id] = new_id
+
+        # Sanitize label (basic cleanup before Mermaid generator handles the rest)
+        label = str(n_data.get("label", "Node"))
+
+        self.nodes.append(Node(
+            id=new_id,
+            label=label,
+            shape=n_data.get("shape", "rectangle"),
+            bbox=n_data.get("bbox")
+        ))
+
+    def add_edge(self, e_data: Dict[str, Any]):
+        # Resolved when the graph is assembled, so an edge may arrive before its nodes
+        self.raw_edges.append(e_data)
+
+    def fed_all(self, vision_data: Dict[str, Any]) -> bool:
+        """Whether every node and edge of `vision_data` was already fed in (as its response streamed)."""
+        return (self.raw_node_count, len(self.raw_edges)) == (len(vision_data.get("nodes", [])), len(vision_data.get("edges", [])))
+
+    def snapshot(self, diagram_type: str = "flowchart") -> Diagram:
+        """The graph from what has been fed so far, without OCR; edges to nodes not seen yet are left out."""
+        return Diagram(type=diagram_type, nodes=[node.model_copy() for node in self.nodes], edges=self._edges(warn=False))
+
+    def finish(self, ocr_data: List[Dict[str, Any]], diagram_type: str = "flowchart") -> Diagram:
+        """Resolves the edges, reconciles labels with OCR and returns the graph."""
+        try:
+            nodes = self.nodes
+            edges = self._edges(warn=True)
+
+            if settings.OCR_RECONCILE and ocr_data:
+                try:
+                    changes = self.reconcile_ocr(nodes, edges, ocr_data)
+                    logger.info(f"OCR reconciliation: {changes}")
+                except Exception as e:
+                    # Labels from the vision model are still usable
+                    logger.warning(f"OCR reconciliation failed: {e}")
+
             logger.info(f"Graph built with {len(nodes)} nodes and {len(edges)} edges.")
             
             return Diagram(
-                type=vision_data.get("diagram_type", "flowchart"),
+                type=diagram_type,
                 nodes=nodes,
                 edges=edges
             )
@@ -107,3 +124,109 @@ class InferenceEngine:
         except Exception as e:
             logger.error(f"Inference failed: {e}")
             raise GraphBuildFailure(str(e))
+
+    def _edges(self, warn: bool) -> List[Edge]:
+        edges = []
+        seen_edges = set()
+
+        for e_data in self.raw_edges:
+            src_orig = str(e_data.get("from"))
+            tgt_orig = str(e_data.get("to"))
+            
+            # Resolve to new IDs
+            src_new = self.id_map.get(src_orig)
+            tgt_new = self.id_map.get(tgt_orig)
+            
+            # VALIDATION: Drop edges where nodes don't exist
+            if not src_new or not tgt_new:
+                if warn:
+                    logger.warning(f"Skipping edge {src_orig} -> {tgt_orig}: node not found.")
+                continue
+            
+            # Prevent self-loops if they aren't meaningful (Mermaid handles them, but safer to check)
+            # if src_new == tgt_new: continue 
+
+            # Deduplicate edges
+            edge_key = (src_new, tgt_new)
+            if edge_key in seen_edges:
+                continue
+            seen_edges.add(edge_key)
+
+            edges.append(Edge(
+                source=src_new,
+                target=tgt_new,
+                label=e_data.get("label"),
+                type=e_data.get("type", "arrow")
+            ))
+        return edges
+
+    def reconcile_ocr(self, nodes: List[Node], edges: List[Edge], ocr_data: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Matches OCR text boxes to node bboxes to fill in or correct labels, and
+        attaches text floating next to an edge as that edge's label.
+        Updates nodes/edges in place and returns what changed.
+        """
+        changes = {"labels_filled": 0, "labels_corrected": 0, "edge_labels": 0}
+        boxes, texts, confidences = reconcile.ocr_boxes(ocr_data, settings.OCR_MIN_CONFIDENCE)
+        boxed = [i for i, node in enumerate(nodes) if node.bbox and len(node.bbox) == 4]
+        if not texts or not boxed:
+            return changes
+
+        node_boxes = reconcile.xywh_to_xyxy(np.asarray([nodes[i].bbox for i in boxed], np.float32))
+        assignment = reconcile.match_boxes(boxes, node_boxes, settings.OCR_NODE_CONTAINMENT)
+        text_heights = boxes[:, 3] - boxes[:, 1]
+        line_height = float(np.median(text_heights))
+
+        # Node labels: the text inside each node, in reading order
+        inside = np.flatnonzero(assignment >= 0)
+        mean_confidence = np.bincount(assignment[inside], confidences[inside], len(boxed)) / np.maximum(
+            np.bincount(assignment[inside], minlength=len(boxed)), 1
+        )
+        order = inside[reconcile.reading_order(boxes[inside], assignment[inside], line_height)]
+        for k, text in reconcile.join_groups(order, assignment, texts):
+            node = nodes[boxed[k]]
+            label = self._pick_label(node.label, text, float(mean_confidence[k]))
+            if label == node.label:
+                continue
+            changes["labels_filled" if node.label.strip().lower() in GENERIC_LABELS else "labels_corrected"] += 1
+            node.label = label
+
+        # Edge labels: leftover text close to the line between two node centers
+        row = {nodes[i].id: k for k, i in enumerate(boxed)}
+        open_edges = [e for e in edges if not e.label and e.source in row and e.target in row and e.source != e.target]
+        floating = np.flatnonzero(assignment < 0)
+        if not open_edges or not len(floating):
+            return changes
+
+        centers = (node_boxes[:, :2] + node_boxes[:, 2:]) / 2
+        segments = np.concatenate([
+            centers[[row[e.source] for e in open_edges]],
+            centers[[row[e.target] for e in open_edges]],
+        ], axis=1)
+        points = (boxes[floating, :2] + boxes[floating, 2:]) / 2
+        max_distance = np.maximum(settings.OCR_EDGE_LABEL_DISTANCE, 1.5 * text_heights[floating])
+        nearest = reconcile.nearest_segments(points, segments, max_distance)
+
+        edge_of = np.full(len(boxes), -1, np.int64)
+        edge_of[floating] = nearest
+        hits = floating[nearest >= 0]
+        order = hits[reconcile.reading_order(boxes[hits], edge_of[hits], line_height)]
+        for k, text in reconcile.join_groups(order, edge_of, texts):
+            open_edges[k].label = text
+            changes["edge_labels"] += 1
+        return changes
+
+    @staticmethod
+    def _pick_label(vision_label: str, ocr_text: str, confidence: float) -> str:
+        """
+        OCR fills labels the model left blank/generic. It only overrides a real
+        label when it is very confident and reads almost the same (a misspelling,
+        not a different interpretation of the node).
+        """
+        if vision_label.strip().lower() in GENERIC_LABELS:
+            return ocr_text
+        if confidence >= settings.OCR_LABEL_OVERRIDE_CONFIDENCE and ocr_text.lower() != vision_label.lower():
+            similarity = difflib.SequenceMatcher(None, vision_label.lower(), ocr_text.lower()).ratio()
+            if similarity >= 0.6:
+                return ocr_text
+        return vision_label
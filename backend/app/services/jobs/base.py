@@ -0,0 +1,112 @@
+
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+from backend.app.core.config import settings
+
+# Lifecycle states used for scheduling. The user-facing `status` string
+# ("processing", "waiting_rate_limit_12s", "completed", ...) is tracked separately.
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class Job(BaseModel):
+    job_id: str
+    state: str
+    status: str
+    attempts: int = 0
+    max_attempts: int = 1
+    batch_id: Optional[str] = None
+    lease_owner: Optional[str] = None # Worker currently running the job
+    payload: Dict[str, Any] = {}
+    detail: Dict[str, Any] = {}
+    created_at: float
+    updated_at: float
+
+class JobEvent(BaseModel):
+    id: int
+    job_id: str
+    type: str # "status", "stage", "partial", "timings"
+    data: Dict[str, Any] = {}
+    created_at: float
+
+class JobQueue(ABC):
+    """
+    Durable, shared job store. Every API and worker process talks to the same
+    queue, so status is consistent across `uvicorn --workers N` and restarts.
+    """
+    @abstractmethod
+    def enqueue(self, job_id: str, payload: Optional[Dict[str, Any]] = None, batch_id: Optional[str] = None) -> Job:
+        """
+        Queues a job. Re-queues it if it previously failed; otherwise returns the existing job unchanged.
+        Batch jobs may carry `parallelism` in their payload: at most that many of the batch run at once.
+        """
+        pass
+
+    @abstractmethod
+    def claim(self, worker_id: str, visibility_timeout: float) -> Optional[Job]:
+        """
+        Leases the oldest runnable job to `worker_id`. Jobs whose lease expired
+        (crashed worker) are runnable again until they run out of attempts.
+        """
+        pass
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        """Extends the lease. Returns False if the worker no longer owns the job."""
+        pass
+
+    # With `worker_id`, the updates below only apply while that worker holds the lease,
+    # so a worker that lost its job to another can't overwrite the new run's state.
+
+    @abstractmethod
+    def set_status(self, job_id: str, status: str, detail: Optional[Dict[str, Any]] = None, worker_id: Optional[str] = None) -> bool:
+        """Updates the user-facing status (and merges `detail`) without changing the lifecycle state."""
+        pass
+
+    @abstractmethod
+    def complete(self, job_id: str, status: str, detail: Optional[Dict[str, Any]] = None, worker_id: Optional[str] = None) -> bool:
+        """Finishes a job. Statuses starting with "failed" end in the FAILED state."""
+        pass
+
+    @abstractmethod
+    def release(self, job_id: str, error: str, worker_id: Optional[str] = None) -> bool:
+        """Gives a job back after an unexpected worker error so it can be retried."""
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        pass
+
+    @abstractmethod
+    def add_event(self, job_id: str, type: str, data: Dict[str, Any]):
+        """Appends a progress event. Status changes are recorded as "status" events automatically."""
+        pass
+
+    @abstractmethod
+    def events(self, job_id: Optional[str], after_id: int = 0) -> List[JobEvent]:
+        """Events newer than `after_id` (of one job, or of every job if `job_id` is None), oldest first."""
+        pass
+
+    @abstractmethod
+    def last_event_id(self) -> int:
+        pass
+
+    @abstractmethod
+    def list_batch(self, batch_id: str) -> List[Job]:
+        """Jobs of a batch in submission order."""
+        pass
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per lifecycle state."""
+        pass
+
+@lru_cache
+def get_job_queue() -> JobQueue:
+    if settings.JOB_QUEUE_BACKEND == "sqlite":
+        from backend.app.services.jobs.sqlite import SQLiteJobQueue
+        return SQLiteJobQueue(settings.JOB_QUEUE_DB, max_attempts=settings.JOB_MAX_ATTEMPTS)
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {settings.JOB_QUEUE_BACKEND}")
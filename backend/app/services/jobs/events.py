@@ -0,0 +1,127 @@
+
+import asyncio
+from typing import Any, Dict, Optional, Set
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+from backend.app.services.jobs.base import JobQueue, get_job_queue
+
+streams_open = metrics.gauge("job_event_streams_open", "Clients following job progress in this process")
+
+def is_final_status(status: str) -> bool:
+    return status.startswith("completed") or status.startswith("failed")
+
+class JobEventHub:
+    """
+    Fans job events out to every stream open in this process.
+    A single poller tails the shared events table (workers may be other
+    processes), so the database load doesn't grow with the number of clients.
+    """
+    def __init__(self, queue: JobQueue, interval: float):
+        self.queue = queue
+        self.interval = interval
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._cursor: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self, job_id: str) -> asyncio.Queue:
+        """
+        Starts delivering new events of `job_id`. Events already stored when this
+        returns are not delivered; read them with `queue.events()` afterwards.
+        """
+        if self._cursor is None:
+            self._cursor = await asyncio.to_thread(self.queue.last_event_id)
+        inbox: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(inbox)
+        streams_open.inc()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return inbox
+
+    def unsubscribe(self, job_id: str, inbox: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers and inbox in subscribers:
+            subscribers.discard(inbox)
+            streams_open.dec()
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                events = await asyncio.to_thread(self.queue.events, None, self._cursor)
+            except Exception as e:
+                logger.warning(f"Could not read job events: {e}")
+                events = []
+            for event in events:
+                self._cursor = event.id
+                for inbox in self._subscribers.get(event.job_id, ()):
+                    inbox.put_nowait(event)
+            await asyncio.sleep(self.interval)
+        # No one is listening: restart from the latest event next time
+        self._cursor = None
+
+class JobEventWriter:
+    """
+    Records one job's status updates and events from a background task, in order.
+    Pipeline callbacks are synchronous and run on the event loop, so they only
+    enqueue here; the writes (and the SQLite lock waits) happen in a thread.
+    The callbacks may also be called from other threads.
+    """
+    def __init__(self, queue: JobQueue, job_id: str, worker_id: Optional[str] = None):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._loop = asyncio.get_running_loop()
+        self._pending: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def set_status(self, status: str, detail: Optional[Dict[str, Any]] = None):
+        self._put(("status", status, detail))
+
+    def add_event(self, type: str, data: Dict[str, Any]):
+        self._put(("event", type, data))
+
+    async def aclose(self):
+        """Waits until everything enqueued so far is written."""
+        self._put(None)
+        await self._task
+
+    def _put(self, item):
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._pending.put_nowait(item)
+        else:
+            self._loop.call_soon_threadsafe(self._pending.put_nowait, item)
+
+    async def _run(self):
+        while True:
+            # Whatever piled up while the last batch was written goes in one thread hop
+            batch = [await self._pending.get()]
+            while not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+            closing = batch[-1] is None
+            try:
+                await asyncio.to_thread(self._write, [item for item in batch if item is not None])
+            except Exception as e:
+                logger.warning(f"Could not record progress of job {self.job_id}: {e}")
+            if closing:
+                return
+
+    def _write(self, batch):
+        for kind, name, data in batch:
+            if kind == "status":
+                self.queue.set_status(self.job_id, name, data, worker_id=self.worker_id)
+            else:
+                self.queue.add_event(self.job_id, name, data)
+
+_hub: Optional[JobEventHub] = None
+
+def get_event_hub() -> JobEventHub:
+    global _hub
+    if _hub is None:
+        _hub = JobEventHub(get_job_queue(), settings.JOB_EVENTS_POLL_INTERVAL)
+    return _hub
@@ -0,0 +1,275 @@
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from backend.app.services.jobs.base import Job, JobEvent, JobQueue, QUEUED, RUNNING, DONE, FAILED
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    batch_id TEXT,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    detail TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state_created ON jobs (state, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, id);
+"""
+
+# Events are only needed while clients follow a job (and reconnect); older ones are pruned
+EVENT_RETENTION_SECONDS = 3600
+
+# Applied after SCHEMA so databases created before a column existed pick it up
+MIGRATIONS = [
+    ("batch_id", "ALTER TABLE jobs ADD COLUMN batch_id TEXT"),
+]
+INDEXES = "CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id, state);"
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Job queue in a local SQLite database (WAL mode), shared by every process on the box.
+    Claims run inside `BEGIN IMMEDIATE` transactions so two workers never lease the same job.
+    """
+    def __init__(self, db_path: str, max_attempts: int = 3):
+        self.db_path = db_path
+        self.max_attempts = max(1, max_attempts)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, statement in MIGRATIONS:
+            if column not in columns:
+                conn.execute(statement)
+        conn.executescript(INDEXES)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Job:
+        return Job(
+            job_id=row["job_id"],
+            state=row["state"],
+            status=row["status"],
+            attempts=row["attempts"],
+            max_attempts=row["max_attempts"],
+            batch_id=row["batch_id"],
+            lease_owner=row["lease_owner"],
+            payload=json.loads(row["payload"]),
+            detail=json.loads(row["detail"]),
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+    @staticmethod
+    def _insert_event(conn: sqlite3.Connection, job_id: str, type: str, data: Dict[str, Any], now: float):
+        conn.execute(
+            "INSERT INTO job_events (job_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, type, json.dumps(data), now),
+        )
+
+    def enqueue(self, job_id: str, payload: Optional[Dict[str, Any]] = None, batch_id: Optional[str] = None) -> Job:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (job_id, state, status, max_attempts, batch_id, payload, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, "queued", self.max_attempts, batch_id, json.dumps(payload or {}), now, now),
+                )
+                self._insert_event(conn, job_id, "status", {"status": "queued"}, now)
+            elif row["state"] == FAILED:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, status = ?, attempts = 0, lease_owner = NULL, "
+                    "lease_expires_at = NULL, payload = ?, detail = '{}', updated_at = ? WHERE job_id = ?",
+                    (QUEUED, "queued", json.dumps(payload or json.loads(row["payload"])), now, job_id),
+                )
+                self._insert_event(conn, job_id, "status", {"status": "queued"}, now)
+            else:
+                return self._to_job(row)
+            return self._to_job(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone())
+
+    def claim(self, worker_id: str, visibility_timeout: float) -> Optional[Job]:
+        now = time.time()
+        with self._transaction() as conn:
+            # Expired leases that already used every attempt are given up on
+            abandoned = conn.execute(
+                "SELECT job_id FROM jobs WHERE state = ? AND lease_expires_at < ? AND attempts >= max_attempts",
+                (RUNNING, now),
+            ).fetchall()
+            for row in abandoned:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, status = ?, lease_owner = NULL, updated_at = ? WHERE job_id = ?",
+                    (FAILED, "failed: worker stopped responding", now, row["job_id"]),
+                )
+                self._insert_event(conn, row["job_id"], "status", {"status": "failed: worker stopped responding"}, now)
+            # Oldest runnable job, skipping batches already running `parallelism` jobs
+            # so one large batch can't take every worker
+            row = conn.execute(
+                "SELECT job_id FROM jobs AS j WHERE (state = ? OR (state = ? AND lease_expires_at < ?)) "
+                "AND (batch_id IS NULL OR COALESCE(json_extract(payload, '$.parallelism'), 0) <= 0 "
+                "OR (SELECT COUNT(*) FROM jobs AS r WHERE r.batch_id = j.batch_id AND r.state = ? "
+                "AND r.lease_expires_at >= ?) < json_extract(payload, '$.parallelism')) "
+                "ORDER BY created_at, rowid LIMIT 1",
+                (QUEUED, RUNNING, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, status = ?, attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires_at = ?, updated_at = ? WHERE job_id = ?",
+                (RUNNING, "processing", worker_id, now + visibility_timeout, now, row["job_id"]),
+            )
+            self._insert_event(conn, row["job_id"], "status", {"status": "processing"}, now)
+            return self._to_job(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone())
+
+    def heartbeat(self, job_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE job_id = ? AND state = ? AND lease_owner = ?",
+                (now + visibility_timeout, job_id, RUNNING, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def _merge_detail(self, conn: sqlite3.Connection, job_id: str, detail: Optional[Dict[str, Any]]) -> Optional[str]:
+        if not detail:
+            return None
+        row = conn.execute("SELECT detail FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        merged = json.loads(row["detail"]) if row else {}
+        merged.update(detail)
+        return json.dumps(merged)
+
+    @staticmethod
+    def _owned(worker_id: Optional[str]):
+        """Extra WHERE clause and parameters restricting an update to the lease holder."""
+        if worker_id is None:
+            return "", ()
+        return " AND state = ? AND lease_owner = ?", (RUNNING, worker_id)
+
+    def set_status(self, job_id: str, status: str, detail: Optional[Dict[str, Any]] = None, worker_id: Optional[str] = None) -> bool:
+        now = time.time()
+        owned, owner_params = self._owned(worker_id)
+        with self._transaction() as conn:
+            merged = self._merge_detail(conn, job_id, detail)
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, detail = COALESCE(?, detail), updated_at = ? "
+                "WHERE job_id = ? AND state NOT IN (?, ?)" + owned,
+                (status, merged, now, job_id, DONE, FAILED, *owner_params),
+            )
+            if cursor.rowcount:
+                self._insert_event(conn, job_id, "status", {"status": status, **(detail or {})}, now)
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: str, status: str, detail: Optional[Dict[str, Any]] = None, worker_id: Optional[str] = None) -> bool:
+        state = FAILED if status.startswith("failed") else DONE
+        now = time.time()
+        owned, owner_params = self._owned(worker_id)
+        with self._transaction() as conn:
+            merged = self._merge_detail(conn, job_id, detail)
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, status = ?, detail = COALESCE(?, detail), lease_owner = NULL, "
+                "lease_expires_at = NULL, updated_at = ? WHERE job_id = ?" + owned,
+                (state, status, merged, now, job_id, *owner_params),
+            )
+            if cursor.rowcount:
+                self._insert_event(conn, job_id, "status", {"status": status}, now)
+            conn.execute("DELETE FROM job_events WHERE created_at < ?", (now - EVENT_RETENTION_SECONDS,))
+            return cursor.rowcount == 1
+
+    def release(self, job_id: str, error: str, worker_id: Optional[str] = None) -> bool:
+        now = time.time()
+        owned, owner_params = self._owned(worker_id)
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE job_id = ?" + owned, (job_id, *owner_params)
+            ).fetchone()
+            if row is None:
+                return False
+            if row["attempts"] >= row["max_attempts"]:
+                state, status = FAILED, f"failed: {error}"
+            else:
+                state, status = QUEUED, "queued"
+            conn.execute(
+                "UPDATE jobs SET state = ?, status = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE job_id = ?",
+                (state, status, now, job_id),
+            )
+            self._insert_event(conn, job_id, "status", {"status": status}, now)
+            return True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._connection().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def add_event(self, job_id: str, type: str, data: Dict[str, Any]):
+        with self._transaction() as conn:
+            self._insert_event(conn, job_id, type, data, time.time())
+
+    def events(self, job_id: Optional[str], after_id: int = 0) -> List[JobEvent]:
+        if job_id is None:
+            rows = self._connection().execute(
+                "SELECT * FROM job_events WHERE id > ? ORDER BY id", (after_id,)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT * FROM job_events WHERE job_id = ? AND id > ? ORDER BY id", (job_id, after_id)
+            ).fetchall()
+        return [
+            JobEvent(id=row["id"], job_id=row["job_id"], type=row["type"], data=json.loads(row["data"]), created_at=row["created_at"])
+            for row in rows
+        ]
+
+    def last_event_id(self) -> int:
+        row = self._connection().execute("SELECT MAX(id) AS id FROM job_events").fetchone()
+        return row["id"] or 0
+
+    def list_batch(self, batch_id: str) -> List[Job]:
+        rows = self._connection().execute(
+            "SELECT * FROM jobs WHERE batch_id = ? ORDER BY created_at, rowid", (batch_id,)
+        ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
@@ -0,0 +1,123 @@
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+from backend.app.core.tracing import tracer
+from backend.app.services.jobs.base import Job, JobQueue
+
+jobs_running = metrics.gauge("job_worker_running", "Jobs currently executing in this process")
+jobs_by_state = metrics.gauge("job_queue_jobs", "Jobs in the shared queue by lifecycle state")
+jobs_finished = metrics.counter("job_worker_finished_total", "Jobs finished by this process, by outcome")
+job_seconds = metrics.histogram("job_duration_seconds", "End-to-end pipeline time per job attempt")
+
+def report_queue_depth(queue: JobQueue):
+    """Refreshes the shared queue gauges (blocking; call from a thread)."""
+    for state, count in queue.counts().items():
+        jobs_by_state.set(count, state=state)
+
+class JobWorker:
+    """
+    Pulls jobs from the shared queue and runs them with bounded concurrency.
+    Leases are renewed while a job runs; if the process dies the lease expires
+    and another worker retries the job (up to JOB_MAX_ATTEMPTS).
+    """
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[Job], Awaitable[str]],
+        concurrency: int,
+        worker_id: Optional[str] = None,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.visibility_timeout = settings.JOB_VISIBILITY_TIMEOUT
+        self._last_report = 0.0
+
+    async def run(self):
+        logger.info(f"Job worker {self.worker_id} started (concurrency {self.concurrency})")
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        try:
+            while True:
+                await slots.acquire()
+                job = await asyncio.to_thread(self.queue.claim, self.worker_id, self.visibility_timeout)
+                if job is None:
+                    slots.release()
+                    await self._report_depth()
+                    await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+                    continue
+
+                logger.info(f"Worker {self.worker_id} claimed job {job.job_id} (attempt {job.attempts}/{job.max_attempts})")
+                task = asyncio.create_task(self._execute(job, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info(f"Job worker {self.worker_id} stopped")
+
+    async def _execute(self, job: Job, slots: asyncio.Semaphore):
+        jobs_running.inc()
+        run = asyncio.create_task(self._run(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job.job_id, run))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait({run})
+            if run.cancelled():
+                # Stopped by the heartbeat: another worker owns the job now and we must not touch it
+                jobs_finished.inc(outcome="lease_lost")
+                return
+            status = run.result()
+            if await asyncio.to_thread(self.queue.complete, job.job_id, status, worker_id=self.worker_id):
+                jobs_finished.inc(outcome="failed" if status.startswith("failed") else "completed")
+            else:
+                logger.warning(f"Job {job.job_id} finished after worker {self.worker_id} lost its lease; result dropped")
+                jobs_finished.inc(outcome="lease_lost")
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back instead of waiting for the lease to expire
+            run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+            await asyncio.to_thread(self.queue.release, job.job_id, "worker shut down", worker_id=self.worker_id)
+            jobs_finished.inc(outcome="released")
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.job_id} crashed in worker {self.worker_id}: {e}")
+            await asyncio.to_thread(self.queue.release, job.job_id, str(e), worker_id=self.worker_id)
+            jobs_finished.inc(outcome="crashed")
+        finally:
+            heartbeat.cancel()
+            jobs_running.dec()
+            job_seconds.observe(time.perf_counter() - start)
+            slots.release()
+
+    async def _run(self, job: Job) -> str:
+        # Root span of the job's trace; stage and provider spans nest under it
+        with tracer.span("job", job_id=job.job_id, attempt=job.attempts, worker=self.worker_id) as span:
+            status = await self.handler(job)
+            span.set(status=status, outcome="failed" if status.startswith("failed") else status)
+        return status
+
+    async def _heartbeat(self, job_id: str, run: asyncio.Task):
+        interval = max(1.0, self.visibility_timeout / 3)
+        while True:
+            await asyncio.sleep(interval)
+            owned = await asyncio.to_thread(self.queue.heartbeat, job_id, self.worker_id, self.visibility_timeout)
+            if not owned:
+                logger.warning(f"Worker {self.worker_id} lost the lease on job {job_id}, stopping it")
+                run.cancel()
+                return
+
+    async def _report_depth(self):
+        if time.monotonic() - self._last_report < 5:
+            return
+        self._last_report = time.monotonic()
+        await asyncio.to_thread(report_queue_depth, self.queue)
@@ -0,0 +1,68 @@
+// Long-lived Mermaid render worker.
+//
+// Keeps one headless Chromium open and renders diagrams sent over stdin,
+// so each render skips the Node + browser cold start that `mmdc` pays.
+//
+// Protocol (newline-delimited JSON):
+//   <- {"ready": true}                                     once the browser is up
+//   -> {"id": 1, "code": "flowchart TD ...", "format": "png", "backgroundColor": "transparent"}
+//   <- {"id": 1, "ok": true, "data": "<base64>"}
+//   <- {"id": 1, "ok": false, "error": "...", "syntax": false}
+//
+// MERMAID_CLI_DIR must point at the installed @mermaid-js/mermaid-cli package;
+// puppeteer is resolved from that package's own dependencies.
+
+import { createRequire } from "node:module";
+import { readFileSync } from "node:fs";
+import { join } from "node:path";
+import { pathToFileURL } from "node:url";
+import readline from "node:readline";
+
+const cliDir = process.env.MERMAID_CLI_DIR;
+if (!cliDir) {
+    process.stderr.write("MERMAID_CLI_DIR is not set\n");
+    process.exit(2);
+}
+
+const cliRequire = createRequire(join(cliDir, "package.json"));
+const { renderMermaid } = await import(pathToFileURL(join(cliDir, "src", "index.js")).href);
+const puppeteerModule = await import(pathToFileURL(cliRequire.resolve("puppeteer")).href);
+const puppeteer = puppeteerModule.default ?? puppeteerModule;
+
+let launchOptions = { headless: true };
+if (process.env.MERMAID_PUPPETEER_CONFIG) {
+    launchOptions = { ...launchOptions, ...JSON.parse(readFileSync(process.env.MERMAID_PUPPETEER_CONFIG, "utf8")) };
+}
+
+const browser = await puppeteer.launch(launchOptions);
+browser.on("disconnected", () => process.exit(3));
+
+const send = (message) => process.stdout.write(JSON.stringify(message) + "\n");
+
+const render = async (request) => {
+    try {
+        const { data } = await renderMermaid(browser, request.code, request.format, {
+            backgroundColor: request.backgroundColor || "white",
+        });
+        send({ id: request.id, ok: true, data: Buffer.from(data).toString("base64") });
+    } catch (err) {
+        const message = String(err && err.message ? err.message : err);
+        send({ id: request.id, ok: false, error: message, syntax: /syntax error|parse error/i.test(message) });
+    }
+};
+
+// Requests are handled one at a time; the Python pool never pipelines more than one per worker.
+let chain = Promise.resolve();
+const input = readline.createInterface({ input: process.stdin });
+input.on("line", (line) => {
+    if (!line.trim()) return;
+    const request = JSON.parse(line);
+    chain = chain.then(() => render(request));
+});
+input.on("close", async () => {
+    await chain;
+    await browser.close();
+    process.exit(0);
+});
+
+send({ ready: true });
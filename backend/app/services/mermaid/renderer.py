@@ -3,9 +3,14 @@ import os
 import shutil
 import tempfile
 import asyncio
+import time
 from typing import Optional
 from backend.app.core.config import settings
 from backend.app.core.errors import RenderFailed, MermaidSyntaxError
+from backend.app.core.tracing import tracer
+from backend.app.services.cache import RenderCache, ResultCache, render_cache
+from backend.app.services.delivery import store
+from backend.app.services.mermaid.worker_pool import render_pool, render_seconds
 from loguru import logger
 
 class MermaidRenderer:
@@ -15,17 +20,12 @@ class MermaidRenderer:
         if not self.mmdc_path:
             logger.warning("Mermaid CLI (mmdc) not found in PATH. Rendering will fail.")
 
-    async def render(self, mermaid_code: str, output_format: str = "png") -> str:
+    async def render(self, mermaid_code: str, output_format: str = "png", output_path: Optional[str] = None) -> str:
         """
         Renders Mermaid code to an image file.
-        Returns the path to the generated image.
+        Returns the path to the generated image (`output_path` if given, else a temp file).
+        Identical diagrams (after normalization) are served from the render cache.
         """
-        if not self.mmdc_path:
-            # Re-check in case it was installed later
-            self.mmdc_path = shutil.which("mmdc")
-            if not self.mmdc_path:
-                raise RenderFailed("Mermaid CLI is not installed. Please install @mermaid-js/mermaid-cli.")
-
         if output_format not in ["png", "svg"]:
             raise ValueError("Unsupported output format. Use 'png' or 'svg'.")
 
@@ -33,6 +33,68 @@ class MermaidRenderer:
         if not mermaid_code.strip():
              raise MermaidSyntaxError("Mermaid code is empty.")
 
+        if not render_cache.enabled:
+            path = await self._render(mermaid_code, output_format)
+            if output_path:
+                await asyncio.to_thread(store, path, output_path)
+                return output_path
+            return path
+
+        key = ResultCache.make_key(
+            "mermaid-render", MermaidRenderer.normalize(mermaid_code), output_format,
+            _background(output_format), settings.MERMAID_PUPPETEER_CONFIG,
+        )
+        cached = await render_cache.get_or_render(key, lambda: self._render(mermaid_code, output_format), stage=output_format)
+        if output_path is None:
+            fd, output_path = tempfile.mkstemp(suffix=f".{output_format}")
+            os.close(fd)
+        try:
+            await asyncio.to_thread(RenderCache.link, cached, output_path)
+        except FileNotFoundError:
+            # Evicted before it could be used (e.g. a render larger than the whole cache)
+            await asyncio.to_thread(store, await self._render(mermaid_code, output_format), output_path)
+        return output_path
+
+    @staticmethod
+    def normalize(mermaid_code: str) -> str:
+        """
+        Mermaid code with differences that don't change the picture removed: line endings,
+        indentation, trailing spaces, blank lines and %% comments (%%{...}%% directives stay).
+        """
+        lines = []
+        for line in mermaid_code.splitlines():
+            line = line.strip()
+            if not line or (line.startswith("%%") and not line.startswith("%%{")):
+                continue
+            lines.append(line)
+        return "\n".join(lines)
+
+    async def _render(self, mermaid_code: str, output_format: str) -> str:
+        if settings.MERMAID_RENDER_MODE == "pool" and render_pool.available:
+            try:
+                with tracer.span("render", mode="pool", format=output_format):
+                    return await self._render_pooled(mermaid_code, output_format)
+            except RenderFailed as e:
+                logger.warning(f"Render worker failed, falling back to one-shot mmdc: {e.message}")
+
+        with tracer.span("render", mode="oneshot", format=output_format):
+            return await self._render_oneshot(mermaid_code, output_format)
+
+    async def _render_pooled(self, mermaid_code: str, output_format: str) -> str:
+        """Renders through a warm worker and writes the bytes where mmdc would have."""
+        data = await render_pool.render(mermaid_code, output_format, background=_background(output_format))
+        with tempfile.NamedTemporaryFile(mode="wb", suffix=f".{output_format}", delete=False) as tmp_output:
+            tmp_output.write(data)
+            return tmp_output.name
+
+    async def _render_oneshot(self, mermaid_code: str, output_format: str) -> str:
+        """Spawns a fresh `mmdc` process for a single diagram."""
+        if not self.mmdc_path:
+            # Re-check in case it was installed later
+            self.mmdc_path = shutil.which("mmdc")
+            if not self.mmdc_path:
+                raise RenderFailed("Mermaid CLI is not installed. Please install @mermaid-js/mermaid-cli.")
+
         # Create temp files
         with tempfile.NamedTemporaryFile(mode="w", suffix=".mmd", delete=False) as tmp_input:
             tmp_input.write(mermaid_code)
@@ -48,7 +110,10 @@ class MermaidRenderer:
             # Set background color to transparent or white if needed, default is clear
             if output_format == "png":
                 cmd.extend(["-b", "transparent"])
+            if settings.MERMAID_PUPPETEER_CONFIG:
+                cmd.extend(["-p", settings.MERMAID_PUPPETEER_CONFIG])
 
+            start = time.perf_counter()
             process = await asyncio.create_subprocess_exec(
                 *cmd,
                 stdout=asyncio.subprocess.PIPE,
@@ -56,6 +121,7 @@ class MermaidRenderer:
             )
             
             stdout, stderr = await process.communicate()
+            render_seconds.observe(time.perf_counter() - start, mode="oneshot")
             
             if process.returncode != 0:
                 error_msg = stderr.decode().strip()
@@ -85,3 +151,7 @@ class MermaidRenderer:
     def validate_syntax(mermaid_code: str) -> bool:
         # TODO: Implement stricter validation if needed
         return len(mermaid_code.strip()) > 0
+
+def _background(output_format: str) -> str:
+    # What both render paths use: transparent PNGs, SVGs on white (mmdc's default)
+    return "transparent" if output_format == "png" else "white"
@@ -0,0 +1,198 @@
+
+import asyncio
+import base64
+import json
+import os
+import shutil
+import time
+from typing import List, Optional
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.errors import RenderFailed, MermaidSyntaxError
+from backend.app.core.metrics import metrics
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "render_worker.mjs")
+
+# Rendered PNGs travel base64-encoded on a single stdout line
+_STDOUT_LIMIT = 64 * 1024 * 1024
+
+render_seconds = metrics.histogram("mermaid_render_seconds", "Wall time of a single Mermaid render")
+workers_busy = metrics.gauge("mermaid_workers_busy", "Render workers currently rendering a diagram")
+workers_alive = metrics.gauge("mermaid_workers_alive", "Render worker processes currently running")
+worker_recycles = metrics.counter("mermaid_worker_recycles_total", "Render workers stopped and replaced")
+
+def find_mermaid_cli_dir(mmdc_path: Optional[str]) -> Optional[str]:
+    """
+    Resolves the @mermaid-js/mermaid-cli package directory from the `mmdc` binary,
+    which is normally a symlink to <package>/src/cli.js.
+    """
+    if settings.MERMAID_CLI_DIR:
+        return settings.MERMAID_CLI_DIR
+    if not mmdc_path:
+        return None
+    real = os.path.realpath(mmdc_path)
+    package_dir = os.path.dirname(os.path.dirname(real))
+    if os.path.exists(os.path.join(package_dir, "package.json")):
+        return package_dir
+    return None
+
+class _RenderWorker:
+    """One Node process holding a warm headless browser."""
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.renders = 0
+        self._next_id = 0
+
+    @classmethod
+    async def spawn(cls, node_path: str, cli_dir: str) -> "_RenderWorker":
+        env = dict(os.environ, MERMAID_CLI_DIR=cli_dir)
+        if settings.MERMAID_PUPPETEER_CONFIG:
+            env["MERMAID_PUPPETEER_CONFIG"] = settings.MERMAID_PUPPETEER_CONFIG
+
+        process = await asyncio.create_subprocess_exec(
+            node_path, WORKER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=env,
+            limit=_STDOUT_LIMIT,
+        )
+        worker = cls(process)
+        try:
+            line = await asyncio.wait_for(process.stdout.readline(), timeout=settings.MERMAID_WORKER_START_TIMEOUT)
+            if not line or not json.loads(line).get("ready"):
+                raise RenderFailed("Render worker exited during startup")
+        except Exception:
+            await worker.stop()
+            raise
+        return worker
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def render(self, mermaid_code: str, output_format: str, background: str) -> bytes:
+        self._next_id += 1
+        request = {"id": self._next_id, "code": mermaid_code, "format": output_format, "backgroundColor": background}
+        self.process.stdin.write((json.dumps(request) + "\n").encode())
+        await self.process.stdin.drain()
+
+        line = await asyncio.wait_for(self.process.stdout.readline(), timeout=settings.MERMAID_RENDER_TIMEOUT)
+        if not line:
+            raise RenderFailed("Render worker exited mid-render")
+        self.renders += 1
+
+        reply = json.loads(line)
+        if reply.get("id") != request["id"]:
+            raise RenderFailed("Render worker replied out of order")
+        if not reply.get("ok"):
+            if reply.get("syntax"):
+                raise MermaidSyntaxError(f"Syntax error in Mermaid code: {reply.get('error')}")
+            raise RenderFailed(f"Render worker failed: {reply.get('error')}")
+        return base64.b64decode(reply["data"])
+
+    async def stop(self):
+        if not self.alive:
+            return
+        try:
+            self.process.stdin.close()
+            await asyncio.wait_for(self.process.wait(), timeout=5)
+        except Exception:
+            self.process.kill()
+            await self.process.wait()
+
+class MermaidWorkerPool:
+    """
+    Pool of warm render workers fed over stdin.
+    Workers are recycled after MERMAID_WORKER_MAX_RENDERS renders or on any crash/timeout.
+    If workers cannot be started, the pool disables itself for a cooldown and
+    callers fall back to the one-shot `mmdc` path.
+    """
+    def __init__(self, size: int, max_renders: int):
+        self.size = max(1, size)
+        self.max_renders = max_renders
+        self._idle: List[_RenderWorker] = []
+        self._alive = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._disabled_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._disabled_until
+
+    async def _spawn(self) -> _RenderWorker:
+        node_path = shutil.which("node")
+        cli_dir = find_mermaid_cli_dir(shutil.which("mmdc"))
+        if not node_path or not cli_dir:
+            raise RenderFailed("Node.js or @mermaid-js/mermaid-cli not found for render workers")
+        worker = await _RenderWorker.spawn(node_path, cli_dir)
+        self._alive += 1
+        workers_alive.set(self._alive)
+        logger.info(f"Started Mermaid render worker (pid {worker.process.pid})")
+        return worker
+
+    async def _retire(self, worker: _RenderWorker, reason: str):
+        await worker.stop()
+        self._alive -= 1
+        workers_alive.set(self._alive)
+        worker_recycles.inc(reason=reason)
+        logger.info(f"Recycled Mermaid render worker (pid {worker.process.pid}, reason: {reason})")
+
+    async def render(self, mermaid_code: str, output_format: str = "png", background: str = "transparent") -> bytes:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            worker = None
+            while self._idle and worker is None:
+                candidate = self._idle.pop()
+                if candidate.alive:
+                    worker = candidate
+                else:
+                    await self._retire(candidate, "crashed")
+
+            if worker is None:
+                try:
+                    worker = await self._spawn()
+                except Exception as e:
+                    self._disabled_until = time.monotonic() + settings.MERMAID_POOL_RETRY_AFTER
+                    logger.warning(f"Render workers unavailable, disabling pool for {settings.MERMAID_POOL_RETRY_AFTER}s: {e}")
+                    raise RenderFailed(f"Could not start render worker: {e}")
+
+            workers_busy.inc()
+            start = time.perf_counter()
+            healthy = True
+            cancelled = False
+            try:
+                return await worker.render(mermaid_code, output_format, background)
+            except MermaidSyntaxError:
+                raise
+            except RenderFailed:
+                healthy = False
+                raise
+            except Exception as e:
+                healthy = False
+                raise RenderFailed(f"Render worker error: {e}")
+            except BaseException:
+                # Cancelled mid-render: the reply is still coming, so the worker's
+                # next caller would read it. Kill it rather than wait for the render.
+                cancelled = True
+                worker.process.kill()
+                raise
+            finally:
+                workers_busy.dec()
+                render_seconds.observe(time.perf_counter() - start, mode="pool")
+                if cancelled:
+                    await self._retire(worker, "cancelled")
+                elif not healthy or not worker.alive:
+                    await self._retire(worker, "crashed")
+                elif worker.renders >= self.max_renders:
+                    await self._retire(worker, "max_renders")
+                else:
+                    self._idle.append(worker)
+
+    async def close(self):
+        while self._idle:
+            await self._retire(self._idle.pop(), "shutdown")
+
+render_pool = MermaidWorkerPool(size=settings.MERMAID_POOL_SIZE, max_renders=settings.MERMAID_WORKER_MAX_RENDERS)
@@ -0,0 +1,441 @@
+import math
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from backend.app.services.inference import Diagram
+
+# Text metrics close to Mermaid's default theme (16px trebuchet), so node sizes look alike
+FONT_SIZE = 16
+CHAR_WIDTH = 8.5
+LINE_HEIGHT = 24
+MAX_LABEL_WIDTH = 200 # Mermaid wraps labels at 200px too
+PADDING = 15
+
+NODE_SEP = 50 # Between neighbouring nodes in a layer
+EDGE_SEP = 20 # Next to the bend points of long edges
+RANK_SEP = 50 # Between layers
+MARGIN = 8
+SELF_LOOP = 25 # How far self-loops stick out of their node
+
+CROSSING_SWEEPS = 12
+PLACEMENT_SWEEPS = 8
+
+class PlacedNode(BaseModel):
+    id: str
+    lines: List[str]
+    shape: str
+    x: float # Center
+    y: float
+    width: float
+    height: float
+
+class PlacedEdge(BaseModel):
+    source: str
+    target: str
+    type: str
+    points: List[Tuple[float, float]] # From the source outline to the target outline
+    label: Optional[List[str]] = None
+    label_at: Optional[Tuple[float, float]] = None
+
+class Layout(BaseModel):
+    width: float
+    height: float
+    nodes: List[PlacedNode]
+    edges: List[PlacedEdge]
+    crossings: int = 0
+
+class _Vertex:
+    """A node, or a bend point (dummy) of an edge spanning several layers."""
+    __slots__ = ("key", "width", "height", "layer", "x", "up", "down", "dummy")
+
+    def __init__(self, key, width: float, height: float, dummy: bool = False):
+        self.key = key
+        self.width = width
+        self.height = height
+        self.dummy = dummy
+        self.layer = 0
+        self.x = 0.0
+        self.up: List["_Vertex"] = []
+        self.down: List["_Vertex"] = []
+
+class SugiyamaLayout:
+    """
+    Top-to-bottom layered layout (like `flowchart TD`):
+
+    1. Cycles are broken by reversing DFS back edges (drawn with their arrow unchanged).
+    2. Longest-path layering; edges spanning several layers get one dummy per layer.
+    3. Barycenter sweeps, down and up, keeping the order with the fewest crossings.
+    4. X coordinates pull every vertex toward its neighbours while keeping the
+       order and spacing (weighted isotonic regression per layer), dummies weighing
+       more so long edges run straight.
+    """
+    @staticmethod
+    def layout(diagram: Diagram) -> Layout:
+        nodes, edges = SugiyamaLayout._graph(diagram)
+        vertices = {}
+        for node_id, (label, shape) in nodes.items():
+            lines = wrap_label(label)
+            width, height = node_size(lines, shape)
+            vertices[node_id] = _Vertex(node_id, width, height)
+
+        # 1. Cycle removal and 2. layering on the remaining DAG
+        flipped = SugiyamaLayout._reversed_edges(list(nodes), edges)
+        oriented = [(t, s) if i in flipped else (s, t) for i, (s, t, _, _) in enumerate(edges) if s != t]
+        SugiyamaLayout._assign_layers(vertices, oriented)
+
+        chains: Dict[int, List[_Vertex]] = {}
+        for i, (source, target, _, _) in enumerate(edges):
+            if source == target:
+                continue
+            upper, lower = (target, source) if i in flipped else (source, target)
+            chain = [vertices[upper]]
+            for layer in range(vertices[upper].layer + 1, vertices[lower].layer):
+                dummy = _Vertex((i, layer), 0.0, 0.0, dummy=True)
+                dummy.layer = layer
+                chain.append(dummy)
+            chain.append(vertices[lower])
+            for a, b in zip(chain, chain[1:]):
+                a.down.append(b)
+                b.up.append(a)
+            chains[i] = chain
+
+        layers: List[List[_Vertex]] = [[] for _ in range(max((v.layer for v in vertices.values()), default=0) + 1)]
+        seen = set()
+        # Initial order: declaration order, with bend points where their chain is built
+        for vertex in list(vertices.values()) + [v for chain in chains.values() for v in chain[1:-1]]:
+            if id(vertex) not in seen:
+                seen.add(id(vertex))
+                layers[vertex.layer].append(vertex)
+
+        # 3. Crossing minimization
+        crossings = SugiyamaLayout._order(layers)
+
+        # 4. Coordinates
+        ys, half_heights, gap_middles = SugiyamaLayout._layer_centers(layers, edges, chains)
+        SugiyamaLayout._place(layers)
+
+        placed_nodes = [
+            PlacedNode(id=node_id, lines=wrap_label(label), shape=shape, x=vertices[node_id].x, y=ys[vertices[node_id].layer],
+                       width=vertices[node_id].width, height=vertices[node_id].height)
+            for node_id, (label, shape) in nodes.items()
+        ]
+        by_id = {node.id: node for node in placed_nodes}
+        placed_edges = []
+        for i, (source, target, edge_type, label) in enumerate(edges):
+            lines = wrap_label(label) if label else None
+            if source == target:
+                points = _self_loop(by_id[source])
+                label_at = (points[1][0] + max(len(line) for line in lines) * CHAR_WIDTH / 2 + 4, by_id[source].y) if lines else None
+            else:
+                chain = chains[i]
+                # Bend points run straight down through their layer, clear of the nodes beside them
+                points = [(chain[0].x, ys[chain[0].layer])]
+                for v in chain[1:-1]:
+                    points += [(v.x, ys[v.layer] - half_heights[v.layer]), (v.x, ys[v.layer] + half_heights[v.layer])]
+                points.append((chain[-1].x, ys[chain[-1].layer]))
+                points[0] = _clip(by_id[chain[0].key], points[1])
+                points[-1] = _clip(by_id[chain[-1].key], points[-2])
+                # Labels sit in the first gap below the upper end, which was made tall enough for them
+                label_at = _at_height(points[0], points[1], gap_middles[chain[0].layer]) if lines else None
+                if i in flipped:
+                    points.reverse()
+            placed_edges.append(PlacedEdge(
+                source=source, target=target, type=edge_type, points=points, label=lines, label_at=label_at,
+            ))
+
+        _spread_labels(placed_edges)
+        return _normalize(placed_nodes, placed_edges, crossings)
+
+    @staticmethod
+    def _graph(diagram: Diagram):
+        """Nodes by id (first declaration wins, undeclared edge ends added like Mermaid does) and edges."""
+        nodes: Dict[str, Tuple[str, str]] = {}
+        for node in diagram.nodes:
+            nodes.setdefault(node.id, (node.label or node.id, node.shape))
+        edges = []
+        for edge in diagram.edges:
+            for end in (edge.source, edge.target):
+                nodes.setdefault(end, (end, "rectangle"))
+            edges.append((edge.source, edge.target, edge.type, edge.label))
+        return nodes, edges
+
+    @staticmethod
+    def _reversed_edges(order: List[str], edges) -> set:
+        """Indices of edges that point back up a DFS path; reversing them leaves a DAG."""
+        out: Dict[str, List[Tuple[str, int]]] = {node: [] for node in order}
+        for i, (source, target, _, _) in enumerate(edges):
+            if source != target:
+                out[source].append((target, i))
+        state: Dict[str, int] = {} # 1 = on the DFS stack, 2 = finished
+        flipped = set()
+        for root in order:
+            if root in state:
+                continue
+            state[root] = 1
+            stack = [(root, iter(out[root]))]
+            while stack:
+                node, children = stack[-1]
+                for child, i in children:
+                    if state.get(child) == 1:
+                        flipped.add(i)
+                    elif child not in state:
+                        state[child] = 1
+                        stack.append((child, iter(out[child])))
+                        break
+                else:
+                    state[node] = 2
+                    stack.pop()
+        return flipped
+
+    @staticmethod
+    def _assign_layers(vertices: Dict[str, _Vertex], oriented: List[Tuple[str, str]]):
+        """
+        Longest path from the sources (Kahn's order), then every source that feeds only
+        deeper nodes moves down next to them instead of trailing long edges from the top.
+        """
+        indegree = {key: 0 for key in vertices}
+        out: Dict[str, List[str]] = {key: [] for key in vertices}
+        for source, target in oriented:
+            out[source].append(target)
+            indegree[target] += 1
+        sources = [key for key, degree in indegree.items() if degree == 0]
+        ready = list(sources)
+        while ready:
+            key = ready.pop()
+            for target in out[key]:
+                vertices[target].layer = max(vertices[target].layer, vertices[key].layer + 1)
+                indegree[target] -= 1
+                if indegree[target] == 0:
+                    ready.append(target)
+        for key in sources:
+            if out[key]:
+                vertices[key].layer = min(vertices[target].layer for target in out[key]) - 1
+
+    @staticmethod
+    def _order(layers: List[List[_Vertex]]) -> int:
+        """Barycenter sweeps; leaves the best order found in `layers` and returns its crossings."""
+        best = _count_crossings(layers)
+        best_order = [list(layer) for layer in layers]
+        for sweep in range(CROSSING_SWEEPS):
+            if best == 0:
+                break
+            downward = sweep % 2 == 0
+            indices = range(1, len(layers)) if downward else range(len(layers) - 2, -1, -1)
+            for i in indices:
+                fixed = {id(v): pos for pos, v in enumerate(layers[i - 1 if downward else i + 1])}
+                def barycenter(item):
+                    pos, vertex = item
+                    neighbours = vertex.up if downward else vertex.down
+                    if not neighbours:
+                        return pos # Keeps its place
+                    return sum(fixed[id(n)] for n in neighbours) / len(neighbours)
+                layers[i] = [v for _, v in sorted(enumerate(layers[i]), key=barycenter)]
+            crossings = _count_crossings(layers)
+            if crossings < best:
+                best = crossings
+                best_order = [list(layer) for layer in layers]
+        layers[:] = best_order
+        return best
+
+    @staticmethod
+    def _layer_centers(layers: List[List[_Vertex]], edges, chains) -> Tuple[List[float], List[float], List[float]]:
+        """
+        Y of each layer's center, half its height, and the middle of the gap below it.
+        Gaps holding edge labels grow to fit them.
+        """
+        label_room = [0.0] * len(layers)
+        for i, (_, _, _, label) in enumerate(edges):
+            if label and i in chains:
+                gap = chains[i][0].layer
+                label_room[gap] = max(label_room[gap], len(wrap_label(label)) * LINE_HEIGHT + 10)
+
+        ys, half_heights, gap_middles, top = [], [], [], 0.0
+        for i, layer in enumerate(layers):
+            height = max((v.height for v in layer), default=0.0)
+            ys.append(top + height / 2)
+            half_heights.append(height / 2)
+            gap_middles.append(top + height + (RANK_SEP + label_room[i]) / 2)
+            top += height + RANK_SEP + label_room[i]
+        return ys, half_heights, gap_middles
+
+    @staticmethod
+    def _place(layers: List[List[_Vertex]]):
+        # Packed left to right first
+        for layer in layers:
+            x = 0.0
+            for pos, vertex in enumerate(layer):
+                if pos:
+                    x += _separation(layer[pos - 1], vertex)
+                vertex.x = x
+
+        for sweep in range(PLACEMENT_SWEEPS):
+            last = sweep == PLACEMENT_SWEEPS - 1
+            downward = sweep % 2 == 0
+            indices = range(len(layers)) if downward else range(len(layers) - 1, -1, -1)
+            for i in indices:
+                layer = layers[i]
+                desired, weights = [], []
+                for vertex in layer:
+                    # The last sweep balances between both sides
+                    neighbours = vertex.up + vertex.down if last else (vertex.up if downward else vertex.down)
+                    desired.append(sum(n.x for n in neighbours) / len(neighbours) if neighbours else vertex.x)
+                    weights.append((4.0 if vertex.dummy else 1.0) * (1.0 if neighbours else 0.1))
+                for vertex, x in zip(layer, _isotonic_place(layer, desired, weights)):
+                    vertex.x = x
+
+def wrap_label(label: str) -> List[str]:
+    """Lines of a label, word-wrapped at MAX_LABEL_WIDTH."""
+    limit = max(1, int(MAX_LABEL_WIDTH / CHAR_WIDTH))
+    lines = []
+    for paragraph in (label or "").replace("\r", "").split("\n"):
+        line = ""
+        for word in paragraph.split():
+            if line and len(line) + 1 + len(word) > limit:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.append(line)
+    return lines
+
+def node_size(lines: List[str], shape: str) -> Tuple[float, float]:
+    text_width = max(CHAR_WIDTH, max(len(line) for line in lines) * CHAR_WIDTH)
+    text_height = len(lines) * LINE_HEIGHT
+    if shape in ("diamond", "decision"):
+        # The text box has to fit inside the rhombus
+        side = text_width + text_height + PADDING * 2
+        return side, side
+    if shape == "circle":
+        diameter = math.hypot(text_width, text_height) + PADDING
+        return diameter, diameter
+    height = text_height + PADDING * 2
+    if shape == "parallelogram":
+        return text_width + PADDING * 2 + height / 2, height
+    if shape == "cylinder":
+        width = text_width + PADDING * 2
+        return width, height + 2 * cylinder_ry(width)
+    return text_width + PADDING * 2, height
+
+def cylinder_ry(width: float) -> float:
+    # Mermaid's proportions for the top/bottom ellipses
+    return (width / 2) / (2.5 + width / 50)
+
+def _separation(left: _Vertex, right: _Vertex) -> float:
+    gap = NODE_SEP if not (left.dummy or right.dummy) else EDGE_SEP
+    return (left.width + right.width) / 2 + gap
+
+def _isotonic_place(layer: List[_Vertex], desired: List[float], weights: List[float]) -> List[float]:
+    """
+    X closest to `desired` (weighted least squares) that keeps the layer's order and spacing:
+    subtract the minimum offsets, fit a non-decreasing sequence (pool adjacent violators), add them back.
+    """
+    offsets = [0.0]
+    for a, b in zip(layer, layer[1:]):
+        offsets.append(offsets[-1] + _separation(a, b))
+    blocks: List[List[float]] = [] # [weighted mean, weight, count]
+    for target, weight, offset in zip(desired, weights, offsets):
+        blocks.append([target - offset, weight, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            value, weight, count = blocks.pop()
+            prev = blocks[-1]
+            total = prev[1] + weight
+            prev[0] = (prev[0] * prev[1] + value * weight) / total
+            prev[1] = total
+            prev[2] += count
+    fitted = [value for value, _, count in blocks for _ in range(count)]
+    return [value + offset for value, offset in zip(fitted, offsets)]
+
+def _count_crossings(layers: List[List[_Vertex]]) -> int:
+    """Edge crossings between adjacent layers (inversions counted with a Fenwick tree)."""
+    total = 0
+    for upper, lower in zip(layers, layers[1:]):
+        position = {id(v): i for i, v in enumerate(lower)}
+        ends = sorted((i, position[id(n)]) for i, v in enumerate(upper) for n in v.down)
+        tree = [0] * (len(lower) + 1)
+        for seen, (_, pos) in enumerate(ends):
+            # Earlier edges ending to the right of this one cross it
+            i, not_right = pos + 1, 0
+            while i > 0:
+                not_right += tree[i]
+                i -= i & -i
+            total += seen - not_right
+            i = pos + 1
+            while i <= len(lower):
+                tree[i] += 1
+                i += i & -i
+    return total
+
+def _clip(node: PlacedNode, toward: Tuple[float, float]) -> Tuple[float, float]:
+    """Where the line from the node's center toward `toward` leaves its outline."""
+    dx, dy = toward[0] - node.x, toward[1] - node.y
+    if dx == 0 and dy == 0:
+        return node.x, node.y
+    hw, hh = node.width / 2, node.height / 2
+    if node.shape in ("diamond", "decision"):
+        t = 1 / (abs(dx) / hw + abs(dy) / hh)
+    elif node.shape == "circle":
+        t = hw / math.hypot(dx, dy)
+    else:
+        t = min(hw / abs(dx) if dx else math.inf, hh / abs(dy) if dy else math.inf)
+    return node.x + dx * t, node.y + dy * t
+
+def _self_loop(node: PlacedNode) -> List[Tuple[float, float]]:
+    """A loop off the node's right side."""
+    start = _clip(node, (node.x + node.width / 2, node.y - node.height / 3))
+    end = _clip(node, (node.x + node.width / 2, node.y + node.height / 3))
+    out = node.x + node.width / 2 + SELF_LOOP
+    return [start, (out, start[1]), (out, end[1]), end]
+
+def _at_height(a: Tuple[float, float], b: Tuple[float, float], y: float) -> Tuple[float, float]:
+    """The point of segment a-b at height y (clamped to the segment)."""
+    if b[1] == a[1]:
+        return (a[0] + b[0]) / 2, a[1]
+    t = min(1.0, max(0.0, (y - a[1]) / (b[1] - a[1])))
+    return a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t
+
+def _spread_labels(edges: List[PlacedEdge]):
+    """Pushes labels sharing a gap apart sideways so edges leaving the same node don't stack them."""
+    rows: Dict[float, List[PlacedEdge]] = {}
+    for edge in edges:
+        if edge.label and edge.source != edge.target:
+            rows.setdefault(round(edge.label_at[1], 1), []).append(edge)
+    for row in rows.values():
+        row.sort(key=lambda e: e.label_at[0])
+        right = float("-inf")
+        for edge in row:
+            half_width = max(len(line) for line in edge.label) * CHAR_WIDTH / 2 + 4
+            x = max(edge.label_at[0], right + half_width + 2)
+            edge.label_at = (x, edge.label_at[1])
+            right = x + half_width
+
+def _normalize(nodes: List[PlacedNode], edges: List[PlacedEdge], crossings: int) -> Layout:
+    """Shifts everything so the drawing starts at MARGIN and sizes the canvas to fit."""
+    xs, ys = [], []
+    for node in nodes:
+        xs += [node.x - node.width / 2, node.x + node.width / 2]
+        ys += [node.y - node.height / 2, node.y + node.height / 2]
+    for edge in edges:
+        xs += [x for x, _ in edge.points]
+        ys += [y for _, y in edge.points]
+        if edge.label:
+            half_width = max(len(line) for line in edge.label) * CHAR_WIDTH / 2 + 4
+            half_height = len(edge.label) * LINE_HEIGHT / 2
+            xs += [edge.label_at[0] - half_width, edge.label_at[0] + half_width]
+            ys += [edge.label_at[1] - half_height, edge.label_at[1] + half_height]
+    if not xs:
+        return Layout(width=2 * MARGIN, height=2 * MARGIN, nodes=[], edges=[])
+
+    dx, dy = MARGIN - min(xs), MARGIN - min(ys)
+    for node in nodes:
+        node.x += dx
+        node.y += dy
+    for edge in edges:
+        edge.points = [(x + dx, y + dy) for x, y in edge.points]
+        if edge.label_at:
+            edge.label_at = (edge.label_at[0] + dx, edge.label_at[1] + dy)
+    return Layout(
+        width=max(xs) - min(xs) + 2 * MARGIN,
+        height=max(ys) - min(ys) + 2 * MARGIN,
+        nodes=nodes,
+        edges=edges,
+        crossings=crossings,
+    )
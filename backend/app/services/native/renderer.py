@@ -0,0 +1,240 @@
+import asyncio
+import io
+import math
+import shutil
+import tempfile
+import time
+from html import escape
+from typing import List, Optional, Tuple
+from backend.app.core.config import settings
+from backend.app.core.executor import cpu_executor
+from backend.app.core.tracing import tracer
+from backend.app.services.delivery import store
+from backend.app.services.inference import Diagram
+from backend.app.services.mermaid.worker_pool import find_mermaid_cli_dir, render_seconds
+from backend.app.services.native.layout import CHAR_WIDTH, FONT_SIZE, LINE_HEIGHT, Layout, PlacedEdge, PlacedNode, SugiyamaLayout, cylinder_ry
+
+# Mermaid's default theme
+NODE_FILL = "#ECECFF"
+NODE_STROKE = "#9370DB"
+EDGE_COLOR = "#333333"
+TEXT_COLOR = "#333333"
+LABEL_FILL = "#E8E8E8"
+FONT_FAMILY = '"trebuchet ms", verdana, arial, sans-serif'
+
+ARROW_LENGTH = 10
+ARROW_WIDTH = 8
+
+# Drawn at twice the size and downscaled for antialiasing, unless the canvas gets too large
+SUPERSAMPLE = 2
+SUPERSAMPLE_MAX_PIXELS = 40_000_000
+
+class NativeRenderer:
+    """
+    Renders a Diagram without Mermaid CLI, Node or Chromium: SugiyamaLayout places it,
+    then it is written as SVG or drawn to PNG with Pillow. Shapes match what
+    MermaidGenerator emits (rectangle, diamond/decision, circle, cylinder, parallelogram).
+    """
+    @staticmethod
+    def selected() -> bool:
+        """Whether RENDER_BACKEND picks this renderer (auto: only where Mermaid CLI is missing)."""
+        if settings.RENDER_BACKEND == "native":
+            return True
+        if settings.RENDER_BACKEND == "auto":
+            return not shutil.which("mmdc") and not (shutil.which("node") and find_mermaid_cli_dir(None))
+        return False
+
+    async def render(self, diagram: Diagram, output_format: str = "png", output_path: Optional[str] = None) -> str:
+        """
+        Renders to `output_path` (or a temp file) and returns the path, like MermaidRenderer.render.
+        """
+        if output_format not in ["png", "svg"]:
+            raise ValueError("Unsupported output format. Use 'png' or 'svg'.")
+
+        with tracer.span("render", mode="native", format=output_format):
+            start = time.perf_counter()
+            data = await cpu_executor.run(NativeRenderer.draw, diagram, output_format, stage="render")
+            render_seconds.observe(time.perf_counter() - start, mode="native")
+
+        with tempfile.NamedTemporaryFile(mode="wb", suffix=f".{output_format}", delete=False) as tmp_output:
+            tmp_output.write(data)
+        if output_path:
+            await asyncio.to_thread(store, tmp_output.name, output_path)
+            return output_path
+        return tmp_output.name
+
+    @staticmethod
+    def draw(diagram: Diagram, output_format: str) -> bytes:
+        layout = SugiyamaLayout.layout(diagram)
+        if output_format == "svg":
+            return NativeRenderer.to_svg(layout).encode("utf-8")
+        return NativeRenderer.to_png(layout, settings.NATIVE_RENDER_SCALE)
+
+    @staticmethod
+    def to_svg(layout: Layout) -> str:
+        width, height = math.ceil(layout.width), math.ceil(layout.height)
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">',
+            "<defs>",
+            f'<marker id="arrowhead" viewBox="0 0 {ARROW_LENGTH} {ARROW_WIDTH}" refX="{ARROW_LENGTH}" refY="{ARROW_WIDTH / 2}" '
+            f'markerUnits="userSpaceOnUse" markerWidth="{ARROW_LENGTH}" markerHeight="{ARROW_WIDTH}" orient="auto">'
+            f'<path d="M0,0 L{ARROW_LENGTH},{ARROW_WIDTH / 2} L0,{ARROW_WIDTH} z" fill="{EDGE_COLOR}"/></marker>',
+            "</defs>",
+            f"<style>text{{font-family:{FONT_FAMILY};font-size:{FONT_SIZE}px;fill:{TEXT_COLOR}}}"
+            f".node{{fill:{NODE_FILL};stroke:{NODE_STROKE};stroke-width:1px}}"
+            f".edge{{fill:none;stroke:{EDGE_COLOR};stroke-width:2px;stroke-linejoin:round}}"
+            f".edge.dotted{{stroke-dasharray:3 3}}.edge.thick{{stroke-width:3.5px}}"
+            f".edge-label{{fill:{LABEL_FILL};opacity:0.9}}</style>",
+            # Same white background mmdc gives SVGs
+            '<rect width="100%" height="100%" fill="white"/>',
+        ]
+        for edge in layout.edges:
+            parts.append(_svg_edge(edge))
+        for node in layout.nodes:
+            parts.append(_svg_node(node))
+            parts.append(_svg_text(node.lines, node.x, node.y))
+        for edge in layout.edges:
+            if edge.label:
+                w, h = _label_box(edge.label)
+                x, y = edge.label_at
+                parts.append(f'<rect class="edge-label" x="{x - w / 2:.1f}" y="{y - h / 2:.1f}" width="{w:.1f}" height="{h:.1f}"/>')
+                parts.append(_svg_text(edge.label, x, y))
+        parts.append("</svg>")
+        return "\n".join(parts)
+
+    @staticmethod
+    def to_png(layout: Layout, scale: float = 1.0) -> bytes:
+        """Transparent PNG (like mmdc's PNGs), drawn with Pillow at `scale` pixels per SVG unit."""
+        from PIL import Image, ImageDraw, ImageFont
+
+        size = (max(1, math.ceil(layout.width * scale)), max(1, math.ceil(layout.height * scale)))
+        supersample = SUPERSAMPLE if size[0] * size[1] * SUPERSAMPLE ** 2 <= SUPERSAMPLE_MAX_PIXELS else 1
+        s = scale * supersample
+        image = Image.new("RGBA", (size[0] * supersample, size[1] * supersample), (0, 0, 0, 0))
+        canvas = ImageDraw.Draw(image)
+        font = ImageFont.load_default(size=max(1, round(FONT_SIZE * s)))
+
+        def scaled(points):
+            return [(x * s, y * s) for x, y in points]
+
+        for edge in layout.edges:
+            width = max(1, round((3.5 if edge.type == "thick" else 2) * s))
+            points = scaled(edge.points)
+            tip, base = _arrow(points, s)
+            points[-1] = base # The line stops where the arrowhead starts
+            if edge.type == "dotted":
+                for segment in _dashes(points, 3 * s):
+                    canvas.line(segment, fill=EDGE_COLOR, width=width)
+            else:
+                canvas.line(points, fill=EDGE_COLOR, width=width, joint="curve")
+            canvas.polygon(tip, fill=EDGE_COLOR)
+
+        outline = max(1, round(s))
+        for node in layout.nodes:
+            _png_node(canvas, node, s, outline)
+            _png_text(canvas, font, node.lines, node.x * s, node.y * s, s)
+
+        for edge in layout.edges:
+            if edge.label:
+                w, h = _label_box(edge.label)
+                x, y = edge.label_at
+                canvas.rectangle([(x - w / 2) * s, (y - h / 2) * s, (x + w / 2) * s, (y + h / 2) * s], fill=LABEL_FILL)
+                _png_text(canvas, font, edge.label, x * s, y * s, s)
+
+        if supersample > 1:
+            image = image.reduce(supersample) # Box filter: several times faster than resampling
+        out = io.BytesIO()
+        image.save(out, format="PNG")
+        return out.getvalue()
+
+def _label_box(lines: List[str]) -> Tuple[float, float]:
+    return max(len(line) for line in lines) * CHAR_WIDTH + 8, len(lines) * LINE_HEIGHT
+
+def _outline(node: PlacedNode) -> List[Tuple[float, float]]:
+    """Polygon corners for the straight-sided shapes."""
+    x, y, hw, hh = node.x, node.y, node.width / 2, node.height / 2
+    if node.shape in ("diamond", "decision"):
+        return [(x, y - hh), (x + hw, y), (x, y + hh), (x - hw, y)]
+    if node.shape == "parallelogram":
+        skew = node.height / 4
+        return [(x - hw + skew, y - hh), (x + hw, y - hh), (x + hw - skew, y + hh), (x - hw, y + hh)]
+    return [(x - hw, y - hh), (x + hw, y - hh), (x + hw, y + hh), (x - hw, y + hh)]
+
+def _svg_node(node: PlacedNode) -> str:
+    x, y, hw, hh = node.x, node.y, node.width / 2, node.height / 2
+    if node.shape == "circle":
+        return f'<circle class="node" cx="{x:.1f}" cy="{y:.1f}" r="{hw:.1f}"/>'
+    if node.shape == "cylinder":
+        ry = cylinder_ry(node.width)
+        top, bottom = y - hh + ry, y + hh - ry
+        return (
+            f'<path class="node" d="M{x - hw:.1f},{top:.1f} a{hw:.1f},{ry:.1f} 0 0,0 {2 * hw:.1f},0 '
+            f'a{hw:.1f},{ry:.1f} 0 0,0 {-2 * hw:.1f},0 l0,{bottom - top:.1f} '
+            f'a{hw:.1f},{ry:.1f} 0 0,0 {2 * hw:.1f},0 l0,{top - bottom:.1f}"/>'
+        )
+    points = " ".join(f"{px:.1f},{py:.1f}" for px, py in _outline(node))
+    return f'<polygon class="node" points="{points}"/>'
+
+def _svg_edge(edge: PlacedEdge) -> str:
+    classes = "edge" + (f" {edge.type}" if edge.type in ("dotted", "thick") else "")
+    d = " ".join(f"{'M' if i == 0 else 'L'}{x:.1f},{y:.1f}" for i, (x, y) in enumerate(edge.points))
+    return f'<path class="{classes}" d="{d}" marker-end="url(#arrowhead)"/>'
+
+def _svg_text(lines: List[str], x: float, y: float) -> str:
+    first = y - (len(lines) - 1) * LINE_HEIGHT / 2
+    spans = "".join(
+        f'<tspan x="{x:.1f}" y="{first + i * LINE_HEIGHT:.1f}">{escape(line)}</tspan>' for i, line in enumerate(lines)
+    )
+    return f'<text text-anchor="middle" dominant-baseline="central">{spans}</text>'
+
+def _png_node(canvas, node: PlacedNode, s: float, outline: int):
+    x, y, hw, hh = node.x * s, node.y * s, node.width / 2 * s, node.height / 2 * s
+    if node.shape == "circle":
+        canvas.ellipse([x - hw, y - hh, x + hw, y + hh], fill=NODE_FILL, outline=NODE_STROKE, width=outline)
+    elif node.shape == "cylinder":
+        ry = cylinder_ry(node.width) * s
+        top, bottom = y - hh + ry, y + hh - ry
+        canvas.ellipse([x - hw, bottom - ry, x + hw, bottom + ry], fill=NODE_FILL, outline=NODE_STROKE, width=outline)
+        canvas.rectangle([x - hw, top, x + hw, bottom], fill=NODE_FILL)
+        canvas.line([(x - hw, top), (x - hw, bottom)], fill=NODE_STROKE, width=outline)
+        canvas.line([(x + hw, top), (x + hw, bottom)], fill=NODE_STROKE, width=outline)
+        canvas.ellipse([x - hw, top - ry, x + hw, top + ry], fill=NODE_FILL, outline=NODE_STROKE, width=outline)
+    else:
+        canvas.polygon([(px * s, py * s) for px, py in _outline(node)], fill=NODE_FILL, outline=NODE_STROKE, width=outline)
+
+def _png_text(canvas, font, lines: List[str], x: float, y: float, s: float):
+    # Centered on each line (anchor="mm" needs a FreeType font, which load_default(size=...) gives)
+    first = y - (len(lines) - 1) * LINE_HEIGHT * s / 2
+    for i, line in enumerate(lines):
+        canvas.text((x, first + i * LINE_HEIGHT * s), line, fill=TEXT_COLOR, font=font, anchor="mm")
+
+def _arrow(points: List[Tuple[float, float]], s: float) -> Tuple[List[Tuple[float, float]], Tuple[float, float]]:
+    """Arrowhead triangle at the end of a scaled polyline, and where the line should stop."""
+    (x0, y0), (x1, y1) = points[-2], points[-1]
+    length = math.hypot(x1 - x0, y1 - y0) or 1.0
+    ux, uy = (x1 - x0) / length, (y1 - y0) / length
+    head, half = ARROW_LENGTH * s, ARROW_WIDTH / 2 * s
+    bx, by = x1 - ux * head, y1 - uy * head
+    return [(x1, y1), (bx - uy * half, by + ux * half), (bx + uy * half, by - ux * half)], (bx, by)
+
+def _dashes(points: List[Tuple[float, float]], dash: float) -> List[List[Tuple[float, float]]]:
+    """Segments of a dashed polyline (equal dashes and gaps)."""
+    segments, drawing, left = [], True, dash
+    current = [points[0]]
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        length = math.hypot(x1 - x0, y1 - y0)
+        pos = 0.0
+        while length - pos > left:
+            pos += left
+            point = (x0 + (x1 - x0) * pos / length, y0 + (y1 - y0) * pos / length)
+            if drawing:
+                current.append(point)
+                segments.append(current)
+            current = [point]
+            drawing, left = not drawing, dash
+        left -= length - pos
+        if drawing:
+            current.append((x1, y1))
+    if drawing and len(current) > 1:
+        segments.append(current)
+    return segments
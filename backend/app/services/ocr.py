@@ -1,9 +1,18 @@
 
+import asyncio
+import math
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import easyocr
 import numpy as np
-from typing import List, Dict, Any
 from loguru import logger
+from backend.app.core.config import settings
 from backend.app.core.errors import OCRFailure
+from backend.app.core.executor import cpu_executor
+from backend.app.services.reconcile import GridIndex
 
 class OCRService:
     def __init__(self, languages: List[str] = ['en']):
@@ -53,3 +62,201 @@ class OCRService:
         # TODO: Implement complex merging logic if needed. 
         # For MVP, we return raw results or simple concatenation if strictly required.
         return ocr_results
+
+
+class OCREnginePool:
+    """
+    Process-wide pool of pre-loaded EasyOCR readers.
+    Loading the detector/recognizer weights takes seconds, so readers are
+    created once (ideally at startup) and checked out by jobs.
+    """
+    def __init__(self, size: int = 1, languages: Optional[List[str]] = None):
+        self.size = max(1, size)
+        self.languages = languages or ['en']
+        self.error: Optional[str] = None
+        self._engines: "queue.Queue[OCRService]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def warm_up(self):
+        """
+        Loads readers until the pool is full. Safe to call concurrently or repeatedly.
+        """
+        with self._lock:
+            if self._ready.is_set():
+                return
+            try:
+                while self._created < self.size:
+                    self._engines.put(OCRService(self.languages))
+                    self._created += 1
+                    logger.info(f"OCR engine {self._created}/{self.size} loaded")
+            except OCRFailure as e:
+                self.error = e.message
+                raise
+            self.error = None
+            self._ready.set()
+
+    def grow(self, size: int):
+        """Loads more readers until there are at least `size` (blocking); loaded ones stay in use meanwhile."""
+        if not self.ready:
+            self.warm_up()
+        with self._lock:
+            while self._created < size:
+                self._engines.put(OCRService(self.languages))
+                self._created += 1
+                logger.info(f"OCR engine {self._created}/{size} loaded for tiled OCR")
+            self.size = max(self.size, self._created)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[OCRService]:
+        """
+        Checks out a reader for the duration of the block.
+        Loads the pool lazily if startup warm-up was skipped.
+        """
+        if not self.ready:
+            self.warm_up()
+
+        try:
+            engine = self._engines.get(timeout=timeout)
+        except queue.Empty:
+            raise OCRFailure(f"No OCR engine became available within {timeout}s")
+
+        try:
+            yield engine
+        finally:
+            self._engines.put(engine)
+
+
+ocr_pool = OCREnginePool(size=settings.OCR_POOL_SIZE, languages=settings.OCR_LANGUAGES)
+
+def extract_text_pooled(image: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Runs OCR on a reader checked out of this process's pool.
+    Module-level so CPU executor workers (threads or processes) can call it.
+    """
+    with ocr_pool.acquire(timeout=settings.OCR_ACQUIRE_TIMEOUT) as engine:
+        return engine.extract_text(image)
+
+def warm_up_ocr_engines() -> bool:
+    ocr_pool.warm_up()
+    return True
+
+def plan_tiles(width: int, height: int, tile_size: int, overlap: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Overlapping (x, y, w, h) tiles covering the image. Tiles are spread evenly,
+    so neighbours overlap by at least `overlap` and the last one isn't a sliver.
+    """
+    if tile_size <= overlap:
+        raise ValueError(f"OCR tile size ({tile_size}) must be larger than the overlap ({overlap})")
+
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        count = math.ceil((length - overlap) / (tile_size - overlap))
+        return np.linspace(0, length - tile_size, count).round().astype(int).tolist()
+
+    return [(x, y, min(tile_size, width), min(tile_size, height)) for y in starts(height) for x in starts(width)]
+
+def merge_tiles(
+    tiles: List[Tuple[int, int, int, int]],
+    tile_results: List[List[Dict[str, Any]]],
+    width: int,
+    height: int,
+    edge: int = 3,
+) -> List[Dict[str, Any]]:
+    """
+    Tile detections moved to image coordinates, with text read twice in an
+    overlap kept once. A detection touching a tile side that isn't the image
+    border may be cut off, so a whole copy from the neighbouring tile wins over
+    it; otherwise the more confident copy wins.
+    """
+    merged, boxes, cut = [], [], []
+    for (tx, ty, tw, th), results in zip(tiles, tile_results):
+        # Tile sides shared with a neighbour (left, top, right, bottom)
+        inner = (tx > 0, ty > 0, tx + tw < width, ty + th < height)
+        for r in results:
+            xs, ys = [p[0] for p in r["bbox"]], [p[1] for p in r["bbox"]]
+            x1, y1, x2, y2 = min(xs), min(ys), max(xs), max(ys)
+            merged.append({**r, "bbox": [[x + tx, y + ty] for x, y in r["bbox"]]})
+            boxes.append([x1 + tx, y1 + ty, x2 + tx, y2 + ty])
+            cut.append(any(side and d <= edge for side, d in zip(inner, (x1, y1, tw - x2, th - y2))))
+    if not merged:
+        return merged
+
+    # Only text lying in more than one tile can have been read twice
+    boxes = np.asarray(boxes, np.float64)
+    t = np.asarray(tiles, np.float64)
+    in_tiles = (
+        (boxes[:, None, 0] < t[None, :, 0] + t[None, :, 2]) & (boxes[:, None, 2] > t[None, :, 0])
+        & (boxes[:, None, 1] < t[None, :, 1] + t[None, :, 3]) & (boxes[:, None, 3] > t[None, :, 1])
+    ).sum(axis=1)
+    candidates = np.flatnonzero(in_tiles > 1)
+    if len(candidates) < 2:
+        return merged
+
+    # Duplicates: boxes mostly covering each other, resolved greedily best-first.
+    # A box at least half covered has its center inside the other, so center lookups find every pair.
+    b = boxes[candidates]
+    sides = np.maximum(b[:, 2:] - b[:, :2], 1)
+    i, j = GridIndex(b, float(np.median(sides.max(axis=1)))).candidates((b[:, :2] + b[:, 2:]) / 2)
+    i, j = i[i != j], j[i != j]
+    inter = (
+        np.maximum(np.minimum(b[i, 2], b[j, 2]) - np.maximum(b[i, 0], b[j, 0]), 0)
+        * np.maximum(np.minimum(b[i, 3], b[j, 3]) - np.maximum(b[i, 1], b[j, 1]), 0)
+    )
+    area = sides.prod(axis=1)
+    covered = inter >= 0.5 * np.minimum(area[i], area[j])
+    # Symmetric neighbour lists in CSR form
+    i, j = np.concatenate([i[covered], j[covered]]), np.concatenate([j[covered], i[covered]])
+    by_box = np.argsort(i, kind="stable")
+    neighbours, starts = j[by_box], np.searchsorted(i[by_box], np.arange(len(candidates) + 1))
+
+    confidence = np.asarray([merged[k]["confidence"] for k in candidates])
+    dropped = np.zeros(len(candidates), bool)
+    for k in np.lexsort((-confidence, np.asarray(cut)[candidates])).tolist():
+        if not dropped[k]:
+            dropped[neighbours[starts[k]:starts[k + 1]]] = True
+    drop = set(candidates[dropped].tolist())
+    return [r for k, r in enumerate(merged) if k not in drop]
+
+async def extract_text_tiled(image: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    OCR of a large image as overlapping tiles recognized in parallel, stitched
+    back into one result list in image coordinates.
+    """
+    height, width = image.shape[:2]
+    tiles = plan_tiles(width, height, settings.OCR_TILE_SIZE, settings.OCR_TILE_OVERLAP)
+    parallel = min(tile_parallelism(), len(tiles))
+    if cpu_executor.kind == "thread" and ocr_pool.size < parallel:
+        # Each tile in flight needs its own reader from this process's pool
+        await asyncio.to_thread(ocr_pool.grow, parallel)
+    slots = asyncio.Semaphore(parallel)
+
+    async def run_tile(tile):
+        x, y, w, h = tile
+        async with slots:
+            return await cpu_executor.run(extract_text_pooled, image[y:y + h, x:x + w], stage="ocr_tile")
+
+    tile_results = await asyncio.gather(*(run_tile(tile) for tile in tiles))
+    results = merge_tiles(tiles, tile_results, width, height)
+    logger.info(
+        f"Tiled OCR: {len(tiles)} tiles of {settings.OCR_TILE_SIZE}px ({parallel} in parallel), "
+        f"{sum(len(r) for r in tile_results)} detections, {len(results)} after merging overlaps"
+    )
+    return results
+
+def tile_parallelism() -> int:
+    """Tiles of one image recognized at once: OCR_TILE_PARALLELISM, or one per CPU core."""
+    parallel = settings.OCR_TILE_PARALLELISM or os.cpu_count() or 1
+    if cpu_executor.kind != "thread":
+        # Process mode: each worker process recognizes one tile at a time with its own reader
+        parallel = min(parallel, cpu_executor.max_workers)
+    return max(1, parallel)
+
+def needs_tiling(image: np.ndarray) -> bool:
+    return 0 < settings.OCR_TILE_THRESHOLD < max(image.shape[:2])
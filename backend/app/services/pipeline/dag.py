@@ -0,0 +1,165 @@
+
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+from pydantic import BaseModel
+from backend.app.core.metrics import metrics
+from backend.app.core.tracing import tracer
+
+stage_seconds = metrics.histogram("pipeline_stage_seconds", "Wall time of each pipeline stage")
+critical_path_seconds = metrics.histogram("pipeline_critical_path_seconds", "Time each stage contributed to a job's critical path")
+
+class StageTiming(BaseModel):
+    start: float # Seconds since the run started
+    end: float
+    duration: float
+    slack: float # How much later this stage could have finished without delaying the job
+
+class RunReport(BaseModel):
+    total_seconds: float
+    stages: Dict[str, StageTiming]
+    critical_path: List[str]
+    substages: Dict[str, Dict[str, float]] = {} # Finer timings reported by stages, e.g. preprocessing operators
+
+    def breakdown(self) -> str:
+        return " -> ".join(f"{name} {self.stages[name].duration:.2f}s" for name in self.critical_path)
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[..., Awaitable[Any]], after: Tuple[str, ...]):
+        self.name = name
+        self.fn = fn
+        self.after = after
+
+class StageGraph:
+    """
+    A set of async stages with declared dependencies.
+    Each stage is called with its dependencies' results as keyword arguments
+    and starts as soon as they are all available, so independent stages
+    run concurrently.
+    """
+    def __init__(self):
+        self._stages: Dict[str, Stage] = {}
+        # Stages may record their own breakdown here; it is copied into the report
+        self.substages: Dict[str, Dict[str, float]] = {}
+
+    def stage(self, name: str, after: Iterable[str] = ()):
+        def decorator(fn):
+            self.add(name, fn, after)
+            return fn
+        return decorator
+
+    def add(self, name: str, fn: Callable[..., Awaitable[Any]], after: Iterable[str] = ()):
+        if name in self._stages:
+            raise ValueError(f"Duplicate pipeline stage: {name}")
+        if not inspect.iscoroutinefunction(fn):
+            raise TypeError(f"Pipeline stage {name} must be an async function")
+        self._stages[name] = Stage(name, fn, tuple(after))
+
+    def order(self) -> List[str]:
+        """Topological order of the stages; raises on unknown dependencies or cycles."""
+        for stage in self._stages.values():
+            missing = [dep for dep in stage.after if dep not in self._stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage(s): {', '.join(missing)}")
+
+        ordered, done = [], set()
+        remaining = dict(self._stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items() if all(dep in done for dep in stage.after)]
+            if not ready:
+                raise ValueError(f"Pipeline stages form a cycle: {', '.join(remaining)}")
+            for name in ready:
+                ordered.append(name)
+                done.add(name)
+                del remaining[name]
+        return ordered
+
+    async def run(self, listener: Optional[Callable[[str, str, Optional[float]], None]] = None) -> Tuple[Dict[str, Any], RunReport]:
+        """
+        Runs every stage and returns their results plus timings.
+        If a stage fails, the stages still running are cancelled and the error is raised.
+        `listener(stage, state, duration)` is told when each stage starts, finishes or fails.
+        """
+        self.order()
+        started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        times: Dict[str, Tuple[float, float]] = {}
+        pending = dict(self._stages)
+        running: Dict[asyncio.Task, str] = {}
+
+        def notify(name: str, state: str, duration: Optional[float] = None):
+            if listener:
+                try:
+                    listener(name, state, duration)
+                except Exception as e:
+                    logger.warning(f"Pipeline listener failed for stage {name}: {e}")
+
+        async def call(stage: Stage):
+            begin = time.perf_counter()
+            notify(stage.name, "started")
+            try:
+                with tracer.span(f"stage.{stage.name}"):
+                    result = await stage.fn(**{dep: results[dep] for dep in stage.after})
+            except Exception:
+                notify(stage.name, "failed", time.perf_counter() - begin)
+                raise
+            finally:
+                times[stage.name] = (begin - started, time.perf_counter() - started)
+            notify(stage.name, "finished", time.perf_counter() - begin)
+            return result
+
+        try:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(dep in results for dep in stage.after):
+                        del pending[name]
+                        running[asyncio.create_task(call(stage))] = name
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[running.pop(task)] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        report = self.report(times, time.perf_counter() - started)
+        for name, timing in report.stages.items():
+            stage_seconds.observe(timing.duration, stage=name)
+        for name in report.critical_path:
+            critical_path_seconds.observe(report.stages[name].duration, stage=name)
+        return results, report
+
+    def report(self, times: Dict[str, Tuple[float, float]], total: float) -> RunReport:
+        dependents: Dict[str, List[str]] = {name: [] for name in self._stages}
+        for stage in self._stages.values():
+            for dep in stage.after:
+                dependents[dep].append(stage.name)
+
+        stages = {}
+        for name, (start, end) in times.items():
+            # A stage only holds the job up until its earliest dependent could start
+            deadline = min((times[d][0] for d in dependents[name] if d in times), default=total)
+            stages[name] = StageTiming(
+                start=round(start, 4),
+                end=round(end, 4),
+                duration=round(end - start, 4),
+                slack=round(max(0.0, deadline - end), 4),
+            )
+
+        # Walk back from the stage that finished last through whichever dependency finished last
+        path = []
+        if times:
+            name = max(times, key=lambda n: times[n][1])
+            while name:
+                path.append(name)
+                deps = [dep for dep in self._stages[name].after if dep in times]
+                name = max(deps, key=lambda d: times[d][1]) if deps else None
+
+        return RunReport(
+            total_seconds=round(total, 4),
+            stages=stages,
+            critical_path=list(reversed(path)),
+            substages={name: {k: round(v, 4) for k, v in values.items()} for name, values in self.substages.items()},
+        )
@@ -0,0 +1,230 @@
+
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.executor import cpu_executor
+from backend.app.services.storage import StorageService
+from backend.app.services.cache import result_cache, ResultCache
+from backend.app.services.delivery import precompress
+from backend.app.services.preprocessing import ImagePreprocessor
+from backend.app.services.ocr import extract_text_pooled, extract_text_tiled, needs_tiling
+from backend.app.services.vision.payload import PayloadOptimizer
+from backend.app.services.vision.registry import get_vision_provider
+from backend.app.services.vision.prompts import FLOWCHART_PROMPT
+from backend.app.services.inference import InferenceEngine
+from backend.app.services.mermaid.generator import MermaidGenerator
+from backend.app.services.mermaid.renderer import MermaidRenderer
+from backend.app.services.native.renderer import NativeRenderer
+from backend.app.core.metrics import metrics
+from backend.app.core.tracing import current_span
+from backend.app.services.pipeline.dag import StageGraph
+
+operator_seconds = metrics.histogram("preprocess_operator_seconds", "Time spent in each preprocessing operator")
+vision_routes = metrics.counter("vision_route_total", "Vision stage answers by source (local detector or remote provider)")
+first_item_seconds = metrics.histogram("vision_first_item_seconds", "Time from starting the vision call (rate limit waits included) to its first node or edge")
+
+def build_flowchart_graph(
+    input_path: str,
+    job_dir: str,
+    status_callback: Optional[Callable] = None,
+    debug: bool = False,
+    event_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> StageGraph:
+    """
+    Image -> Mermaid stages for one job.
+
+        image_hash ─┬──────────────┬─> ocr ────┬─> inference -> generate -> render
+        load -> preprocess ────────┴─> vision ─┘
+          └─> debug_artifacts (debug only)
+
+    OCR and vision only share the preprocessed image, so they run side by side.
+    While a vision response streams in, its nodes and edges are added to the graph
+    as they arrive and `event_callback("partial", ...)` is sent the diagram so far;
+    the inference stage then only has to resolve edges and apply OCR.
+    """
+    graph = StageGraph()
+    engine = InferenceEngine()
+
+    @graph.stage("image_hash")
+    async def image_hash():
+        # Identical uploads share cached OCR/vision results; normally recorded while the upload streamed in
+        return await asyncio.to_thread(StorageService.input_sha256, input_path)
+
+    @graph.stage("load")
+    async def load():
+        logger.info(f"Step 1: Preprocessing {input_path}")
+        image = await cpu_executor.run(ImagePreprocessor.load_image, input_path, stage="load")
+        current_span().set(width=image.shape[1], height=image.shape[0], bytes=os.path.getsize(input_path))
+        return image
+
+    @graph.stage("preprocess", after=["load"])
+    async def preprocess(load):
+        # Only the operators feeding OCR/vision run here
+        processed, timings = await cpu_executor.run(ImagePreprocessor.preprocess_timed, load, stage="preprocess")
+        for operator, seconds in timings.items():
+            operator_seconds.observe(seconds, operator=operator)
+        graph.substages["preprocess"] = timings
+        return processed
+
+    if debug or settings.DEBUG_ARTIFACTS:
+        # Nothing depends on it, so it runs alongside OCR/vision instead of delaying them
+        @graph.stage("debug_artifacts", after=["load"])
+        async def debug_artifacts(load):
+            return await cpu_executor.run(ImagePreprocessor.write_debug_artifacts, load, job_dir, stage="debug")
+
+    @graph.stage("ocr", after=["preprocess", "image_hash"])
+    async def ocr(preprocess, image_hash):
+        logger.info("Step 2: OCR Extraction")
+
+        tiled = needs_tiling(preprocess)
+        current_span().set(tiled=tiled)
+
+        async def run_ocr():
+            if tiled:
+                return await extract_text_tiled(preprocess)
+            return await cpu_executor.run(extract_text_pooled, preprocess, stage="ocr")
+
+        ocr_key = ResultCache.make_key(
+            "ocr", image_hash, ",".join(settings.OCR_LANGUAGES), settings.ENABLE_PREPROCESSING, settings.PREPROCESS_OUTPUT,
+            *((settings.OCR_TILE_SIZE, settings.OCR_TILE_OVERLAP) if tiled else ())
+        )
+        ocr_results = await result_cache.get_or_compute(ocr_key, run_ocr, stage="ocr")
+        logger.info(f"OCR found {len(ocr_results)} text items")
+        return ocr_results
+
+    @graph.stage("vision", after=["load", "preprocess", "image_hash"])
+    async def vision(load, preprocess, image_hash):
+        logger.info(f"Step 3: Vision Analysis (Provider: {settings.VISION_PROVIDER})")
+        vision_provider = get_vision_provider()
+        current_span().set(provider=vision_provider.name, model=vision_provider.model_name)
+
+        if vision_provider.name == "local" or settings.VISION_LOCAL_FIRST:
+            # Contour detection on the binary we already have; bboxes are in original pixels.
+            # Labels are left to OCR reconciliation.
+            try:
+                local = await get_vision_provider("local").analyze(
+                    load, FLOWCHART_PROMPT, binary=preprocess,
+                    # Layouts it can't read are turned away early, unless there is nothing to escalate to
+                    screen=vision_provider.name != "local",
+                )
+            except Exception as e:
+                if vision_provider.name == "local":
+                    raise
+                logger.warning(f"Local vision failed, escalating to {vision_provider.name}: {e}")
+                local = {"confidence": 0.0}
+            current_span().set(local_confidence=local["confidence"])
+            if vision_provider.name == "local" or local["confidence"] >= settings.LOCAL_VISION_MIN_CONFIDENCE:
+                current_span().set(route="local")
+                vision_routes.inc(route="local")
+                return local
+            logger.info(
+                f"Local vision confidence {local['confidence']:.2f} < {settings.LOCAL_VISION_MIN_CONFIDENCE}, "
+                f"escalating to {vision_provider.name}"
+            )
+            current_span().set(route="escalated")
+            vision_routes.inc(route="escalated")
+
+        vision_key = ResultCache.make_key(
+            "vision",
+            image_hash,
+            vision_provider.name,
+            vision_provider.model_name,
+            hashlib.sha256(FLOWCHART_PROMPT.encode("utf-8")).hexdigest(),
+            PayloadOptimizer.settings_key()
+        )
+
+        async def run_vision():
+            # Cropped/downscaled upload; bboxes come back in payload pixels and are mapped to the original
+            payload = await cpu_executor.run(PayloadOptimizer.prepare, load, preprocess, stage="payload")
+            current_span().set(payload_width=payload.width, payload_height=payload.height, payload_bytes=len(payload.data))
+            logger.info(
+                f"Vision payload: {payload.width}x{payload.height} {payload.mime_type}, "
+                f"{len(payload.data) / 1024:.0f} KiB (original {payload.original_width}x{payload.original_height})"
+            )
+            sent = time.perf_counter()
+            streamed = {"first": True, "failed": False, "published": 0.0}
+            # Previews only help while the answer is still coming in
+            publish = event_callback is not None and settings.VISION_PARTIAL_INTERVAL > 0 and vision_provider.streaming
+
+            def on_item(kind: str, item: Dict[str, Any]):
+                if kind == "reset":
+                    # The call that reported them was retried or lost a hedged race
+                    engine.reset()
+                    streamed["failed"] = False
+                    return
+                if streamed["failed"]:
+                    return
+                if streamed["first"]:
+                    streamed["first"] = False
+                    first_item_seconds.observe(time.perf_counter() - sent, provider=vision_provider.name)
+                try:
+                    if kind == "node":
+                        engine.add_node(payload.node_to_original(item))
+                    else:
+                        engine.add_edge(item)
+                    if publish and time.monotonic() - streamed["published"] >= settings.VISION_PARTIAL_INTERVAL:
+                        streamed["published"] = time.monotonic()
+                        event_callback("partial", _partial_event(engine))
+                except Exception as e:
+                    # The inference stage builds the graph from the complete response instead
+                    logger.warning(f"Incremental graph building stopped: {e}")
+                    streamed["failed"] = True
+                    engine.reset()
+
+            raw = await vision_provider.analyze_streaming(
+                load, FLOWCHART_PROMPT, on_item, status_callback=status_callback, payload=payload
+            )
+            current_span().set(streamed_nodes=engine.raw_node_count, streamed_edges=len(engine.raw_edges))
+            return payload.to_original_coords(raw)
+
+        return await result_cache.get_or_compute(vision_key, run_vision, stage="vision")
+
+    @graph.stage("inference", after=["vision", "ocr"])
+    async def inference(vision, ocr):
+        logger.info("Step 4: Structure Inference")
+        if (engine.raw_node_count or engine.raw_edges) and engine.fed_all(vision):
+            # Built while the vision response streamed in
+            current_span().set(incremental=True)
+            return engine.finish(ocr, vision.get("diagram_type", "flowchart"))
+        return InferenceEngine().build_graph(vision, ocr)
+
+    @graph.stage("generate", after=["inference"])
+    async def generate(inference):
+        logger.info("Step 5: Mermaid Code Generation")
+        mermaid_code = MermaidGenerator.generate_code(inference)
+        mmd_path = os.path.join(job_dir, "diagram.mmd")
+        await asyncio.to_thread(StorageService.write_text, mmd_path, mermaid_code)
+        await cpu_executor.run(precompress, mmd_path, stage="precompress")
+        # Lets the native renderer draw the SVG later without parsing Mermaid
+        await asyncio.to_thread(StorageService.write_text, os.path.join(job_dir, "diagram.json"), inference.model_dump_json())
+        return mermaid_code
+
+    @graph.stage("render", after=["generate", "inference"])
+    async def render(generate, inference) -> bool:
+        png_path = os.path.join(job_dir, "diagram.png")
+        try:
+            if NativeRenderer.selected():
+                logger.info("Step 6: Rendering (native)")
+                await NativeRenderer().render(inference, output_format="png", output_path=png_path)
+            else:
+                logger.info("Step 6: Rendering")
+                await MermaidRenderer().render(generate, output_format="png", output_path=png_path)
+            return True
+        except Exception as e:
+            # Non-fatal if we just want the code
+            logger.warning(f"Rendering failed (likely missing CLI): {e}")
+            return False
+
+    return graph
+
+def _partial_event(engine: InferenceEngine) -> Dict[str, Any]:
+    diagram = engine.snapshot()
+    return {
+        "nodes": len(diagram.nodes),
+        "edges": len(diagram.edges),
+        "mermaid": MermaidGenerator.generate_code(diagram),
+    }
@@ -1,10 +1,33 @@
-
 import cv2
 import numpy as np
 import os
+import time
+from typing import Dict, List, Tuple
 from loguru import logger
 from backend.app.core.config import settings
 
+_CLOSING_KERNEL = np.ones((3, 3), np.uint8)
+
+# Operator chain: name -> (inputs, fn). "image" is the loaded BGR image.
+# Only the operators needed for the requested outputs are run.
+OPERATORS = {
+    # Grayscale
+    "gray": (("image",), lambda image: cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)),
+    # Denoise (Gaussian Blur)
+    "blur": (("gray",), lambda gray: cv2.GaussianBlur(gray, (5, 5), 0)),
+    # Adaptive Thresholding (good for shadows/uneven lighting)
+    "thresh": (("blur",), lambda blur: cv2.adaptiveThreshold(
+        blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2
+    )),
+    # Morphological close of small gaps; the binary image used for OCR/shape detection
+    "closing": (("thresh",), lambda thresh: cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, _CLOSING_KERNEL, iterations=1)),
+    # Canny Edge Detection (not used downstream yet, only as a debug artifact)
+    "edges": (("blur",), lambda blur: cv2.Canny(blur, 50, 150)),
+}
+
+# Intermediates written to the job dir in debug mode
+DEBUG_ARTIFACTS = {"gray": "step_1_gray.png", "thresh": "step_3_thresh.png", "edges": "step_5_edges.png"}
+
 class ImagePreprocessor:
     @staticmethod
     def load_image(file_path: str) -> np.ndarray:
@@ -13,39 +36,72 @@ class ImagePreprocessor:
             raise ValueError(f"Could not load image at {file_path}")
         return image
 
+    @staticmethod
+    def run_chain(image: np.ndarray, outputs: List[str]) -> Tuple[Dict[str, np.ndarray], Dict[str, float]]:
+        """
+        Runs just the operators `outputs` depend on.
+        Returns ({output: image}, {operator: seconds}).
+        """
+        values = {"image": image}
+        timings = {}
+
+        def compute(name: str):
+            if name in values:
+                return
+            if name not in OPERATORS:
+                raise ValueError(f"Unknown preprocessing operator: {name}")
+            inputs, fn = OPERATORS[name]
+            for dependency in inputs:
+                compute(dependency)
+            start = time.perf_counter()
+            values[name] = fn(*(values[dependency] for dependency in inputs))
+            timings[name] = time.perf_counter() - start
+
+        for name in outputs:
+            compute(name)
+        return {name: values[name] for name in outputs}, timings
+
+    @staticmethod
+    def preprocess_timed(image: np.ndarray) -> Tuple[np.ndarray, Dict[str, float]]:
+        """
+        The binary image consumed downstream (PREPROCESS_OUTPUT) plus per-operator timings.
+        """
+        if not settings.ENABLE_PREPROCESSING:
+            return image, {}
+        outputs, timings = ImagePreprocessor.run_chain(image, [settings.PREPROCESS_OUTPUT])
+        return outputs[settings.PREPROCESS_OUTPUT], timings
+
     @staticmethod
     def preprocess(image: np.ndarray, debug_output_dir: str = None) -> np.ndarray:
         """
-        Applies a standard pipeline: Grayscale -> Denoise -> Threshold -> Edge Detection
+        Applies the operator chain: Grayscale -> Denoise -> Threshold -> Close.
+        Intermediates are only computed and written when `debug_output_dir` is given.
         """
+        if not debug_output_dir:
+            return ImagePreprocessor.preprocess_timed(image)[0]
         if not settings.ENABLE_PREPROCESSING:
             return image
+        outputs, _ = ImagePreprocessor.run_chain(image, [settings.PREPROCESS_OUTPUT, *DEBUG_ARTIFACTS])
+        ImagePreprocessor._save_artifacts(outputs, debug_output_dir)
+        return outputs[settings.PREPROCESS_OUTPUT]
 
-        # 1. Grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        if debug_output_dir:
-            cv2.imwrite(os.path.join(debug_output_dir, "step_1_gray.png"), gray)
-
-        # 2. Denoise (Gaussian Blur)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        
-        # 3. Adaptive Thresholding (good for shadows/uneven lighting)
-        thresh = cv2.adaptiveThreshold(
-            blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2
-        )
-        if debug_output_dir:
-            cv2.imwrite(os.path.join(debug_output_dir, "step_3_thresh.png"), thresh)
-
-        # 4. Morphological operations to close gaps
-        kernel = np.ones((3,3), np.uint8)
-        closing = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=1) # Close small holes
-        
-        # 5. Canny Edge Detection (Optional, mostly for shape detection later)
-        edges = cv2.Canny(blurred, 50, 150)
-        if debug_output_dir:
-            cv2.imwrite(os.path.join(debug_output_dir, "step_5_edges.png"), edges)
-            
-        return closing # Returning the binary image for OCR/Shape detection
+    @staticmethod
+    def write_debug_artifacts(image: np.ndarray, output_dir: str) -> List[str]:
+        """Writes the step_*.png intermediates for inspecting a job."""
+        if not settings.ENABLE_PREPROCESSING:
+            return []
+        outputs, _ = ImagePreprocessor.run_chain(image, list(DEBUG_ARTIFACTS))
+        return ImagePreprocessor._save_artifacts(outputs, output_dir)
+
+    @staticmethod
+    def _save_artifacts(outputs: Dict[str, np.ndarray], output_dir: str) -> List[str]:
+        paths = []
+        for name, filename in DEBUG_ARTIFACTS.items():
+            path = os.path.join(output_dir, filename)
+            cv2.imwrite(path, outputs[name])
+            paths.append(path)
+        logger.debug(f"Wrote preprocessing debug artifacts to {output_dir}")
+        return paths
 
     @staticmethod
     def save_debug_image(image: np.ndarray, path: str):
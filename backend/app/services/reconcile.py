@@ -0,0 +1,158 @@
+
+import itertools
+from typing import Any, Dict, List, Tuple
+import numpy as np
+
+# Keeps the grid small for huge images with tiny boxes
+_MAX_CELLS = 1 << 16
+
+def ocr_boxes(ocr_data: List[Dict[str, Any]], min_confidence: float = 0.0) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    OCR quads as axis-aligned boxes: ((n, 4) x1/y1/x2/y2, texts, confidences).
+    Empty and low-confidence results are dropped.
+    """
+    kept = [r for r in ocr_data if r.get("text", "").strip() and r.get("confidence", 0.0) >= min_confidence and r.get("bbox")]
+    if not kept:
+        return np.zeros((0, 4), np.float32), [], np.zeros(0, np.float32)
+    # Flattened first: building an array from nested lists is several times slower
+    coords = itertools.chain.from_iterable(itertools.chain.from_iterable(r["bbox"] for r in kept))
+    quads = np.fromiter(coords, np.float32, count=8 * len(kept)).reshape(-1, 4, 2)
+    boxes = np.concatenate([quads.min(axis=1), quads.max(axis=1)], axis=1)
+    return boxes, [r["text"].strip() for r in kept], np.asarray([r["confidence"] for r in kept], np.float32)
+
+def xywh_to_xyxy(bboxes: np.ndarray) -> np.ndarray:
+    return np.concatenate([bboxes[:, :2], bboxes[:, :2] + bboxes[:, 2:]], axis=1)
+
+def _expand(starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """For runs (start, count): the run index and position of every element, without a Python loop."""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, np.repeat(starts, counts) + offsets
+
+class GridIndex:
+    """
+    Uniform grid over axis-aligned boxes. Cells map to the boxes overlapping
+    them in CSR form (sorted box ids plus per-cell offsets), so both building
+    and querying are vectorized.
+    """
+    def __init__(self, boxes: np.ndarray, cell_size: float):
+        self.boxes = boxes
+        self.origin = boxes[:, :2].min(axis=0) if len(boxes) else np.zeros(2, np.float32)
+        extent = (boxes[:, 2:].max(axis=0) - self.origin) if len(boxes) else np.ones(2, np.float32)
+        cell_size = max(float(cell_size), 1.0, float(np.sqrt(np.prod(extent + 1) / _MAX_CELLS)))
+        self.cell_size = cell_size
+        self.cols, self.rows = (np.floor(extent / cell_size).astype(np.int64) + 1) if len(boxes) else (1, 1)
+
+        lo = self._cells(boxes[:, :2])
+        hi = self._cells(boxes[:, 2:])
+        spans = hi - lo + 1
+        counts = spans[:, 0] * spans[:, 1]
+        box_ids, offsets = _expand(np.zeros(len(boxes), np.int64), counts)
+        dy, dx = np.divmod(offsets, spans[box_ids, 0])
+        cell_ids = (lo[box_ids, 1] + dy) * self.cols + lo[box_ids, 0] + dx
+
+        order = np.argsort(cell_ids, kind="stable")
+        self.ids = box_ids[order]
+        self.starts = np.searchsorted(cell_ids[order], np.arange(self.cols * self.rows + 1))
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        cells = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, [self.cols - 1, self.rows - 1])
+
+    def candidates(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(point index, box index) for every box sharing a cell with each point."""
+        cells = self._cells(points)
+        end = self.origin + np.array([self.cols, self.rows]) * self.cell_size
+        inside = np.all((points >= self.origin) & (points < end), axis=1)
+        flat = cells[:, 1] * self.cols + cells[:, 0]
+        starts = self.starts[flat]
+        counts = np.where(inside, self.starts[flat + 1] - starts, 0)
+        point_ids, positions = _expand(starts, counts)
+        return point_ids, self.ids[positions]
+
+def match_boxes(text_boxes: np.ndarray, node_boxes: np.ndarray, min_containment: float) -> np.ndarray:
+    """
+    Node index for every text box (-1 = none): the node holding at least
+    `min_containment` of the text's area, preferring the tightest fit (IoU)
+    when nodes overlap. Only nodes in the grid cell of the text's center are
+    compared, so the cost grows with the boxes, not their product.
+    """
+    assignment = np.full(len(text_boxes), -1, np.int64)
+    if not len(text_boxes) or not len(node_boxes):
+        return assignment
+
+    sides = np.maximum(node_boxes[:, 2:] - node_boxes[:, :2], 1)
+    index = GridIndex(node_boxes, float(np.median(sides.max(axis=1))))
+    centers = (text_boxes[:, :2] + text_boxes[:, 2:]) / 2
+    t, n = index.candidates(centers)
+    if not len(t):
+        return assignment
+
+    # Column-wise on the candidate pairs only; contiguous 1-D columns keep the fancy indexing cheap
+    tx1, ty1, tx2, ty2 = np.ascontiguousarray(text_boxes.T)
+    nx1, ny1, nx2, ny2 = np.ascontiguousarray(node_boxes.T)
+    width = np.minimum(tx2[t], nx2[n]) - np.maximum(tx1[t], nx1[n])
+    height = np.minimum(ty2[t], ny2[n]) - np.maximum(ty1[t], ny1[n])
+    inter = np.maximum(width, 0) * np.maximum(height, 0)
+    text_area = np.maximum((tx2 - tx1) * (ty2 - ty1), 1e-6)[t]
+    node_area = ((nx2 - nx1) * (ny2 - ny1))[n]
+    iou = inter / np.maximum(text_area + node_area - inter, 1e-6)
+
+    keep = inter >= min_containment * text_area
+    t, n, iou = t[keep], n[keep], iou[keep]
+    if not len(t):
+        return assignment
+    # Pairs come grouped by text box; within a group put the best IoU first and take it
+    order = np.argsort(t + (1 - iou) * 0.5, kind="stable")
+    t, n = t[order], n[order]
+    first = np.concatenate([[0], np.flatnonzero(np.diff(t)) + 1])
+    assignment[t[first]] = n[first]
+    return assignment
+
+def nearest_segments(points: np.ndarray, segments: np.ndarray, max_distance: np.ndarray) -> np.ndarray:
+    """
+    Index of the closest segment ((m, 4) x1/y1/x2/y2) to each point, or -1 if
+    it is further than `max_distance` (per point). Segments are indexed by
+    their bounding box padded by the largest allowed distance, so only nearby
+    segments are measured.
+    """
+    result = np.full(len(points), -1, np.int64)
+    if not len(points) or not len(segments):
+        return result
+
+    pad = float(max_distance.max())
+    bounds = np.concatenate([np.minimum(segments[:, :2], segments[:, 2:]) - pad, np.maximum(segments[:, :2], segments[:, 2:]) + pad], axis=1)
+    index = GridIndex(bounds, float(np.median((bounds[:, 2:] - bounds[:, :2]).min(axis=1))))
+    p, s = index.candidates(points)
+    if not len(p):
+        return result
+
+    start, direction = segments[s, :2], segments[s, 2:] - segments[s, :2]
+    offset = points[p] - start
+    along = np.clip((offset * direction).sum(axis=1) / np.maximum((direction ** 2).sum(axis=1), 1e-6), 0, 1)
+    distance = np.hypot(*(offset - along[:, None] * direction).T)
+
+    close = distance <= max_distance[p]
+    p, s, distance = p[close], s[close], distance[close]
+    if not len(p):
+        return result
+    # Candidates come grouped by point; the nearest segment of each group wins
+    order = np.lexsort((distance, p))
+    p, s = p[order], s[order]
+    first = np.concatenate([[0], np.flatnonzero(np.diff(p)) + 1])
+    result[p[first]] = s[first]
+    return result
+
+def reading_order(boxes: np.ndarray, groups: np.ndarray, line_height: float) -> np.ndarray:
+    """Indices sorted by group, then text line, then left to right."""
+    lines = np.floor((boxes[:, 1] + boxes[:, 3]) / 2 / max(line_height, 1.0))
+    return np.lexsort((boxes[:, 0], lines, groups))
+
+def join_groups(order: np.ndarray, groups: np.ndarray, texts: List[str]) -> List[Tuple[int, str]]:
+    """(group, text) for each run of equal `groups[order]`, the texts joined in that order."""
+    if not len(order):
+        return []
+    keys = groups[order]
+    bounds = [0, *(np.flatnonzero(np.diff(keys)) + 1).tolist(), len(order)]
+    order, keys = order.tolist(), keys.tolist()
+    return [(keys[lo], " ".join([texts[i] for i in order[lo:hi]])) for lo, hi in zip(bounds, bounds[1:])]
@@ -0,0 +1,193 @@
+
+import asyncio
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.errors import StorageFull
+from backend.app.core.metrics import metrics
+from backend.app.services.jobs.base import QUEUED, RUNNING, get_job_queue
+
+storage_bytes = metrics.gauge("job_storage_bytes", "Bytes used by job directories in TEMP_DIR (last GC scan plus uploads since)")
+storage_dirs = metrics.gauge("job_storage_dirs", "Job directories in TEMP_DIR at the last GC scan")
+gc_removed = metrics.counter("job_gc_removed_total", "Job directories deleted by the GC, by reason (ttl, size)")
+gc_freed_bytes = metrics.counter("job_gc_freed_bytes_total", "Bytes freed by the job directory GC")
+gc_skipped = metrics.counter("job_gc_skipped_total", "Eviction candidates kept because they were in use, by reason (active, recent)")
+gc_seconds = metrics.histogram("job_gc_seconds", "Time per job directory GC pass")
+uploads_rejected = metrics.counter("uploads_rejected_total", "Uploads refused before reading them, by reason")
+
+# Deleted job dirs are renamed here first, so readers see a whole directory or none
+TRASH_PREFIX = ".trash-"
+# Uploads over quota wake the GC early, but full scans stay at least this far apart
+MIN_PASS_INTERVAL = 10.0
+
+class JobStorage:
+    """
+    Retention for job directories (TEMP_DIR/<id[:2]>/<id>):
+
+    - TTL: dirs untouched for JOB_RETENTION_HOURS are deleted.
+    - Size: above JOB_STORAGE_MAX_MB the least recently used go first.
+      Recency is the dir's mtime, bumped by new outputs and by result downloads.
+    - Quota: above JOB_STORAGE_QUOTA_MB new uploads are refused (503 + Retry-After)
+      until a GC pass frees space.
+
+    Dirs of queued or running jobs, and any dir touched in the last
+    JOB_GC_MIN_AGE seconds (an upload still streaming in), are never deleted,
+    so the GC can run next to the workers. Several processes may collect at
+    once: each deletion starts with a rename, which only one of them wins.
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._usage: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def scan(self) -> List[Tuple[float, int, str, str]]:
+        """(mtime, bytes, job_id, path) of every job dir, sharded or from the older flat layout."""
+        entries = []
+        for top in _dirs(self.root):
+            if top.name.startswith(TRASH_PREFIX):
+                continue
+            # Two-character names are shards; anything else at the top level is a pre-sharding job dir
+            job_dirs = _dirs(top.path) if len(top.name) == 2 else [top]
+            for job_dir in job_dirs:
+                try:
+                    mtime = job_dir.stat().st_mtime
+                except OSError:
+                    continue
+                entries.append((mtime, _dir_size(job_dir.path), job_dir.name, job_dir.path))
+        return entries
+
+    def usage(self) -> int:
+        with self._lock:
+            if self._usage is None and self._wake is not None:
+                return 0 # The GC loop's first pass is measuring it
+            if self._usage is None:
+                self._usage = sum(size for _, size, _, _ in self.scan())
+                storage_bytes.set(self._usage)
+            return self._usage
+
+    def add(self, size: int):
+        """Accounts an upload until the next scan picks it up."""
+        with self._lock:
+            if self._usage is not None:
+                self._usage += size
+                storage_bytes.set(self._usage)
+
+    def check_quota(self):
+        """Raises StorageFull if job storage is over its quota (blocking on the first call; call from a thread)."""
+        quota = settings.JOB_STORAGE_QUOTA_MB * 1024 * 1024
+        if quota <= 0 or self.usage() < quota:
+            return
+        uploads_rejected.inc(reason="quota")
+        if self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        raise StorageFull(
+            f"Job storage is over its {settings.JOB_STORAGE_QUOTA_MB} MB quota, try again later",
+            retry_after=max(1, int(settings.JOB_GC_INTERVAL)) if settings.JOB_GC_INTERVAL > 0 else 300,
+        )
+
+    def collect(self) -> dict:
+        """One GC pass (blocking; call from a thread). Returns what it did."""
+        start = time.perf_counter()
+        self._clear_trash()
+        entries = self.scan()
+        now = time.time()
+        ttl = settings.JOB_RETENTION_HOURS * 3600
+        max_bytes = settings.JOB_STORAGE_MAX_MB * 1024 * 1024
+        usage = sum(size for _, size, _, _ in entries)
+        removed = {"ttl": 0, "size": 0}
+        freed = 0
+
+        entries.sort() # Least recently used first
+        kept = []
+        for mtime, size, job_id, path in entries:
+            expired = ttl > 0 and now - mtime > ttl
+            over = max_bytes > 0 and usage > max_bytes
+            if (expired or over) and self._evictable(job_id, mtime, now) and self._remove(path):
+                reason = "ttl" if expired else "size"
+                removed[reason] += 1
+                gc_removed.inc(reason=reason)
+                gc_freed_bytes.inc(size)
+                usage -= size
+                freed += size
+            else:
+                kept.append(job_id)
+
+        with self._lock:
+            self._usage = usage
+        storage_bytes.set(usage)
+        storage_dirs.set(len(kept))
+        seconds = time.perf_counter() - start
+        gc_seconds.observe(seconds)
+        if removed["ttl"] or removed["size"]:
+            logger.info(
+                f"Job storage GC: removed {removed['ttl']} expired and {removed['size']} LRU job dirs, "
+                f"freed {freed / 1024 / 1024:.1f} MB, {usage / 1024 / 1024:.1f} MB in {len(kept)} dirs ({seconds:.2f}s)"
+            )
+        return {"removed": removed, "freed_bytes": freed, "bytes": usage, "dirs": len(kept)}
+
+    def _evictable(self, job_id: str, mtime: float, now: float) -> bool:
+        if now - mtime < settings.JOB_GC_MIN_AGE:
+            gc_skipped.inc(reason="recent")
+            return False
+        job = get_job_queue().get(job_id)
+        if job is not None and job.state in (QUEUED, RUNNING):
+            gc_skipped.inc(reason="active")
+            return False
+        return True
+
+    def _remove(self, path: str) -> bool:
+        trash = os.path.join(self.root, f"{TRASH_PREFIX}{uuid.uuid4().hex}")
+        try:
+            os.rename(path, trash)
+        except OSError:
+            return False # Already gone (another process collected it)
+        shutil.rmtree(trash, ignore_errors=True)
+        return True
+
+    def _clear_trash(self):
+        # Left behind by a process that died mid-delete
+        for entry in _dirs(self.root):
+            if entry.name.startswith(TRASH_PREFIX):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    async def run(self):
+        """GC loop for the API lifespan: a pass every JOB_GC_INTERVAL seconds, or sooner when uploads hit the quota."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await asyncio.to_thread(self.collect)
+            except Exception as e:
+                logger.error(f"Job storage GC failed: {e}")
+            await asyncio.sleep(min(MIN_PASS_INTERVAL, settings.JOB_GC_INTERVAL))
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, settings.JOB_GC_INTERVAL - MIN_PASS_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+
+def _dirs(path: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(path) as it:
+            return [entry for entry in it if entry.is_dir(follow_symlinks=False)]
+    except OSError:
+        return []
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+job_storage = JobStorage(settings.TEMP_DIR)
@@ -1,43 +1,168 @@
-
+import asyncio
+import glob
+import hashlib
 import os
 import shutil
 import uuid
-from typing import Tuple
+from typing import Awaitable, Callable, Optional, Tuple
 from fastapi import UploadFile
 from backend.app.core.config import settings
-from backend.app.core.errors import StorageError
+from backend.app.core.errors import AppError, PayloadTooLarge, StorageError, ValidationError
+from backend.app.services.retention import job_storage
 from loguru import logger
 
+# Leading bytes of the formats OpenCV can decode
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"BM", ".bmp"),
+    (b"II*\x00", ".tif"),
+    (b"MM\x00*", ".tif"),
+]
+
+# Sidecar holding the upload's SHA-256, computed while it streamed to disk
+INPUT_HASH_FILE = "input.sha256"
+# Files in a job dir that are not the uploaded image
+GENERATED_FILES = [
+    "diagram.mmd", "diagram.png", "diagram.svg", "diagram.json", "timings.json", INPUT_HASH_FILE,
+    "diagram.mmd.gz", "diagram.mmd.br", "diagram.svg.gz", "diagram.svg.br",
+]
+GENERATED_PREFIXES = ("debug_", "step_")
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Returns the file extension for a supported image header, or None."""
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return None
+
 class StorageService:
     @staticmethod
-    async def save_upload(file: UploadFile) -> Tuple[str, str]:
+    async def save_upload(file: UploadFile) -> Tuple[str, str, str]:
         """
-        Saves an uploaded file to a unique job directory.
-        Returns: (job_id, file_path)
+        Streams an uploaded image to a unique job directory in chunks, hashing it on the way.
+        Returns: (job_id, file_path, sha256)
         """
+        return await StorageService.save_stream(file.read)
+
+    @staticmethod
+    async def save_stream(read: Callable[[int], Awaitable[bytes]]) -> Tuple[str, str, str]:
+        """
+        Same as save_upload for any async `read(size)` source (e.g. a zip member).
+        Returns: (job_id, file_path, sha256)
+        """
+        # Back-pressure: refuse before reading anything while storage is over quota
+        await asyncio.to_thread(job_storage.check_quota)
+
         job_id = str(uuid.uuid4())
-        job_dir = os.path.join(settings.TEMP_DIR, job_id)
-        
+        job_dir = StorageService.get_job_dir(job_id)
+        max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
+
         try:
-            os.makedirs(job_dir, exist_ok=True)
-            
-            # Sanitize filename (basic)
-            filename = os.path.basename(file.filename)
-            file_path = os.path.join(job_dir, filename)
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-                
-            logger.info(f"Saved file for job {job_id} at {file_path}")
-            return job_id, file_path
-            
+            # Trust the bytes, not the client's content_type
+            chunk = await read(settings.UPLOAD_CHUNK_SIZE)
+            extension = sniff_image_type(chunk)
+            if extension is None:
+                raise ValidationError("File must be a PNG, JPEG, BMP, TIFF or WebP image")
+
+            file_path = os.path.join(job_dir, f"input{extension}")
+            digest = hashlib.sha256()
+            size = 0
+
+            buffer = await asyncio.to_thread(StorageService._open_input, job_dir, file_path)
+            try:
+                while chunk:
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise PayloadTooLarge(f"File is larger than the {settings.MAX_UPLOAD_MB} MB upload limit")
+                    await asyncio.to_thread(StorageService._write_chunk, buffer, digest, chunk)
+                    chunk = await read(settings.UPLOAD_CHUNK_SIZE)
+            finally:
+                await asyncio.to_thread(buffer.close)
+
+            sha256 = digest.hexdigest()
+            await asyncio.to_thread(StorageService._write_hash, job_dir, sha256)
+            job_storage.add(size)
+
+            logger.info(f"Saved file for job {job_id} at {file_path} ({size} bytes)")
+            return job_id, file_path, sha256
+
+        except AppError:
+            await asyncio.to_thread(StorageService.remove_job_dir, job_dir)
+            raise
         except Exception as e:
             logger.error(f"Failed to save file: {e}")
-            # Cleanup if partially created
-            if os.path.exists(job_dir):
-                shutil.rmtree(job_dir)
+            await asyncio.to_thread(StorageService.remove_job_dir, job_dir)
             raise StorageError(f"Could not save uploaded file: {str(e)}")
 
+    @staticmethod
+    def _open_input(job_dir: str, file_path: str):
+        os.makedirs(job_dir, exist_ok=True)
+        return open(file_path, "wb")
+
+    @staticmethod
+    def _write_hash(job_dir: str, sha256: str):
+        StorageService.write_text(os.path.join(job_dir, INPUT_HASH_FILE), sha256)
+
+    @staticmethod
+    def write_text(path: str, text: str):
+        """Writes a job output file (blocking; call from a thread)."""
+        with open(path, "w") as f:
+            f.write(text)
+
+    @staticmethod
+    def _write_chunk(buffer, digest, chunk: bytes):
+        digest.update(chunk)
+        buffer.write(chunk)
+
+    @staticmethod
+    def remove_job_dir(job_dir: str):
+        if os.path.exists(job_dir):
+            shutil.rmtree(job_dir)
+
     @staticmethod
     def get_job_dir(job_id: str) -> str:
-        return os.path.join(settings.TEMP_DIR, job_id)
+        """TEMP_DIR/<first two characters>/<job_id>, so no directory holds millions of entries."""
+        path = os.path.join(settings.TEMP_DIR, job_id[:2], job_id)
+        legacy = os.path.join(settings.TEMP_DIR, job_id)
+        if not os.path.isdir(path) and os.path.isdir(legacy):
+            return legacy # Created before sharding
+        return path
+
+    @staticmethod
+    def touch_job_dir(job_dir: str):
+        """Marks a job as recently used, so the retention GC evicts it last."""
+        try:
+            os.utime(job_dir)
+        except OSError:
+            pass
+
+    @staticmethod
+    def find_input(job_dir: str) -> Optional[str]:
+        """The uploaded image in a job dir (skips generated outputs and debug images)."""
+        for path in sorted(glob.glob(os.path.join(job_dir, "*.*"))):
+            name = os.path.basename(path)
+            if name not in GENERATED_FILES and not name.startswith(GENERATED_PREFIXES):
+                return path
+        return None
+
+    @staticmethod
+    def input_sha256(input_path: str) -> str:
+        """Hash recorded at upload time, falling back to re-reading the file."""
+        sidecar = os.path.join(os.path.dirname(input_path), INPUT_HASH_FILE)
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                recorded = f.read().strip()
+            if recorded:
+                return recorded
+        return StorageService.file_sha256(input_path)
+
+    @staticmethod
+    def file_sha256(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
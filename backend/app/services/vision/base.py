@@ -1,12 +1,89 @@
 
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional
 import numpy as np
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+from backend.app.core.tracing import tracer
+from backend.app.services.vision.stream import iter_items
+
+requests_inflight = metrics.gauge("vision_requests_inflight", "Vision API calls currently waiting on the network")
+slot_wait_seconds = metrics.histogram("vision_slot_wait_seconds", "Time spent waiting for a provider concurrency slot")
 
 class VisionProvider(ABC):
+    name: str = "base"
+    model_name: str = ""
+    max_concurrency: int = 0 # 0 = unlimited
+    image_tokens: int = 0 # Approximate input tokens the provider bills per image
+    rate_limiter = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def streaming(self) -> bool:
+        """Whether `analyze_streaming` reports nodes and edges before the response is complete."""
+        return False
+
     @abstractmethod
-    async def analyze(self, image: np.ndarray, prompt: str, status_callback=None) -> Dict[str, Any]:
+    async def analyze(self, image: np.ndarray, prompt: str, status_callback=None, payload=None) -> Dict[str, Any]:
         """
         Analyzes the image and returns a structured JSON.
+        `payload` is an optional pre-encoded VisionPayload; providers encode `image` themselves if it is missing.
+        """
+        pass
+
+    async def analyze_streaming(self, image: np.ndarray, prompt: str, on_item: Callable[[str, Dict[str, Any]], None], status_callback=None, payload=None) -> Dict[str, Any]:
         """
+        Like `analyze`, but also calls `on_item(kind, item)` for every "node" and "edge" as soon as it is known.
+        `on_item("reset", {})` withdraws everything reported so far (a retried or superseded call).
+        Providers without a streaming API report them all once the response is complete.
+        """
+        vision_data = await self.analyze(image, prompt, status_callback=status_callback, payload=payload)
+        for kind, item in iter_items(vision_data):
+            on_item(kind, item)
+        return vision_data
+
+    def _payload(self, image: np.ndarray, payload=None):
+        if payload is not None:
+            return payload
+        from backend.app.services.vision.payload import PayloadOptimizer
+        return PayloadOptimizer.prepare(image)
+
+    @asynccontextmanager
+    async def request_slot(self) -> AsyncIterator[None]:
+        """
+        Holds one of the provider's concurrent request slots for the duration of an API call.
+        """
+        if self.max_concurrency > 0:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            start = time.perf_counter()
+            await self._semaphore.acquire()
+            slot_wait_seconds.observe(time.perf_counter() - start, provider=self.name)
+
+        # One span per API call; the enclosing stage span counts attempts (retries = attempts - 1)
+        parent = tracer.current()
+        if parent:
+            parent.incr("vision_attempts")
+        requests_inflight.inc(provider=self.name)
+        try:
+            with tracer.span("vision.request", provider=self.name, model=self.model_name):
+                yield
+        finally:
+            requests_inflight.dec(provider=self.name)
+            if self.max_concurrency > 0:
+                self._semaphore.release()
+
+    def image_token_cost(self, width: int, height: int) -> int:
+        return self.image_tokens
+
+    def estimate_tokens(self, prompt: str, payload=None) -> int:
+        """Rough token cost of one request, used to reserve tokens-per-minute capacity."""
+        image_tokens = self.image_token_cost(payload.width, payload.height) if payload is not None else self.image_tokens
+        return len(prompt) // 4 + image_tokens + settings.VISION_EXPECTED_OUTPUT_TOKENS
+
+    async def aclose(self):
+        """Releases pooled network connections."""
         pass
@@ -1,52 +1,114 @@
 
+import asyncio
 import json
-from typing import Dict, Any, Union
+import math
+from typing import Dict, Any, Optional, Union
+import httpx
 import numpy as np
-import cv2
 from loguru import logger
 from google import genai
 from google.genai import types
 from backend.app.core.config import settings
 from backend.app.core.errors import VisionFailure
 from backend.app.services.vision.base import VisionProvider
-from PIL import Image
+from backend.app.services.vision.ratelimit import get_rate_limiter, parse_retry_after
+from backend.app.services.vision.stream import StreamingJsonParser
 
 class GeminiVisionProvider(VisionProvider):
-    def __init__(self):
+    name = "gemini"
+    image_tokens = 258
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name or "gemini-2.5-flash"
+        self.max_concurrency = settings.GEMINI_MAX_CONCURRENCY
+        self.rate_limiter = get_rate_limiter(self.name, settings.GEMINI_RPM, settings.GEMINI_TPM)
+        self.client = None
         if not settings.GEMINI_API_KEY:
             logger.warning("GEMINI_API_KEY not set. GeminiVisionProvider might fail.")
             return
         
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
-        self.model_name = "gemini-2.5-flash"
+        # One client per process: its async httpx pool keeps connections alive across jobs
+        self.client = genai.Client(
+            api_key=settings.GEMINI_API_KEY,
+            http_options=types.HttpOptions(
+                base_url=settings.GEMINI_BASE_URL or None,
+                timeout=int(settings.VISION_REQUEST_TIMEOUT * 1000),
+                async_client_args={
+                    "limits": httpx.Limits(
+                        max_connections=settings.VISION_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.VISION_MAX_KEEPALIVE_CONNECTIONS,
+                    )
+                },
+            ),
+        )
+
+    def image_token_cost(self, width: int, height: int) -> int:
+        """Small images cost one block; larger ones are tiled into 768x768 blocks."""
+        if width <= 384 and height <= 384:
+            return self.image_tokens
+        return self.image_tokens * math.ceil(width / 768) * math.ceil(height / 768)
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aio.aclose()
+
+    async def analyze(self, image: np.ndarray, prompt: str, status_callback=None, payload=None) -> Dict[str, Any]:
+        return await self._analyze(image, prompt, status_callback, payload)
 
-    def _convert_to_pil(self, image: np.ndarray) -> Image.Image:
-        """Converts BGR numpy image to RGB PIL Image."""
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        return Image.fromarray(rgb_image)
+    @property
+    def streaming(self) -> bool:
+        return settings.VISION_STREAMING
 
-    async def analyze(self, image: np.ndarray, prompt: str, status_callback=None) -> Dict[str, Any]:
+    async def analyze_streaming(self, image: np.ndarray, prompt: str, on_item, status_callback=None, payload=None) -> Dict[str, Any]:
+        if not self.streaming:
+            return await super().analyze_streaming(image, prompt, on_item, status_callback, payload)
+        return await self._analyze(image, prompt, status_callback, payload, on_item)
+
+    async def _analyze(self, image: np.ndarray, prompt: str, status_callback=None, payload=None, on_item=None) -> Dict[str, Any]:
+        if self.client is None:
+            raise VisionFailure("GEMINI_API_KEY is not configured")
         logger.info(f"Sending image to Gemini Vision API ({self.model_name})...")
-        pil_image = self._convert_to_pil(image)
+        # Encoded once; every retry sends the same bytes
+        payload = self._payload(image, payload)
+        image_part = types.Part.from_bytes(data=payload.data, mime_type=payload.mime_type)
+        tokens = self.estimate_tokens(prompt, payload)
 
         retry_count = 0
         max_retries = 3
+        parser = None
         
         while retry_count <= max_retries:
             try:
+                # Hold here, before sending, until the shared limiter has capacity for us
+                await self.rate_limiter.acquire(tokens, status_callback)
+
                 # The prompt structure for multimodal in the new SDK:
-                response = self.client.models.generate_content(
+                request = dict(
                     model=self.model_name,
                     contents=[
                         prompt,
-                        pil_image
+                        image_part
                     ],
                     config=types.GenerateContentConfig(
                         response_mime_type="application/json"
                     )
                 )
-                
-                content = response.text
+                async with self.request_slot():
+                    if on_item is None:
+                        response = await self.client.aio.models.generate_content(**request)
+                        content = response.text
+                    else:
+                        # Nodes/edges are handed on as soon as their JSON is complete
+                        if parser is not None and any(parser.counts.values()):
+                            on_item("reset", {}) # Retrying: what the failed attempt reported is void
+                        parser = StreamingJsonParser(on_item)
+                        async for chunk in await self.client.aio.models.generate_content_stream(**request):
+                            if chunk.text:
+                                parser.feed(chunk.text)
+                        content = parser.text
+
+                await asyncio.to_thread(self.rate_limiter.record_success)
+
                 if not content:
                      raise VisionFailure("Gemini returned empty response")
     
@@ -66,33 +128,16 @@ class GeminiVisionProvider(VisionProvider):
                         logger.error(f"Gemini Vision API Rate Limit Exceeded after {max_retries} retries: {e}")
                         raise VisionFailure(f"Rate limit exceeded (429). Please wait a minute and try again. Details: {e}")
                     
-                    import time
-                    import re
-                    import asyncio
-                    
-                    # Try to parse 'retry in X s' from error message
-                    # Example: "Please retry in 47.142904658s."
-                    wait_time = 5 * (2 ** (retry_count - 1)) # Default exponential backoff: 5, 10, 20
-                    
-                    match = re.search(r"retry in (\d+(\.\d+)?)s", error_str)
-                    if match:
-                        try:
-                            parsed_wait = float(match.group(1))
-                            wait_time = parsed_wait + 1 # Add 1s buffer
-                        except ValueError:
-                            pass
-                            
-                    logger.warning(f"Rate limit hit. Waiting {wait_time:.2f}s before retry {retry_count}/{max_retries}...")
-                    
-                    if status_callback:
-                        status_callback(f"waiting_rate_limit_{int(wait_time)}s")
-                    
-                    # Use asyncio.sleep instead of time.sleep to not block the event loop
-                    await asyncio.sleep(wait_time)
-                    
-                    # Reset status to processing before retrying
+                    # Default exponential backoff: 5, 10, 20 unless the error carries a hint
+                    wait_time = parse_retry_after(error_str, default=5 * (2 ** (retry_count - 1)))
+                    logger.warning(f"Rate limit hit. Holding Gemini dispatch {wait_time:.2f}s before retry {retry_count}/{max_retries}...")
+
+                    # Block the shared bucket so every queued job waits, instead of each
+                    # job sleeping on its own and retrying in a herd
+                    await asyncio.to_thread(self.rate_limiter.penalize, wait_time)
+
                     if status_callback:
-                        status_callback("processing_retrying")
+                        await asyncio.to_thread(status_callback, "processing_retrying")
                         
                     continue
                 
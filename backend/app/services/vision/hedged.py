@@ -0,0 +1,171 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from backend.app.core.errors import VisionFailure
+from backend.app.core.metrics import metrics
+from backend.app.services.vision.base import VisionProvider
+
+hedges = metrics.counter("vision_hedges_total", "Backup vision calls by reason (slow, failover) and which call answered (primary, backup, none)")
+hedges_skipped = metrics.counter("vision_hedges_skipped_total", "Slow vision calls not hedged because the hedge budget was spent")
+hedge_delay_seconds = metrics.gauge("vision_hedge_delay_seconds", "Current wait before a backup call is sent")
+
+class HedgedVisionProvider(VisionProvider):
+    """
+    Sends each image to `primary` and, if no answer came back within the hedge
+    delay (the primary's recent `percentile` latency), also to `backup`. The
+    first valid answer wins and the other call is cancelled. A primary that
+    fails outright hands over to the backup at once.
+
+    Hedges for slow calls are capped at `budget` of all calls, so the backup
+    only sees the slow tail and the cost stays close to one call per image.
+    Until `min_samples` latencies are known, `default_delay` is used.
+    """
+    name = "hedged"
+
+    def __init__(
+        self,
+        primary: VisionProvider,
+        backup: VisionProvider,
+        percentile: float = 0.95,
+        budget: float = 0.1,
+        default_delay: float = 10.0,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self.primary = primary
+        self.backup = backup
+        self.model_name = f"{primary.name}:{primary.model_name}|{backup.name}:{backup.model_name}"
+        self.percentile = percentile
+        self.budget = budget
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.latencies: deque = deque(maxlen=window) # Seconds per primary call, most recent last
+        self.calls = 0
+        self.hedged_calls = 0
+
+    @property
+    def streaming(self) -> bool:
+        return self.primary.streaming or self.backup.streaming
+
+    def estimate_tokens(self, prompt: str, payload=None) -> int:
+        return self.primary.estimate_tokens(prompt, payload)
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    async def analyze(self, image: np.ndarray, prompt: str, status_callback=None, payload=None) -> Dict[str, Any]:
+        return await self._race(image, prompt, status_callback, payload, None)
+
+    async def analyze_streaming(self, image: np.ndarray, prompt: str, on_item, status_callback=None, payload=None) -> Dict[str, Any]:
+        return await self._race(image, prompt, status_callback, payload, on_item)
+
+    async def aclose(self):
+        # The inner providers are shared through the registry, which closes them
+        pass
+
+    async def _race(self, image: np.ndarray, prompt: str, status_callback, payload, on_item) -> Dict[str, Any]:
+        self.calls += 1
+        delay = self.hedge_delay()
+        hedge_delay_seconds.set(delay)
+        relay = _StreamRelay(on_item) if on_item else None
+        started = time.perf_counter()
+
+        def call(role: str) -> asyncio.Task:
+            provider = self.primary if role == "primary" else self.backup
+            return asyncio.create_task(self._call(provider, image, prompt, status_callback, payload, relay, role))
+
+        tasks: Dict[asyncio.Task, str] = {call("primary"): "primary"}
+        reason: Optional[str] = None # Why the backup was called, if it was
+        errors: List[str] = []
+        winner = "none"
+        try:
+            while tasks:
+                timeout = max(0.0, delay - (time.perf_counter() - started)) if reason is None else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if self.hedged_calls < self.budget * self.calls:
+                        reason = "slow"
+                        self.hedged_calls += 1
+                        logger.info(f"No answer from {self.primary.name} after {delay:.1f}s, also asking {self.backup.name}")
+                        tasks[call("backup")] = "backup"
+                    else:
+                        reason = "skipped"
+                        hedges_skipped.inc()
+                    continue
+
+                for task in done:
+                    role = tasks.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        errors.append(f"{role}: {str(e) or type(e).__name__}")
+                        if role == "primary" and reason in (None, "skipped"):
+                            reason = "failover"
+                            logger.warning(f"{self.primary.name} failed, asking {self.backup.name}: {e}")
+                            tasks[call("backup")] = "backup"
+                        continue
+                    if role == "primary":
+                        self.latencies.append(time.perf_counter() - started)
+                    winner = role
+                    if relay:
+                        relay.commit(role)
+                    return result
+        finally:
+            for task, role in tasks.items():
+                task.cancel()
+                if role == "primary" and winner == "backup":
+                    # Lost to the backup: its latency is at least this long
+                    self.latencies.append(time.perf_counter() - started)
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if reason in ("slow", "failover"):
+                hedges.inc(reason=reason, winner=winner)
+
+        raise VisionFailure(f"All vision providers failed ({'; '.join(errors)})")
+
+    @staticmethod
+    async def _call(provider: VisionProvider, image, prompt, status_callback, payload, relay, role: str) -> Dict[str, Any]:
+        if relay:
+            result = await provider.analyze_streaming(image, prompt, relay.callback(role), status_callback=status_callback, payload=payload)
+        else:
+            result = await provider.analyze(image, prompt, status_callback=status_callback, payload=payload)
+        # Unusable answers don't win the race
+        if not isinstance(result, dict) or not isinstance(result.get("nodes"), list):
+            raise VisionFailure(f"{provider.name} returned no nodes")
+        return result
+
+class _StreamRelay:
+    """
+    Passes on the streamed items of one call at a time: the first call to report
+    any. If the other call wins, what was passed on is withdrawn with a "reset"
+    and the winner's items are replayed.
+    """
+    def __init__(self, on_item: Callable[[str, Dict[str, Any]], None]):
+        self.on_item = on_item
+        self.owner: Optional[str] = None
+        self.items: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {"primary": [], "backup": []}
+
+    def callback(self, role: str) -> Callable[[str, Dict[str, Any]], None]:
+        def on_item(kind: str, item: Dict[str, Any]):
+            if kind == "reset":
+                self.items[role].clear()
+            else:
+                self.items[role].append((kind, item))
+                if self.owner is None:
+                    self.owner = role
+            if self.owner == role:
+                self.on_item(kind, item)
+        return on_item
+
+    def commit(self, winner: str):
+        if self.owner == winner:
+            return
+        if self.owner is not None:
+            self.on_item("reset", {})
+        for kind, item in self.items[winner]:
+            self.on_item(kind, item)
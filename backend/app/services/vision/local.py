@@ -0,0 +1,286 @@
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.executor import cpu_executor
+from backend.app.services.preprocessing import ImagePreprocessor
+from backend.app.services.vision.base import VisionProvider
+
+# Share of nodes with another node beside them above which the chart counts as a grid
+_SIDE_BY_SIDE_MAX = 0.5
+
+class LocalDiagramDetector:
+    """
+    Reads simple flowcharts straight from the binary (ink = 255) image:
+
+    - Nodes are the enclosed holes of closed outlines, so arrows touching a
+      shape from outside don't distort it. Each is classified by its polygon
+      and how much of its bounding box it fills.
+    - Whatever ink is left outside the nodes is traced as connected
+      components; a component touching exactly two nodes is an edge, and the
+      end with more ink around its tip (the arrowhead) is its target.
+    - Labels are left empty for OCR reconciliation to fill by bbox.
+
+    `confidence` is the weakest of the shape, edge, coverage, direction and
+    connectivity scores, so a single odd shape, unexplained stroke or unclear
+    arrowhead is enough to hand the image to an LLM.
+
+    It reads top-down charts with one node per row, plus the odd branch beside
+    it. Grids (rows wrapping into each other, arrows running diagonally past
+    other nodes) and charts with more than LOCAL_VISION_MAX_NODES nodes come out
+    wrong, so `screen` turns them away after counting the nodes, before the
+    per-pixel edge tracing.
+    """
+
+    @staticmethod
+    def binarize(image: np.ndarray) -> np.ndarray:
+        if image.ndim == 2 and image.dtype == np.uint8:
+            return image
+        outputs, _ = ImagePreprocessor.run_chain(image, ["closing"])
+        return outputs["closing"]
+
+    @staticmethod
+    def stroke_width(binary: np.ndarray) -> float:
+        """Typical pen width: twice the median distance from ink ridges to the background."""
+        dist = cv2.distanceTransform(binary, cv2.DIST_L2, 3)
+        ridge = dist[(dist > 0) & (dist >= cv2.dilate(dist, np.ones((3, 3), np.uint8)))]
+        return float(max(1.0, 2 * np.median(ridge))) if ridge.size else 1.0
+
+    @staticmethod
+    def classify(contour: np.ndarray) -> Tuple[str, float]:
+        """(shape, score 0..1) of a node's inner outline."""
+        area = cv2.contourArea(contour)
+        x, y, w, h = cv2.boundingRect(contour)
+        extent = area / max(w * h, 1) # rectangle ~1, ellipse ~0.785, diamond ~0.5
+        hull_area = cv2.contourArea(cv2.convexHull(contour))
+        solidity = area / max(hull_area, 1)
+        approx = cv2.approxPolyDP(contour, 0.04 * cv2.arcLength(contour, True), True)
+        vertices = len(approx)
+
+        def near(value, target, tolerance):
+            # Full marks within `tolerance`, fading to 0 at twice that
+            return float(np.clip(2 - abs(value - target) / tolerance, 0.0, 1.0))
+
+        # Straight sides: the simplified polygon covers the whole shape. Wobbly ellipses
+        # simplify to 4 vertices too, but the polygon cuts off their curves.
+        straight = near(cv2.contourArea(approx) / max(area, 1), 1.0, 0.05)
+        polygon = straight * (1.0 if vertices == 4 else 0.6)
+        scores = {
+            "rectangle": near(extent, 0.96, 0.06) * polygon,
+            "diamond": near(extent, 0.5, 0.08) * polygon,
+            "circle": near(extent, 0.785, 0.04) * (1 - straight),
+            "parallelogram": 0.0,
+        }
+        if vertices == 4:
+            # Top and bottom edges level, sides slanted the same way
+            pts = approx.reshape(-1, 2)[np.argsort(approx.reshape(-1, 2)[:, 1])]
+            top, bottom = pts[:2][np.argsort(pts[:2, 0])], pts[2:][np.argsort(pts[2:, 0])]
+            shift_left, shift_right = top[0, 0] - bottom[0, 0], top[1, 0] - bottom[1, 0]
+            slant = min(abs(shift_left), abs(shift_right)) / max(w, 1)
+            if shift_left * shift_right > 0 and slant > 0.06:
+                scores["parallelogram"] = near(extent, 0.85, 0.05) * near(slant, 0.15, 0.06) * straight
+                scores["rectangle"] *= 0.5
+        shape = max(scores, key=scores.get)
+        return shape, float(min(1.0, scores[shape] * min(1.0, solidity / 0.9)))
+
+    @staticmethod
+    def _ink_around(binary: np.ndarray, interior: np.ndarray, x: int, y: int, radius: float) -> int:
+        """Ink pixels within `radius` of (x, y), not counting anything inside a node."""
+        r = int(math.ceil(radius))
+        y0, x0 = max(0, y - r), max(0, x - r)
+        window = binary[y0:y + r + 1, x0:x + r + 1] > interior[y0:y + r + 1, x0:x + r + 1]
+        gy, gx = np.ogrid[y0 - y:window.shape[0] + y0 - y, x0 - x:window.shape[1] + x0 - x]
+        return int(np.count_nonzero(window & (gx ** 2 + gy ** 2 <= radius ** 2)))
+
+    @staticmethod
+    def holes(binary: np.ndarray, min_area: float) -> List[Tuple[float, np.ndarray]]:
+        """(area, contour) of the holes big enough to be nodes, largest first."""
+        height, width = binary.shape
+        contours, hierarchy = cv2.findContours(binary, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+        holes = [
+            (cv2.contourArea(c), c) for c, (_, _, _, parent) in zip(contours, hierarchy[0] if hierarchy is not None else [])
+            if parent >= 0
+        ]
+        return sorted((h for h in holes if min_area <= h[0] <= 0.5 * height * width), key=lambda h: -h[0])
+
+    @staticmethod
+    def screen(holes: List[Tuple[float, np.ndarray]]) -> Optional[str]:
+        """Why the layout of these node holes is one the detector gets wrong (too many nodes, a grid), or None."""
+        boxes = []
+        for _, contour in holes:
+            x, y, w, h = cv2.boundingRect(contour)
+            if not any(bx <= x + w / 2 <= bx + bw and by <= y + h / 2 <= by + bh for bx, by, bw, bh in boxes):
+                boxes.append((x, y, w, h))
+        if len(boxes) > settings.LOCAL_VISION_MAX_NODES:
+            return f"{len(boxes)} nodes"
+        # Side by side: their rows overlap by more than half the smaller node's height
+        beside = sum(
+            1 for i, (_, y, _, h) in enumerate(boxes)
+            if any(j != i and min(y + h, oy + oh) - max(y, oy) > min(h, oh) / 2 for j, (_, oy, _, oh) in enumerate(boxes))
+        )
+        if len(boxes) > 2 and beside > _SIDE_BY_SIDE_MAX * len(boxes):
+            return f"grid layout ({beside}/{len(boxes)} nodes side by side)"
+        return None
+
+    @staticmethod
+    def detect(image: np.ndarray, screen: bool = True) -> Dict[str, Any]:
+        """
+        Nodes, edges and confidence of the diagram. With `screen`, unsupported
+        layouts return no nodes and confidence 0 without being traced.
+        """
+        binary = LocalDiagramDetector.binarize(image)
+        # Shapes survive downscaling fine and every later step is per pixel
+        scale = min(1.0, settings.LOCAL_VISION_MAX_SIDE / max(binary.shape))
+        if scale < 1.0:
+            binary = cv2.resize(binary, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            binary = np.where(binary >= 64, 255, 0).astype(np.uint8) # Keep thin strokes connected
+        height, width = binary.shape
+        min_area = max(400.0, height * width * 0.001)
+
+        # Drop specks so they don't count as unexplained ink
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        speck = max(8, int(height * width * 1e-5))
+        keep = np.where(stats[:, cv2.CC_STAT_AREA] >= speck, 255, 0).astype(np.uint8)
+        keep[0] = 0
+        binary = keep[labels]
+
+        # 1. Nodes: holes (inner contours) big enough not to be the inside of a letter
+        holes = LocalDiagramDetector.holes(binary, min_area)
+        if screen:
+            unsupported = LocalDiagramDetector.screen(holes)
+            if unsupported:
+                return {
+                    "diagram_type": "flowchart", "nodes": [], "edges": [], "confidence": 0.0,
+                    "local_scores": {"unsupported": unsupported},
+                }
+
+        stroke = LocalDiagramDetector.stroke_width(binary)
+        margin = max(6, int(round(4 * stroke)))
+        nodes = []
+        pad = int(math.ceil(stroke))
+        for area, contour in holes:
+            x, y, w, h = cv2.boundingRect(contour)
+            cx, cy = x + w / 2, y + h / 2
+            # A small hole inside a bigger node's box is an arrow cutting across its corner
+            if any(nx <= cx <= nx + nw and ny <= cy <= ny + nh for nx, ny, nw, nh in (n["bbox"] for n in nodes)):
+                continue
+            shape, score = LocalDiagramDetector.classify(contour)
+            nodes.append({"contour": contour, "shape": shape, "score": score, "bbox": [x - pad, y - pad, w + 2 * pad, h + 2 * pad]})
+        # Reading order: top to bottom, then left to right
+        nodes.sort(key=lambda n: (n["bbox"][1] // max(1, int(min_area ** 0.5)), n["bbox"][0]))
+
+        # 2. Ink that belongs to nodes: their interior (text) and outline
+        node_map = np.zeros((height, width), np.int32) # node index + 1, grown by `margin`
+        owned = np.zeros((height, width), np.uint8)
+        interior = np.zeros((height, width), np.uint8)
+        for i, node in enumerate(nodes):
+            cv2.drawContours(node_map, [node["contour"]], -1, i + 1, thickness=cv2.FILLED)
+            cv2.drawContours(node_map, [node["contour"]], -1, i + 1, thickness=2 * (margin + pad))
+            cv2.drawContours(interior, [node["contour"]], -1, 255, thickness=cv2.FILLED)
+            cv2.drawContours(owned, [node["contour"]], -1, 255, thickness=2 * pad + 3)
+        owned |= interior
+        connectors = cv2.bitwise_and(binary, cv2.bitwise_not(owned))
+
+        # 3. Edges: connector components and the nodes each one touches
+        count, comp, comp_stats, _ = cv2.connectedComponentsWithStats(connectors, connectivity=8)
+        ys, xs = np.nonzero(comp)
+        comp_ids, touched = comp[ys, xs], node_map[ys, xs]
+        # Pixels grouped by component, for the per-edge arrowhead check
+        order = np.argsort(comp_ids, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(comp_ids, minlength=count)[1:])])
+        contact = touched > 0
+        pairs = np.unique(np.stack([comp_ids[contact], touched[contact]]), axis=1)
+
+        text_size = max(3 * stroke, min_area ** 0.5 / 2)
+        reach = max(12.0, 4 * stroke) # Roughly an arrowhead's length
+        edges, seen = [], set()
+        resolved = ambiguous = unexplained = 0
+        resolved_ink = 0
+        clarity = []
+        for c in range(1, count):
+            touching = pairs[1][pairs[0] == c] - 1
+            c_w, c_h = comp_stats[c, cv2.CC_STAT_WIDTH], comp_stats[c, cv2.CC_STAT_HEIGHT]
+            if len(touching) == 2:
+                # The arrowhead end has more ink within `reach` of where it meets its node
+                pixels = order[bounds[c - 1]:bounds[c]]
+                px, py, owner = xs[pixels], ys[pixels], touched[pixels]
+                ends = [(px[owner == node + 1], py[owner == node + 1]) for node in touching]
+                ink_near = []
+                for (ex, ey), (ox, oy) in zip(ends, ends[::-1]):
+                    # The tip: the contact pixel furthest from the other end
+                    tip = np.argmax((ex - ox.mean()) ** 2 + (ey - oy.mean()) ** 2)
+                    ink_near.append(LocalDiagramDetector._ink_around(binary, interior, int(ex[tip]), int(ey[tip]), reach))
+                a, b = (touching if ink_near[0] <= ink_near[1] else touching[::-1])
+                low, high = sorted(ink_near)
+                directed = high >= 1.2 * low
+                clarity.append(min(1.0, (high / max(low, 1) - 1) / 0.35))
+                key = (a, b) if directed else tuple(sorted((a, b)))
+                if key not in seen:
+                    seen.add(key)
+                    edges.append({"from": f"N{a + 1}", "to": f"N{b + 1}", "type": "arrow" if directed else "line", "label": ""})
+                resolved += 1
+                resolved_ink += comp_stats[c, cv2.CC_STAT_AREA]
+            elif len(touching) > 2:
+                # Crossing or merged arrows: can't tell which end goes where
+                ambiguous += 1
+            elif max(c_w, c_h) <= text_size:
+                resolved_ink += comp_stats[c, cv2.CC_STAT_AREA] # Floating text (edge labels), left to OCR
+            else:
+                unexplained += 1
+
+        # 4. Confidence
+        ink = max(1, int(np.count_nonzero(binary)))
+        explained = float(ink - np.count_nonzero(connectors) + resolved_ink) / ink
+        connector_total = resolved + ambiguous + unexplained
+        linked = {int(e["from"][1:]) for e in edges} | {int(e["to"][1:]) for e in edges}
+        scores = {
+            "shapes": min([n["score"] for n in nodes], default=0.0),
+            "edges": resolved / connector_total if connector_total else (1.0 if len(nodes) == 1 else 0.0),
+            "coverage": min(1.0, explained / 0.97),
+            "direction": min(clarity, default=1.0),
+            # A node nothing points to or from is usually a missed arrow
+            "connected": len(linked) / len(nodes) if len(nodes) > 1 else 1.0,
+        }
+        scores = {k: round(float(v), 3) for k, v in scores.items()}
+        confidence = min(scores.values()) if nodes else 0.0
+
+        def original(bbox):
+            return [int(round(v / scale)) for v in bbox]
+
+        return {
+            "diagram_type": "flowchart",
+            "nodes": [
+                {"id": f"N{i + 1}", "label": "", "shape": n["shape"], "bbox": original(n["bbox"])}
+                for i, n in enumerate(nodes)
+            ],
+            "edges": edges,
+            "confidence": round(confidence, 3),
+            "local_scores": {**scores, "ambiguous_connectors": ambiguous, "unexplained_connectors": unexplained},
+        }
+
+class LocalVisionProvider(VisionProvider):
+    """
+    Contour-based diagram reader: no network, no quota, milliseconds per image.
+    Bboxes are in the coordinates of the image it is given (not a payload).
+    """
+    name = "local"
+    model_name = "opencv-contours"
+
+    async def analyze(
+        self, image: np.ndarray, prompt: str, status_callback=None, payload=None,
+        binary: Optional[np.ndarray] = None, screen: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        `binary` is the preprocessed ink mask if the caller already has it.
+        `screen=False` traces every layout, for when there is no provider to escalate to.
+        """
+        source = binary if binary is not None and binary.ndim == 2 else image
+        result = await cpu_executor.run(LocalDiagramDetector.detect, source, screen, stage="local_vision")
+        logger.info(
+            f"Local vision: {len(result['nodes'])} nodes, {len(result['edges'])} edges, "
+            f"confidence {result['confidence']:.2f} {result['local_scores']}"
+        )
+        return result
@@ -1,57 +1,136 @@
 
-import base64
+import asyncio
 import json
-from typing import Dict, Any
+import math
+from typing import Dict, Any, Optional
 import numpy as np
-import cv2
 from loguru import logger
-from openai import AsyncOpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, RateLimitError
 from backend.app.core.config import settings
 from backend.app.core.errors import VisionFailure
 from backend.app.services.vision.base import VisionProvider
+from backend.app.services.vision.ratelimit import get_rate_limiter, parse_retry_after
+from backend.app.services.vision.stream import StreamingJsonParser
 
 class OpenAIVisionProvider(VisionProvider):
-    def __init__(self):
+    name = "openai"
+    image_tokens = 765 # One high-detail 1024px image
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name or "gpt-4o"
+        self.max_concurrency = settings.OPENAI_MAX_CONCURRENCY
+        self.rate_limiter = get_rate_limiter(self.name, settings.OPENAI_RPM, settings.OPENAI_TPM)
         if not settings.OPENAI_API_KEY:
             logger.warning("OPENAI_API_KEY not set. OpenAIVisionProvider might fail.")
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        # One client per process: its httpx pool keeps connections alive across jobs
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            timeout=settings.VISION_REQUEST_TIMEOUT,
+            max_retries=0, # 429s are handled by the shared rate limiter, not per-request sleeps
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.VISION_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.VISION_MAX_KEEPALIVE_CONNECTIONS,
+                )
+            ),
+        )
+
+    async def aclose(self):
+        await self.client.close()
+
+    def image_token_cost(self, width: int, height: int) -> int:
+        """High-detail cost: fit in 2048px, shortest side to 768px, then 170 tokens per 512px tile plus 85."""
+        scale = min(1.0, 2048 / max(width, height))
+        width, height = width * scale, height * scale
+        scale = min(1.0, 768 / min(width, height))
+        width, height = width * scale, height * scale
+        return 170 * math.ceil(width / 512) * math.ceil(height / 512) + 85
 
-    def _encode_image(self, image: np.ndarray) -> str:
-        """Encodes numpy image to base64 string."""
-        _, buffer = cv2.imencode('.jpg', image)
-        return base64.b64encode(buffer).decode('utf-8')
+    async def analyze(self, image: np.ndarray, prompt: str, status_callback=None, payload=None) -> Dict[str, Any]:
+        return await self._analyze(image, prompt, status_callback, payload)
 
-    async def analyze(self, image: np.ndarray, prompt: str) -> Dict[str, Any]:
+    @property
+    def streaming(self) -> bool:
+        return settings.VISION_STREAMING
+
+    async def analyze_streaming(self, image: np.ndarray, prompt: str, on_item, status_callback=None, payload=None) -> Dict[str, Any]:
+        if not self.streaming:
+            return await super().analyze_streaming(image, prompt, on_item, status_callback, payload)
+        return await self._analyze(image, prompt, status_callback, payload, on_item)
+
+    async def _analyze(self, image: np.ndarray, prompt: str, status_callback=None, payload=None, on_item=None) -> Dict[str, Any]:
         logger.info("Sending image to OpenAI Vision API...")
-        base64_image = self._encode_image(image)
-
-        try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
+        # Encoded once; every retry sends the same bytes
+        payload = self._payload(image, payload)
+        image_url = payload.data_url()
+        tokens = self.estimate_tokens(prompt, payload)
+        max_retries = 3
+        parser = None
+
+        for attempt in range(max_retries + 1):
+            try:
+                # Hold here, before sending, until the shared limiter has capacity for us
+                await self.rate_limiter.acquire(tokens, status_callback)
+
+                request = dict(
+                    model=self.model_name,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": image_url
+                                    },
                                 },
-                            },
-                        ],
-                    }
-                ],
-                response_format={ "type": "json_object" },
-                max_tokens=4096,
-            )
-            
-            content = response.choices[0].message.content
-            if not content:
-                raise VisionFailure("OpenAI returned empty response")
+                            ],
+                        }
+                    ],
+                    response_format={ "type": "json_object" },
+                    max_tokens=4096,
+                )
+                async with self.request_slot():
+                    if on_item is None:
+                        response = await self.client.chat.completions.create(**request)
+                        content = response.choices[0].message.content
+                    else:
+                        # Nodes/edges are handed on as soon as their JSON is complete
+                        if parser is not None and any(parser.counts.values()):
+                            on_item("reset", {}) # Retrying: what the failed attempt reported is void
+                        parser = StreamingJsonParser(on_item)
+                        async for chunk in await self.client.chat.completions.create(**request, stream=True):
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                parser.feed(chunk.choices[0].delta.content)
+                        content = parser.text
+
+                await asyncio.to_thread(self.rate_limiter.record_success)
                 
-            return json.loads(content)
+                if not content:
+                    raise VisionFailure("OpenAI returned empty response")
+                    
+                return json.loads(content)
+
+            except RateLimitError as e:
+                if attempt == max_retries:
+                    logger.error(f"OpenAI Vision API Rate Limit Exceeded after {max_retries} retries: {e}")
+                    raise VisionFailure(f"Rate limit exceeded (429). Please wait a minute and try again. Details: {e}")
+
+                default_wait = 5 * (2 ** attempt)
+                retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+                try:
+                    wait_time = float(retry_after) + 1 if retry_after else parse_retry_after(str(e), default_wait)
+                except ValueError:
+                    wait_time = default_wait
+                logger.warning(f"Rate limit hit. Holding OpenAI dispatch {wait_time:.2f}s before retry {attempt + 1}/{max_retries}...")
+                await asyncio.to_thread(self.rate_limiter.penalize, wait_time)
+
+                if status_callback:
+                    await asyncio.to_thread(status_callback, "processing_retrying")
 
-        except Exception as e:
-            logger.error(f"OpenAI Vision API failed: {e}")
-            raise VisionFailure(str(e))
+            except Exception as e:
+                logger.error(f"OpenAI Vision API failed: {e}")
+                raise VisionFailure(str(e))
@@ -0,0 +1,147 @@
+
+import base64
+import copy
+from typing import Any, Dict, List, Optional
+import cv2
+import numpy as np
+from pydantic import BaseModel
+from backend.app.core.config import settings
+
+_ENCODINGS = {
+    "jpeg": (".jpg", "image/jpeg"),
+    "webp": (".webp", "image/webp"),
+    "png": (".png", "image/png"),
+}
+
+class VisionPayload(BaseModel):
+    """
+    Encoded image as sent to a vision provider, plus how it maps back to the original.
+    Built once per job so retries reuse the same bytes.
+    """
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_width: int
+    original_height: int
+    crop: List[int] # [x, y, w, h] of the original image that was kept
+    scale: float # payload pixels per original pixel
+
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode("utf-8")
+
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.base64()}"
+
+    def to_original_coords(self, vision_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Maps node bboxes returned by the model (payload pixels) back onto the
+        original image so they line up with OCR boxes.
+        """
+        if self.scale == 1.0 and self.crop[:2] == [0, 0]:
+            return vision_data
+        mapped = copy.deepcopy(vision_data)
+        if isinstance(mapped.get("nodes"), list):
+            mapped["nodes"] = [self.node_to_original(node) if isinstance(node, dict) else node for node in mapped["nodes"]]
+        return mapped
+
+    def node_to_original(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        """One node with its bbox in original pixels (a copy; nodes without a usable bbox are returned as is)."""
+        bbox = node.get("bbox")
+        if (self.scale == 1.0 and self.crop[:2] == [0, 0]) or not isinstance(bbox, list) or len(bbox) != 4:
+            return node
+        try:
+            x, y, w, h = (float(v) for v in bbox)
+        except (TypeError, ValueError):
+            return node
+        return {**node, "bbox": [
+            int(round(x / self.scale + self.crop[0])),
+            int(round(y / self.scale + self.crop[1])),
+            int(round(w / self.scale)),
+            int(round(h / self.scale)),
+        ]}
+
+class PayloadOptimizer:
+    @staticmethod
+    def settings_key() -> str:
+        """Identifies the payload options; part of the vision cache key since they change the model's input."""
+        return f"{settings.VISION_MAX_LONG_EDGE}:{settings.VISION_AUTOCROP}:{settings.VISION_CROP_MARGIN}:{settings.VISION_IMAGE_FORMAT}:{settings.VISION_IMAGE_QUALITY}"
+
+    @staticmethod
+    def ink_bbox(ink_mask: np.ndarray, margin: int = 0) -> Optional[List[int]]:
+        """
+        Bounding box [x, y, w, h] of the drawing in a binary (ink = non-zero) image.
+        Rows/columns with only a few stray pixels (paper texture, sensor noise) are ignored.
+        """
+        ink = ink_mask > 0
+        h, w = ink.shape
+        cols = np.flatnonzero(ink.sum(axis=0) > max(1, int(0.002 * h)))
+        rows = np.flatnonzero(ink.sum(axis=1) > max(1, int(0.002 * w)))
+        if cols.size == 0 or rows.size == 0:
+            return None
+        x0 = max(0, int(cols[0]) - margin)
+        y0 = max(0, int(rows[0]) - margin)
+        x1 = min(w, int(cols[-1]) + 1 + margin)
+        y1 = min(h, int(rows[-1]) + 1 + margin)
+        return [x0, y0, x1 - x0, y1 - y0]
+
+    @staticmethod
+    def prepare(
+        image: np.ndarray,
+        ink_mask: Optional[np.ndarray] = None,
+        max_long_edge: Optional[int] = None,
+        image_format: Optional[str] = None,
+        quality: Optional[int] = None,
+        autocrop: Optional[bool] = None,
+    ) -> VisionPayload:
+        """
+        Crops to the ink, downsizes and re-encodes a BGR image for upload.
+        `ink_mask` is the thresholded image from ImagePreprocessor (ink = non-zero).
+        """
+        max_long_edge = settings.VISION_MAX_LONG_EDGE if max_long_edge is None else max_long_edge
+        image_format = (image_format or settings.VISION_IMAGE_FORMAT).lower()
+        quality = settings.VISION_IMAGE_QUALITY if quality is None else quality
+        autocrop = settings.VISION_AUTOCROP if autocrop is None else autocrop
+        if image_format not in _ENCODINGS:
+            raise ValueError(f"Unsupported VISION_IMAGE_FORMAT: {image_format}")
+
+        original_h, original_w = image.shape[:2]
+        crop = [0, 0, original_w, original_h]
+
+        # 1. Crop to the drawing
+        if autocrop and ink_mask is not None and ink_mask.ndim == 2 and ink_mask.shape[:2] == image.shape[:2]:
+            bbox = PayloadOptimizer.ink_bbox(ink_mask, margin=settings.VISION_CROP_MARGIN)
+            if bbox:
+                crop = bbox
+                x, y, w, h = bbox
+                image = image[y:y + h, x:x + w]
+
+        # 2. Downsize so the long edge fits
+        h, w = image.shape[:2]
+        scale = 1.0
+        if max_long_edge and max(h, w) > max_long_edge:
+            scale = max_long_edge / max(h, w)
+            image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+        # 3. Re-encode
+        extension, mime_type = _ENCODINGS[image_format]
+        if image_format == "jpeg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif image_format == "webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+        else:
+            params = [cv2.IMWRITE_PNG_COMPRESSION, 6]
+        ok, buffer = cv2.imencode(extension, image, params)
+        if not ok:
+            raise ValueError(f"Could not encode image as {image_format}")
+
+        return VisionPayload(
+            data=buffer.tobytes(),
+            mime_type=mime_type,
+            width=image.shape[1],
+            height=image.shape[0],
+            original_width=original_w,
+            original_height=original_h,
+            crop=crop,
+            scale=scale,
+        )
@@ -0,0 +1,205 @@
+
+import asyncio
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+from backend.app.core.tracing import tracer
+
+rate_limit_wait = metrics.histogram("vision_rate_limit_wait_seconds", "Time jobs were held before dispatching to a vision provider")
+rate_limit_hits = metrics.counter("vision_rate_limit_hits_total", "429 / RESOURCE_EXHAUSTED responses from vision providers")
+rate_limit_scale = metrics.gauge("vision_rate_limit_scale", "Fraction of the configured rate currently used after 429 back-off")
+
+# Multiplicative decrease on 429, slow additive recovery on success
+_BACKOFF_FACTOR = 0.7
+_RECOVERY_STEP = 0.05
+_MIN_SCALE = 0.1
+
+State = Dict[str, float]
+
+class MemoryBucketStore:
+    """Bucket state for a single process."""
+    def __init__(self):
+        self._states: Dict[str, State] = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: str, fn: Callable[[Optional[State]], State]) -> State:
+        with self._lock:
+            state = fn(self._states.get(key))
+            self._states[key] = state
+            return dict(state)
+
+class SQLiteBucketStore:
+    """Bucket state shared by every API and worker process using the same database."""
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "key TEXT PRIMARY KEY, requests REAL NOT NULL, tokens REAL NOT NULL, updated_at REAL NOT NULL, "
+            "blocked_until REAL NOT NULL, scale REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def update(self, key: str, fn: Callable[[Optional[State]], State]) -> State:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            state = fn({k: row[k] for k in row.keys() if k != "key"} if row else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (key, requests, tokens, updated_at, blocked_until, scale) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, state["requests"], state["tokens"], state["updated_at"], state["blocked_until"], state["scale"]),
+            )
+            conn.execute("COMMIT")
+            return state
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+class RateLimiter:
+    """
+    Requests-per-minute / tokens-per-minute token bucket for one provider.
+
+    Jobs reserve capacity before sending, so under load they are spaced out
+    instead of all hitting the quota and sleeping together. Reservations may
+    drive the bucket negative; the deficit is the caller's wait. 429 hints
+    (`retry in Xs`) block the bucket for everyone and shrink the effective rate.
+    """
+    def __init__(self, key: str, rpm: int, tpm: int, store: Any):
+        self.key = key
+        self.rpm = rpm
+        self.tpm = tpm
+        self.store = store
+
+    def _refill(self, state: Optional[State], now: float) -> State:
+        if state is None:
+            return {"requests": float(self.rpm), "tokens": float(self.tpm), "updated_at": now, "blocked_until": 0.0, "scale": 1.0}
+        elapsed = max(0.0, now - state["updated_at"])
+        scale = state["scale"]
+        state["requests"] = min(self.rpm * scale, state["requests"] + elapsed * self.rpm * scale / 60)
+        state["tokens"] = min(self.tpm * scale, state["tokens"] + elapsed * self.tpm * scale / 60)
+        state["updated_at"] = now
+        return state
+
+    def reserve(self, tokens: int) -> float:
+        """Takes capacity for one request now and returns how long to wait before sending it."""
+        now = time.time()
+        waits = {}
+
+        def take(state: Optional[State]) -> State:
+            state = self._refill(state, now)
+            if self.rpm:
+                state["requests"] -= 1
+            if self.tpm:
+                state["tokens"] -= tokens
+            scale = state["scale"]
+            wait = max(0.0, state["blocked_until"] - now)
+            if self.rpm and state["requests"] < 0:
+                wait = max(wait, -state["requests"] / (self.rpm * scale / 60))
+            if self.tpm and state["tokens"] < 0:
+                wait = max(wait, -state["tokens"] / (self.tpm * scale / 60))
+            waits["wait"] = wait
+            return state
+
+        self.store.update(self.key, take)
+        return waits["wait"]
+
+    def blocked_for(self) -> float:
+        """Remaining time of a 429 block that started after our reservation."""
+        now = time.time()
+        state = self.store.update(self.key, lambda s: self._refill(s, now))
+        return max(0.0, state["blocked_until"] - now)
+
+    def penalize(self, retry_after: float):
+        now = time.time()
+
+        def block(state: Optional[State]) -> State:
+            state = self._refill(state, now)
+            state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+            state["requests"] = min(state["requests"], 0.0)
+            state["tokens"] = min(state["tokens"], 0.0)
+            state["scale"] = max(_MIN_SCALE, state["scale"] * _BACKOFF_FACTOR)
+            return state
+
+        state = self.store.update(self.key, block)
+        rate_limit_hits.inc(provider=self.key)
+        rate_limit_scale.set(state["scale"], provider=self.key)
+        logger.warning(f"{self.key} rate limited: holding dispatch for {retry_after:.1f}s, rate scaled to {state['scale']:.2f}")
+
+    def record_success(self):
+        now = time.time()
+
+        def recover(state: Optional[State]) -> State:
+            state = self._refill(state, now)
+            state["scale"] = min(1.0, state["scale"] + _RECOVERY_STEP)
+            return state
+
+        state = self.store.update(self.key, recover)
+        rate_limit_scale.set(state["scale"], provider=self.key)
+
+    async def acquire(self, tokens: int, status_callback=None):
+        """
+        Waits until this request may be sent, reporting the expected dispatch time.
+        `status_callback` may block (it usually writes to the job queue), so it runs in a thread.
+        """
+        start = time.perf_counter()
+        delay = await asyncio.to_thread(self.reserve, tokens)
+        while delay > 0:
+            logger.info(f"Holding {self.key} request for {delay:.1f}s to stay under the rate limit")
+            if status_callback:
+                await asyncio.to_thread(status_callback, f"waiting_rate_limit_{math.ceil(delay)}s", {"dispatch_at": time.time() + delay})
+            await asyncio.sleep(delay)
+            delay = await asyncio.to_thread(self.blocked_for)
+
+        waited = time.perf_counter() - start
+        rate_limit_wait.observe(waited, provider=self.key)
+        span = tracer.current()
+        if span:
+            span.set(rate_limit_wait_seconds=round(span.attributes.get("rate_limit_wait_seconds", 0.0) + waited, 3))
+        if waited > 0.05 and status_callback:
+            await asyncio.to_thread(status_callback, "processing", {"dispatch_at": None})
+
+def parse_retry_after(error_text: str, default: float) -> float:
+    """
+    Reads the provider's retry hint, e.g. "Please retry in 47.142904658s."
+    """
+    match = re.search(r"retry in (\d+(\.\d+)?)s", error_text)
+    if match:
+        try:
+            return float(match.group(1)) + 1 # Add 1s buffer
+        except ValueError:
+            pass
+    return default
+
+_store = None
+_limiters: Dict[str, RateLimiter] = {}
+
+def get_rate_limiter(provider: str, rpm: int, tpm: int) -> RateLimiter:
+    global _store
+    if _store is None:
+        if settings.RATE_LIMIT_STORE == "sqlite":
+            _store = SQLiteBucketStore(settings.JOB_QUEUE_DB)
+        else:
+            _store = MemoryBucketStore()
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = RateLimiter(provider, rpm, tpm, _store)
+        _limiters[provider] = limiter
+    return limiter
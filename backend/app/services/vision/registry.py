@@ -0,0 +1,58 @@
+
+from typing import Dict, Optional
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.services.vision.base import VisionProvider
+
+# Providers hold SDK clients with pooled connections, so they are shared process-wide
+_providers: Dict[str, VisionProvider] = {}
+
+def get_vision_provider(name: Optional[str] = None) -> VisionProvider:
+    """
+    The provider called `name` (default VISION_PROVIDER, wrapped for hedging when
+    VISION_HEDGE_PROVIDER is set). API providers accept a model: "gemini:gemini-2.5-pro".
+    """
+    if name is None and settings.VISION_HEDGE_PROVIDER and settings.VISION_PROVIDER != "local":
+        name = "hedged"
+    name = name or settings.VISION_PROVIDER
+    provider = _providers.get(name)
+    if provider is not None:
+        return provider
+
+    kind, _, model = name.partition(":")
+    if kind == "openai":
+        from backend.app.services.vision.openai import OpenAIVisionProvider
+        provider = OpenAIVisionProvider(model or None)
+    elif kind == "gemini":
+        from backend.app.services.vision.gemini import GeminiVisionProvider
+        provider = GeminiVisionProvider(model or None)
+    elif name == "hedged":
+        from backend.app.services.vision.hedged import HedgedVisionProvider
+        provider = HedgedVisionProvider(
+            get_vision_provider(settings.VISION_PROVIDER),
+            get_vision_provider(settings.VISION_HEDGE_PROVIDER),
+            percentile=settings.VISION_HEDGE_PERCENTILE,
+            budget=settings.VISION_HEDGE_BUDGET,
+            default_delay=settings.VISION_HEDGE_DELAY,
+        )
+    elif name == "replay":
+        from backend.app.services.vision.replay import ReplayVisionProvider
+        provider = ReplayVisionProvider(settings.VISION_REPLAY_FILE, settings.VISION_REPLAY_LATENCY)
+    elif name == "local":
+        from backend.app.services.vision.local import LocalVisionProvider
+        provider = LocalVisionProvider()
+    else:
+        from backend.app.services.vision.stub import StubVisionProvider
+        provider = StubVisionProvider()
+
+    logger.info(f"Initialized vision provider {provider.name} ({provider.model_name})")
+    _providers[name] = provider
+    return provider
+
+async def close_vision_providers():
+    for provider in list(_providers.values()):
+        try:
+            await provider.aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close vision provider {provider.name}: {e}")
+    _providers.clear()
@@ -0,0 +1,56 @@
+
+import asyncio
+import copy
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+import numpy as np
+from loguru import logger
+from backend.app.core.errors import VisionFailure
+from backend.app.services.vision.base import VisionProvider
+
+class ReplayVisionProvider(VisionProvider):
+    """
+    Answers with previously recorded responses instead of calling an API.
+    Responses are keyed by a hash of the decoded image, so the same drawing
+    always gets the same answer; used for offline benchmarks and debugging.
+    `latency` adds a fixed delay per call to mimic a real provider.
+    """
+    name = "replay"
+    model_name = "replay"
+
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0, fallback: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.latency = latency
+        self.fallback = fallback # Returned for unknown images; None = fail
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.responses = json.load(f)
+            logger.info(f"Loaded {len(self.responses)} recorded vision responses from {path}")
+
+    @staticmethod
+    def image_key(image: np.ndarray) -> str:
+        digest = hashlib.sha256(np.ascontiguousarray(image).data)
+        digest.update(str(image.shape).encode())
+        return digest.hexdigest()
+
+    def record(self, image: np.ndarray, response: Dict[str, Any]):
+        self.responses[self.image_key(image)] = response
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.responses, f)
+
+    async def analyze(self, image: np.ndarray, prompt: str, status_callback=None, payload=None) -> Dict[str, Any]:
+        async with self.request_slot():
+            if self.latency > 0:
+                await asyncio.sleep(self.latency)
+            response = self.responses.get(self.image_key(image), self.fallback)
+        if response is None:
+            raise VisionFailure("No recorded vision response for this image")
+        # Callers may mutate the result
+        return copy.deepcopy(response)
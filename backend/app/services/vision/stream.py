@@ -0,0 +1,97 @@
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Top-level arrays whose entries are reported as they complete, and the kind reported for each
+ITEM_ARRAYS = {"nodes": "node", "edges": "edge"}
+
+class StreamingJsonParser:
+    """
+    Incremental reader for the vision JSON. Fed the response text chunk by chunk,
+    it calls `on_item(kind, item)` for each entry of the top-level "nodes" and
+    "edges" arrays as soon as its closing brace arrives, so the graph can be built
+    while the rest of the response is still being generated.
+
+    Text before the first "{" (markdown fences, preamble) is skipped and anything
+    after the top-level object is ignored. Entries that don't parse on their own
+    are skipped here; the complete response is still parsed as usual at the end.
+    """
+    def __init__(self, on_item: Callable[[str, Dict[str, Any]], None]):
+        self.on_item = on_item
+        self.text = ""
+        self.counts = {kind: 0 for kind in ITEM_ARRAYS.values()}
+        self.done = False # The top-level object is closed
+        self._pos = 0
+        self._started = False
+        # One entry per open container: its bracket and the key it is the value of
+        self._stack: List[Tuple[str, Optional[str]]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None # Key whose value comes next in the current object
+        self._item_start = -1
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._stack.append(("{", None))
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":":
+                self._key = self._last_string
+            elif char == ",":
+                self._key = None
+            elif char in "{[":
+                key = self._key if self._stack[-1][0] == "{" else None
+                self._stack.append((char, key))
+                self._key = None
+                if char == "{" and self._in_item_array(len(self._stack) - 1):
+                    self._item_start = i
+            elif char in "}]":
+                self._stack.pop()
+                self._key = None
+                if not self._stack:
+                    self.done = True
+                elif char == "}" and self._item_start >= 0 and self._in_item_array(len(self._stack)):
+                    self._emit(ITEM_ARRAYS[self._stack[1][1]], text[self._item_start:i + 1])
+                    self._item_start = -1
+        self._pos = len(text)
+
+    def _in_item_array(self, depth: int) -> bool:
+        """Whether a container at `depth` is an entry of a top-level "nodes"/"edges" array."""
+        return depth == 2 and self._stack[1][0] == "[" and self._stack[1][1] in ITEM_ARRAYS
+
+    def _emit(self, kind: str, raw: str):
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            return
+        if isinstance(item, dict):
+            self.counts[kind] += 1
+            self.on_item(kind, item)
+
+def iter_items(vision_data: Dict[str, Any]):
+    """(kind, item) for every node and edge of a complete vision response, in the order a stream would report them."""
+    for array, kind in ITEM_ARRAYS.items():
+        for item in vision_data.get(array, []):
+            if isinstance(item, dict):
+                yield kind, item
@@ -1,15 +1,69 @@
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from loguru import logger
 from backend.app.core.config import settings
 from backend.app.core.logging import setup_logging
-from backend.app.api.endpoints import upload, process, results
+from backend.app.core.middleware import UploadSizeLimitMiddleware
+from backend.app.api.endpoints import upload, process, results, stats, batch
+from backend.app.core.executor import cpu_executor
+from backend.app.core.tracing import tracer
+from backend.app.services.ocr import warm_up_ocr_engines
+from backend.app.services.mermaid.worker_pool import render_pool
+from backend.app.services.vision.registry import close_vision_providers
+from backend.app.services.jobs.base import get_job_queue
+from backend.app.services.jobs.worker import JobWorker
+from backend.app.services.retention import job_storage
 
 setup_logging()
 
+async def _warm_up_ocr(app: FastAPI):
+    try:
+        # Loads readers wherever OCR runs: this process (threads) or each executor process
+        await cpu_executor.broadcast(warm_up_ocr_engines)
+        app.state.ocr_ready = True
+        logger.info("OCR engine pool ready")
+    except Exception as e:
+        app.state.ocr_error = str(e)
+        logger.error(f"OCR engine pool warm-up failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load OCR models in the background so the server can answer /health meanwhile
+    app.state.ocr_ready = False
+    app.state.ocr_error = None
+    warmup_task = None
+    if settings.OCR_WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(_warm_up_ocr(app))
+
+    worker_task = None
+    if settings.JOB_WORKERS_EMBEDDED:
+        worker = JobWorker(get_job_queue(), lambda job: process.run_pipeline(job.job_id, debug=job.payload.get("debug", False), worker_id=job.lease_owner), settings.JOB_CONCURRENCY)
+        worker_task = asyncio.create_task(worker.run())
+
+    # Retention for job dirs; every API process may run it, deletions don't collide
+    gc_task = None
+    if settings.JOB_GC_INTERVAL > 0:
+        gc_task = asyncio.create_task(job_storage.run())
+
+    yield
+
+    for task in (warmup_task, worker_task, gc_task):
+        if task and not task.done():
+            task.cancel()
+    if worker_task:
+        await asyncio.gather(worker_task, return_exceptions=True)
+    await render_pool.close()
+    await close_vision_providers()
+    cpu_executor.shutdown()
+    tracer.shutdown()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set all CORS enabled origins
@@ -22,6 +76,15 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Allow for multipart boundaries/headers on top of the file itself
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        f"{settings.API_V1_STR}/upload": settings.MAX_UPLOAD_MB * 1024 * 1024 + 64 * 1024,
+        f"{settings.API_V1_STR}/batch": settings.BATCH_MAX_UPLOAD_MB * 1024 * 1024 + 64 * 1024,
+    },
+)
+
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
@@ -39,7 +102,19 @@ async def read_index():
 app.include_router(upload.router, prefix=settings.API_V1_STR, tags=["upload"])
 app.include_router(process.router, prefix=settings.API_V1_STR, tags=["process"])
 app.include_router(results.router, prefix=settings.API_V1_STR, tags=["results"])
+app.include_router(batch.router, prefix=settings.API_V1_STR, tags=["batch"])
+app.include_router(stats.router, prefix=settings.API_V1_STR, tags=["stats"])
+# Prometheus scrapes the conventional path, outside the versioned API
+app.add_api_route("/metrics", stats.prometheus_metrics, methods=["GET"], tags=["stats"], include_in_schema=False)
 
 @app.get("/health")
-def health_check():
-    return {"status": "ok"}
+def health_check(request: Request, response: Response):
+    # Only report ready once the OCR models are in memory (unless they load lazily)
+    ocr_ready = request.app.state.ocr_ready
+    if ocr_ready or not settings.OCR_WARMUP_ON_STARTUP:
+        return {"status": "ok", "ocr_ready": ocr_ready}
+
+    response.status_code = 503
+    if request.app.state.ocr_error:
+        return {"status": "error", "ocr_ready": False, "detail": request.app.state.ocr_error}
+    return {"status": "starting", "ocr_ready": False}
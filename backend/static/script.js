@@ -12,6 +12,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const progressSection = document.getElementById('progress-section');
     const resultSection = document.getElementById('result-section');
     const statusText = document.getElementById('status-text');
+    const partialPreview = document.getElementById('partial-preview');
 
     const mermaidOutput = document.getElementById('mermaid-output');
     const mermaidCode = document.getElementById('mermaid-code');
@@ -98,8 +99,8 @@ document.addEventListener('DOMContentLoaded', () => {
             });
             if (!processRes.ok) throw new Error('Processing start failed');
 
-            // 3. Poll Status
-            pollStatus(currentJobId);
+            // 3. Follow progress (pushed over SSE, polling as a fallback)
+            watchStatus(currentJobId);
 
         } catch (err) {
             console.error(err);
@@ -108,6 +109,94 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    function showStatus(data) {
+        statusText.textContent = `Status: ${data.status.replace('_', ' ')}...`;
+
+        // Handle rate limit messages specifically
+        if (data.status.startsWith('waiting_rate_limit')) {
+            const waitTime = data.dispatch_eta_seconds !== undefined
+                ? Math.ceil(data.dispatch_eta_seconds)
+                : data.status.split('_').pop().replace('s', '');
+            statusText.textContent = `Rate Limit Hit! ... (Waiting ${waitTime}s)`;
+            statusText.className = "text-xl font-medium text-orange-600 animate-pulse";
+        } else {
+            statusText.className = "text-xl font-medium text-gray-800";
+        }
+    }
+
+    // Returns true once the job has finished (successfully or not)
+    function handleFinalStatus(jobId, status, links) {
+        if (status === 'completed' || status === 'completed_with_warnings') {
+            fetchResults(jobId, links);
+            return true;
+        }
+        if (status.startsWith('failed')) {
+            showError(`Processing failed: ${status}`);
+            setStep('upload');
+            return true;
+        }
+        return false;
+    }
+
+    function watchStatus(jobId) {
+        if (!window.EventSource) {
+            pollStatus(jobId);
+            return;
+        }
+
+        const source = new EventSource(`/api/v1/events/${jobId}`);
+        let finished = false;
+        let failures = 0;
+
+        source.addEventListener('status', (e) => showStatus(JSON.parse(e.data)));
+
+        source.addEventListener('stage', (e) => {
+            const data = JSON.parse(e.data);
+            if (data.state === 'started' && !statusText.textContent.startsWith('Rate Limit')) {
+                statusText.textContent = `Status: ${data.stage.replace('_', ' ')}...`;
+            }
+        });
+
+        // Preview of the diagram read so far; previews arriving mid-render are skipped
+        let previewing = false;
+        source.addEventListener('partial', async (e) => {
+            const data = JSON.parse(e.data);
+            if (!statusText.textContent.startsWith('Rate Limit')) {
+                statusText.textContent = `Reading diagram: ${data.nodes} nodes, ${data.edges} edges...`;
+            }
+            if (previewing || finished) return;
+            previewing = true;
+            try {
+                const { svg } = await mermaid.render(`partial-${Date.now()}`, data.mermaid);
+                if (!finished) {
+                    partialPreview.innerHTML = svg;
+                    partialPreview.classList.remove('hidden');
+                }
+            } catch (err) {
+                console.warn('Partial diagram preview failed', err);
+            } finally {
+                previewing = false;
+            }
+        });
+
+        source.addEventListener('result', (e) => {
+            finished = true;
+            source.close();
+            const data = JSON.parse(e.data);
+            handleFinalStatus(jobId, data.status, data.links);
+        });
+
+        source.onerror = () => {
+            // EventSource retries on its own; fall back to polling if the stream is refused or keeps failing
+            if (finished) return;
+            if (source.readyState === EventSource.CLOSED || ++failures >= 3) {
+                source.close();
+                pollStatus(jobId);
+            }
+        };
+        source.onopen = () => { failures = 0; };
+    }
+
     async function pollStatus(jobId) {
         const interval = setInterval(async () => {
             try {
@@ -115,24 +204,9 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (!res.ok) throw new Error('Status check failed');
                 const data = await res.json();
 
-                statusText.textContent = `Status: ${data.status.replace('_', ' ')}...`;
-
-                // Handle rate limit messages specifically
-                if (data.status.startsWith('waiting_rate_limit')) {
-                    const waitTime = data.status.split('_').pop().replace('s', '');
-                    statusText.textContent = `Rate Limit Hit! ... (Waiting ${waitTime}s)`;
-                    statusText.className = "text-xl font-medium text-orange-600 animate-pulse";
-                } else {
-                    statusText.className = "text-xl font-medium text-gray-800";
-                }
-
-                if (data.status === 'completed' || data.status === 'completed_with_warnings') {
-                    clearInterval(interval);
-                    fetchResults(jobId);
-                } else if (data.status.startsWith('failed')) {
+                showStatus(data);
+                if (handleFinalStatus(jobId, data.status, data.links)) {
                     clearInterval(interval);
-                    showError(`Processing failed: ${data.status}`);
-                    setStep('upload');
                 }
             } catch (err) {
                 clearInterval(interval);
@@ -142,10 +216,10 @@ document.addEventListener('DOMContentLoaded', () => {
         }, 1000);
     }
 
-    async function fetchResults(jobId) {
+    async function fetchResults(jobId, links) {
         try {
-            // Get Mermaid Code
-            const mmdRes = await fetch(`/api/v1/results/${jobId}/mermaid`);
+            // Get Mermaid Code (the versioned link can be served straight from the browser cache)
+            const mmdRes = await fetch((links && links.mermaid) || `/api/v1/results/${jobId}/mermaid`);
             if (!mmdRes.ok) throw new Error('Failed to fetch result code');
             const mmdCode = await mmdRes.text();
 
@@ -333,7 +407,11 @@ document.addEventListener('DOMContentLoaded', () => {
         resultSection.classList.add('hidden');
 
         if (step === 'upload') uploadSection.classList.remove('hidden');
-        if (step === 'processing') progressSection.classList.remove('hidden');
+        if (step === 'processing') {
+            partialPreview.innerHTML = '';
+            partialPreview.classList.add('hidden');
+            progressSection.classList.remove('hidden');
+        }
         if (step === 'result') resultSection.classList.remove('hidden');
     }
 
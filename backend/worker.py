@@ -0,0 +1,124 @@
+"""
+Standalone job worker.
+
+Runs pipeline jobs from the shared job queue so processing can scale
+independently of the API processes:
+
+    JOB_WORKERS_EMBEDDED=false uvicorn backend.main:app --workers 4
+    python -m backend.worker --processes 2 --concurrency 4 --metrics-port 9100
+
+With --metrics-port, worker process i serves Prometheus metrics on port + i.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import signal
+from loguru import logger
+from backend.app.core.config import settings
+from backend.app.core.logging import setup_logging
+
+async def _serve_metrics(port: int) -> asyncio.AbstractServer:
+    """Minimal HTTP responder for GET /metrics (a worker has no FastAPI app)."""
+    from backend.app.api.endpoints.stats import PROMETHEUS_CONTENT_TYPE
+    from backend.app.core.metrics import metrics
+    from backend.app.services.jobs.base import get_job_queue
+    from backend.app.services.jobs.worker import report_queue_depth
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass # Skip headers
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                try:
+                    await asyncio.to_thread(report_queue_depth, get_job_queue())
+                except Exception:
+                    pass
+                status, content_type, body = "200 OK", PROMETHEUS_CONTENT_TYPE, metrics.render_prometheus().encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "0.0.0.0", port)
+    logger.info(f"Worker metrics on :{port}/metrics")
+    return server
+
+async def _serve(concurrency: int, metrics_port: int = 0):
+    from backend.app.api.endpoints.process import run_pipeline
+    from backend.app.services.jobs.base import get_job_queue
+    from backend.app.services.jobs.worker import JobWorker
+    from backend.app.services.mermaid.worker_pool import render_pool
+    from backend.app.services.vision.registry import close_vision_providers
+    from backend.app.core.executor import cpu_executor
+    from backend.app.services.ocr import warm_up_ocr_engines
+    from backend.app.core.tracing import tracer
+
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, main_task.cancel)
+
+    metrics_server = await _serve_metrics(metrics_port) if metrics_port else None
+
+    if settings.OCR_WARMUP_ON_STARTUP:
+        await cpu_executor.broadcast(warm_up_ocr_engines)
+
+    worker = JobWorker(get_job_queue(), lambda job: run_pipeline(job.job_id, debug=job.payload.get("debug", False), worker_id=job.lease_owner), concurrency)
+    try:
+        await worker.run()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if metrics_server:
+            metrics_server.close()
+        await render_pool.close()
+        await close_vision_providers()
+        cpu_executor.shutdown()
+        tracer.shutdown()
+
+def run_worker_process(concurrency: int, metrics_port: int = 0):
+    setup_logging()
+    asyncio.run(_serve(concurrency, metrics_port))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pipeline workers against the shared job queue.")
+    parser.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_CONCURRENCY, help="Jobs run at once per process")
+    parser.add_argument("--metrics-port", type=int, default=settings.WORKER_METRICS_PORT, help="Serve /metrics here (0 = off)")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker_process(args.concurrency, args.metrics_port)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=run_worker_process,
+            args=(args.concurrency, args.metrics_port + i if args.metrics_port else 0),
+            name=f"worker-{i}",
+        )
+        for i in range(args.processes)
+    ]
+    for p in processes:
+        p.start()
+    logger.info(f"Started {len(processes)} worker processes")
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Measures /health latency while N OCR jobs run on a live server.
+
+If CPU-bound stages blocked the event loop, /health latency would jump to
+the duration of an OCR pass while jobs are running. With the CPU executor
+it should stay flat.
+
+    uvicorn backend.main:app &
+    python benchmarks/health_latency.py --jobs 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import httpx
+
+BASE_URL = "http://localhost:8000"
+API_URL = f"{BASE_URL}/api/v1"
+TEST_IMAGE_PATH = "test_images/sample_flowchart.png"
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(name, samples):
+    if not samples:
+        print(f"{name}: no samples")
+        return
+    print(
+        f"{name}: n={len(samples)} "
+        f"p50={percentile(samples, 50) * 1000:.1f}ms "
+        f"p95={percentile(samples, 95) * 1000:.1f}ms "
+        f"max={max(samples) * 1000:.1f}ms "
+        f"mean={statistics.mean(samples) * 1000:.1f}ms"
+    )
+
+async def sample_health(client, stop, samples, interval=0.05):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(f"{BASE_URL}/health")
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+async def sample_for(client, duration):
+    stop, samples = asyncio.Event(), []
+    asyncio.get_running_loop().call_later(duration, stop.set)
+    await sample_health(client, stop, samples)
+    return samples
+
+async def start_job(client, image_bytes):
+    # Trailing bytes after the PNG end chunk are ignored by decoders but make
+    # every upload unique, so the result cache doesn't skip OCR
+    unique_bytes = image_bytes + os.urandom(16)
+    response = await client.post(f"{API_URL}/upload", files={"file": ("bench.png", unique_bytes, "image/png")})
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    response = await client.post(f"{API_URL}/process/{job_id}")
+    response.raise_for_status()
+    return job_id
+
+async def wait_for_jobs(client, job_ids, timeout):
+    deadline = time.perf_counter() + timeout
+    pending = set(job_ids)
+    while pending and time.perf_counter() < deadline:
+        for job_id in list(pending):
+            status = (await client.get(f"{API_URL}/status/{job_id}")).json()["status"]
+            if status.startswith("completed") or status.startswith("failed"):
+                pending.discard(job_id)
+        await asyncio.sleep(0.5)
+    return pending
+
+async def main(jobs, baseline_seconds, timeout):
+    with open(TEST_IMAGE_PATH, "rb") as f:
+        image_bytes = f.read()
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        print(f"Sampling idle /health for {baseline_seconds}s...")
+        summarize("idle", await sample_for(client, baseline_seconds))
+
+        print(f"Starting {jobs} jobs...")
+        start = time.perf_counter()
+        job_ids = await asyncio.gather(*(start_job(client, image_bytes) for _ in range(jobs)))
+
+        stop, loaded = asyncio.Event(), []
+        sampler = asyncio.create_task(sample_health(client, stop, loaded))
+        pending = await wait_for_jobs(client, job_ids, timeout)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await sampler
+
+        print(f"{jobs - len(pending)}/{jobs} jobs finished in {elapsed:.1f}s")
+        summarize("under load", loaded)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.jobs, args.baseline_seconds, args.timeout))
@@ -0,0 +1,119 @@
+"""
+Tail latency of vision calls with and without hedging, simulated offline.
+
+Two fake providers answer after delays drawn from the mock API's latency
+distributions, and a fraction of primary calls hit a 429 backoff. The same
+sequence of calls goes through the primary alone and through
+HedgedVisionProvider(primary, backup); the report compares latency
+percentiles and how many backup calls were paid for.
+
+Times are scaled down (--time-scale) so thousands of calls take seconds.
+
+    python benchmarks/hedged_vision.py
+    python benchmarks/hedged_vision.py --primary lognormal:4,0.6 --backup lognormal:5,0.5 --stall-rate 0.03 --budget 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.app.services.vision.base import VisionProvider  # noqa: E402
+from backend.app.services.vision.hedged import HedgedVisionProvider  # noqa: E402
+from mock_vision_api import DEFAULT_ANSWER, Latency  # noqa: E402
+
+class SimulatedProvider(VisionProvider):
+    """Sleeps for the next pre-drawn delay (already scaled) and returns the mock answer."""
+    def __init__(self, name, delays):
+        self.name = name
+        self.model_name = name
+        self.delays = delays
+        self.started = 0
+
+    async def analyze(self, image, prompt, status_callback=None, payload=None):
+        delay = self.delays[self.started % len(self.delays)]
+        self.started += 1
+        await asyncio.sleep(delay)
+        return dict(DEFAULT_ANSWER)
+
+def draw(spec, count, stall_rate, stall, rng, scale):
+    latency = Latency(spec)
+    return [
+        (latency.sample(rng) + (stall if rng.random() < stall_rate else 0.0)) * scale
+        for _ in range(count)
+    ]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+async def run(provider, calls, concurrency, scale):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await provider.analyze(None, "")
+            latencies.append((time.perf_counter() - start) / scale)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--primary", default="lognormal:4,0.35", help="Primary latency (mock_vision_api.py syntax, seconds)")
+    parser.add_argument("--backup", default="lognormal:5,0.35", help="Backup latency")
+    parser.add_argument("--stall-rate", type=float, default=0.02, help="Fraction of primary calls held by a 429 backoff")
+    parser.add_argument("--stall", type=float, default=40.0, help="Seconds a 429 backoff adds")
+    parser.add_argument("--percentile", type=float, default=0.95)
+    parser.add_argument("--budget", type=float, default=0.1)
+    parser.add_argument("--time-scale", type=float, default=0.002, help="Simulated seconds -> real seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    primary_delays = draw(args.primary, args.calls, args.stall_rate, args.stall, rng, args.time_scale)
+    backup_delays = draw(args.backup, args.calls, 0.0, 0.0, rng, args.time_scale)
+
+    rows = {}
+    single = SimulatedProvider("primary", primary_delays)
+    rows["primary only"] = {"latencies": asyncio.run(run(single, args.calls, args.concurrency, args.time_scale)), "backup_calls": 0}
+
+    backup = SimulatedProvider("backup", backup_delays)
+    hedged = HedgedVisionProvider(
+        SimulatedProvider("primary", primary_delays), backup,
+        percentile=args.percentile, budget=args.budget, default_delay=10.0 * args.time_scale,
+    )
+    rows["hedged"] = {"latencies": asyncio.run(run(hedged, args.calls, args.concurrency, args.time_scale)), "backup_calls": backup.started}
+
+    results = {}
+    for name, row in rows.items():
+        latencies = row["latencies"]
+        results[name] = {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+            "extra_calls": row["backup_calls"] / args.calls,
+        }
+        r = results[name]
+        print(
+            f"{name:13} p50 {r['p50']:6.2f}s  p95 {r['p95']:6.2f}s  p99 {r['p99']:6.2f}s  max {r['max']:6.2f}s  "
+            f"backup calls {r['extra_calls']:.1%}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
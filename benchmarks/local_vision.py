@@ -0,0 +1,111 @@
+"""
+Accuracy and latency of the local (OpenCV) vision detector on synthetic
+flowcharts, and how well its confidence predicts a correct answer, to pick
+LOCAL_VISION_MIN_CONFIDENCE.
+
+A diagram counts as correct when every node is found with the right shape
+and the edge set (with directions) matches the ground truth exactly.
+
+    python benchmarks/local_vision.py --seeds 10 --threshold 0.85
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.app.services.preprocessing import ImagePreprocessor  # noqa: E402
+from backend.app.services.vision.local import LocalDiagramDetector  # noqa: E402
+from synthetic import generate_flowchart, parse_size  # noqa: E402
+
+# Vertical chains are what the fast path is for; grids and crowded charts are turned
+# away by LocalDiagramDetector.screen before tracing and should be cheap to escalate
+CASES = {
+    "chain": {"nodes": 4, "edges": 3, "size": "800x1600", "noise": 0.1},
+    "chain-noisy": {"nodes": 6, "edges": 5, "size": "1000x2000", "noise": 0.3},
+    "grid": {"nodes": 8, "edges": 7, "size": "1600x1200", "noise": 0.3},
+    "crowded": {"nodes": 12, "edges": 15, "size": "1600x1200", "noise": 0.3},
+    "large": {"nodes": 20, "edges": 19, "size": "3000x2250", "noise": 0.3},
+}
+
+def score(truth, result):
+    """(nodes found, shapes right, edges right, exact) against the ground truth, matching nodes by bbox center."""
+    mapping = {}
+    for node in result["nodes"]:
+        x, y, w, h = node["bbox"]
+        cx, cy = x + w / 2, y + h / 2
+        for t in truth["nodes"]:
+            tx, ty, tw, th = t["bbox"]
+            if tx <= cx <= tx + tw and ty <= cy <= ty + th:
+                mapping[node["id"]] = t
+    shapes = sum(1 for node in result["nodes"] if node["id"] in mapping and mapping[node["id"]]["shape"] == node["shape"])
+    expected = {(e["from"], e["to"]) for e in truth["edges"]}
+    found = {
+        (mapping[e["from"]]["id"], mapping[e["to"]]["id"])
+        for e in result["edges"]
+        if e["type"] == "arrow" and e["from"] in mapping and e["to"] in mapping
+    }
+    exact = (
+        len(result["nodes"]) == len(truth["nodes"]) == len({t["id"] for t in mapping.values()})
+        and shapes == len(truth["nodes"])
+        and found == expected
+        and len(result["edges"]) == len(expected)
+    )
+    return len(mapping), shapes, len(found & expected), exact
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", action="append", choices=list(CASES), help="Repeatable (default: all)")
+    parser.add_argument("--seeds", type=int, default=5, help="Diagrams per case")
+    parser.add_argument("--threshold", type=float, default=None, help="Confidence to evaluate (default LOCAL_VISION_MIN_CONFIDENCE)")
+    parser.add_argument("--json", help="Write per-diagram results to this file")
+    args = parser.parse_args()
+
+    from backend.app.core.config import settings
+    threshold = settings.LOCAL_VISION_MIN_CONFIDENCE if args.threshold is None else args.threshold
+
+    rows = []
+    for name in args.case or list(CASES):
+        params = CASES[name]
+        width, height = parse_size(params["size"])
+        latencies = []
+        for seed in range(args.seeds):
+            image, truth = generate_flowchart(params["nodes"], params["edges"], width, height, params["noise"], seed)
+            binary = ImagePreprocessor.preprocess(image)
+            start = time.perf_counter()
+            result = LocalDiagramDetector.detect(binary)
+            latencies.append((time.perf_counter() - start) * 1000)
+            nodes, shapes, edges, exact = score(truth, result)
+            rows.append({
+                "case": name, "seed": seed, "confidence": result["confidence"], "exact": exact,
+                "nodes": nodes, "shapes": shapes, "edges": edges,
+                "truth_nodes": len(truth["nodes"]), "truth_edges": len(truth["edges"]),
+                "latency_ms": latencies[-1], "scores": result["local_scores"],
+            })
+        case_rows = rows[-args.seeds:]
+        accepted = [r for r in case_rows if r["confidence"] >= threshold]
+        screened = sum(1 for r in case_rows if "unsupported" in r["scores"])
+        print(
+            f"{name:<12} {params['nodes']:3} nodes {params['size']:>9}: exact {sum(r['exact'] for r in case_rows)}/{len(case_rows)}, "
+            f"accepted {len(accepted)} ({sum(r['exact'] for r in accepted)} exact), screened out {screened}, "
+            f"median confidence {statistics.median(r['confidence'] for r in case_rows):.2f}, "
+            f"p50 {statistics.median(latencies):6.1f}ms"
+        )
+
+    accepted = [r for r in rows if r["confidence"] >= threshold]
+    wrong = [f"{r['case']}#{r['seed']}" for r in accepted if not r["exact"]]
+    print(
+        f"\nThreshold {threshold}: {len(accepted)}/{len(rows)} diagrams answered locally, "
+        f"{len(wrong)} of them not exact" + (f" ({', '.join(wrong)})" if wrong else "")
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
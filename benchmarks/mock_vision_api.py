@@ -0,0 +1,374 @@
+"""
+Local stand-in for the OpenAI and Gemini vision APIs, so the real provider
+code (SDK clients, connection pools, retries, rate limiting) can be
+load-tested offline. Point the backend at it with the base-URL settings:
+
+    python benchmarks/mock_vision_api.py --port 8090 --latency lognormal:1.5,0.4 --rate-429 0.1
+    OPENAI_BASE_URL=http://localhost:8090/v1 OPENAI_API_KEY=mock VISION_PROVIDER=openai uvicorn backend.main:app
+    GEMINI_BASE_URL=http://localhost:8090 GEMINI_API_KEY=mock VISION_PROVIDER=gemini uvicorn backend.main:app
+
+Streaming requests (OpenAI `stream: true`, Gemini `:streamGenerateContent`)
+are answered as server-sent events: the first chunk arrives after 10% of the
+sampled latency and the rest of the answer is spread over the remainder, in
+--stream-chunk character pieces.
+
+Faults: --rate-429 (random 429s with a "retry in Xs" hint and Retry-After),
+--rpm (429 once a real per-minute budget is spent), --fence-rate (answer
+wrapped in ```json fences), --truncate-rate (answer cut off mid-JSON).
+
+Record real answers once, then replay them (keyed by the image sent):
+
+    python benchmarks/mock_vision_api.py --record captured.jsonl --upstream
+    python benchmarks/mock_vision_api.py --replay captured.jsonl --latency replay
+
+Counters are served at GET /_mock/stats.
+"""
+import argparse
+import asyncio
+import base64
+import collections
+import hashlib
+import itertools
+import json
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+UPSTREAM = {
+    "openai": "https://api.openai.com/v1",
+    "gemini": "https://generativelanguage.googleapis.com",
+}
+
+# Same answer as StubVisionProvider when nothing was recorded
+DEFAULT_ANSWER = {
+    "diagram_type": "flowchart",
+    "nodes": [
+        {"id": "N1", "label": "Start", "shape": "circle", "bbox": [50, 50, 100, 50]},
+        {"id": "N2", "label": "Process", "shape": "rectangle", "bbox": [50, 150, 100, 50]},
+        {"id": "N3", "label": "End", "shape": "circle", "bbox": [50, 250, 100, 50]},
+    ],
+    "edges": [
+        {"from": "N1", "to": "N2", "type": "arrow", "label": ""},
+        {"from": "N2", "to": "N3", "type": "arrow", "label": ""},
+    ],
+}
+
+class Latency:
+    """
+    Response delay in seconds: fixed:S, uniform:A,B, normal:MEAN,SD,
+    lognormal:MEDIAN,SIGMA, exp:MEAN, or replay (the recorded latency).
+    """
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in ("fixed", "uniform", "normal", "lognormal", "exp", "replay"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random, recorded: Optional[float] = None) -> float:
+        p = self.params
+        if self.kind == "replay":
+            return recorded or 0.0
+        if self.kind == "fixed":
+            return p[0]
+        if self.kind == "uniform":
+            return rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(p[0], p[1]))
+        if self.kind == "lognormal":
+            # MEDIAN seconds with a multiplicative spread, the usual shape of API latency
+            return p[0] * rng.lognormvariate(0, p[1])
+        return rng.expovariate(1 / p[0])
+
+class Recordings:
+    """Captured model answers, one JSON object per line: {api, image_sha256, content, latency}."""
+    def __init__(self, path: Optional[str]):
+        self.by_image: Dict[str, Dict[str, Any]] = {}
+        self.by_api: Dict[str, List[Dict[str, Any]]] = collections.defaultdict(list)
+        if path:
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.by_image[f"{entry['api']}:{entry['image_sha256']}"] = entry
+                        self.by_api[entry["api"]].append(entry)
+        self._cycles = {api: itertools.cycle(entries) for api, entries in self.by_api.items()}
+
+    def find(self, api: str, image_sha256: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The answer recorded for this image, else the next recording of the API in turn."""
+        entry = self.by_image.get(f"{api}:{image_sha256}")
+        if entry is None and api in self._cycles:
+            entry = next(self._cycles[api])
+        return entry
+
+def _image_sha256(data_b64: Optional[str]) -> Optional[str]:
+    if not data_b64:
+        return None
+    # The Gemini SDK sends URL-safe base64 without padding
+    data = base64.urlsafe_b64decode(data_b64.replace("+", "-").replace("/", "_") + "=" * (-len(data_b64) % 4))
+    return hashlib.sha256(data).hexdigest()
+
+def openai_image(body: Dict[str, Any]) -> Optional[str]:
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            for part in content:
+                url = (part.get("image_url") or {}).get("url", "")
+                if url.startswith("data:"):
+                    return _image_sha256(url.split(",", 1)[1])
+    return None
+
+def gemini_image(body: Dict[str, Any]) -> Optional[str]:
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            inline = part.get("inlineData") or part.get("inline_data")
+            if inline:
+                return _image_sha256(inline.get("data"))
+    return None
+
+def openai_text(body: Dict[str, Any]) -> Optional[str]:
+    try:
+        return body["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+def gemini_text(body: Dict[str, Any]) -> Optional[str]:
+    try:
+        return "".join(part.get("text", "") for part in body["candidates"][0]["content"]["parts"])
+    except (KeyError, IndexError, TypeError):
+        return None
+
+def openai_response(model: str, content: str, truncated: bool) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "length" if truncated else "stop",
+        }],
+        "usage": {"prompt_tokens": 1000, "completion_tokens": len(content) // 4, "total_tokens": 1000 + len(content) // 4},
+    }
+
+def gemini_response(model: str, content: str, truncated: bool) -> Dict[str, Any]:
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": content}]},
+            "finishReason": "MAX_TOKENS" if truncated else "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {"promptTokenCount": 1000, "candidatesTokenCount": len(content) // 4, "totalTokenCount": 1000 + len(content) // 4},
+        "modelVersion": model,
+    }
+
+def openai_chunk(model: str, content: str, finish_reason: Optional[str]) -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-mock-stream",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": finish_reason}],
+    }
+
+def gemini_chunk(model: str, content: str, finish_reason: Optional[str]) -> Dict[str, Any]:
+    chunk = gemini_response(model, content, finish_reason == "length")
+    if finish_reason is None:
+        del chunk["candidates"][0]["finishReason"]
+    return chunk
+
+def openai_429(retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        headers={"retry-after": f"{retry_after:g}", "x-ratelimit-remaining-requests": "0"},
+        content={"error": {
+            "message": f"Rate limit reached for requests (mock). Please try again in {retry_after:g}s.",
+            "type": "requests",
+            "param": None,
+            "code": "rate_limit_exceeded",
+        }},
+    )
+
+def gemini_429(retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"error": {
+            "code": 429,
+            "message": f"You exceeded your current quota (mock). Please retry in {retry_after:g}s.",
+            "status": "RESOURCE_EXHAUSTED",
+            "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{int(retry_after)}s"}],
+        }},
+    )
+
+API = {
+    "openai": {"image": openai_image, "text": openai_text, "response": openai_response, "chunk": openai_chunk, "rate_limited": openai_429},
+    "gemini": {"image": gemini_image, "text": gemini_text, "response": gemini_response, "chunk": gemini_chunk, "rate_limited": gemini_429},
+}
+
+def create_app(args) -> FastAPI:
+    upstream = httpx.AsyncClient(timeout=300) if args.upstream else None
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        if upstream is not None:
+            await upstream.aclose()
+
+    app = FastAPI(title="Mock vision APIs", lifespan=lifespan)
+    rng = random.Random(args.seed)
+    latency = Latency(args.latency)
+    recordings = Recordings(args.replay)
+    stats = collections.Counter()
+    windows = collections.defaultdict(collections.deque) # api -> request times within the last minute, for --rpm
+    record_lock = asyncio.Lock()
+
+    def rpm_wait(api: str) -> float:
+        """Seconds until the per-minute budget has room again (0 = serve this request)."""
+        if args.rpm <= 0:
+            return 0.0
+        window, now = windows[api], time.monotonic()
+        while window and window[0] <= now - 60:
+            window.popleft()
+        if len(window) >= args.rpm:
+            return window[0] + 60 - now
+        window.append(now)
+        return 0.0
+
+    async def record(api: str, image: Optional[str], content: Optional[str], seconds: float):
+        if not args.record or content is None:
+            return
+        line = json.dumps({"api": api, "image_sha256": image, "content": content, "latency": round(seconds, 3)})
+        async with record_lock:
+            with open(args.record, "a") as f:
+                f.write(line + "\n")
+
+    async def forward(api: str, request: Request, path: str, body: Dict[str, Any], image: Optional[str]):
+        headers = {k: v for k, v in request.headers.items() if k.lower() in ("authorization", "x-goog-api-key", "content-type")}
+        start = time.perf_counter()
+        response = await upstream.post(f"{UPSTREAM[api]}/{path}", params=dict(request.query_params), headers=headers, json=body)
+        seconds = time.perf_counter() - start
+        stats[f"{api}_upstream_{response.status_code}"] += 1
+        payload = response.json()
+        if response.status_code == 200:
+            await record(api, image, API[api]["text"](payload), seconds)
+        return JSONResponse(status_code=response.status_code, content=payload)
+
+    async def forward_stream(api: str, request: Request, path: str, body: Dict[str, Any]):
+        # Piped through unrecorded
+        headers = {k: v for k, v in request.headers.items() if k.lower() in ("authorization", "x-goog-api-key", "content-type")}
+        upstream_request = upstream.build_request("POST", f"{UPSTREAM[api]}/{path}", params=dict(request.query_params), headers=headers, json=body)
+        response = await upstream.send(upstream_request, stream=True)
+        stats[f"{api}_upstream_{response.status_code}"] += 1
+
+        async def relay():
+            try:
+                async for data in response.aiter_raw():
+                    yield data
+            finally:
+                await response.aclose()
+
+        return StreamingResponse(relay(), status_code=response.status_code, media_type=response.headers.get("content-type"))
+
+    async def answer(api: str, request: Request, path: str, model: str, stream: bool = False):
+        body = await request.json()
+        handlers = API[api]
+        image = handlers["image"](body)
+        stats[f"{api}_requests"] += 1
+        stream = stream or bool(body.get("stream"))
+
+        if upstream is not None:
+            if stream:
+                return await forward_stream(api, request, path, body)
+            return await forward(api, request, path, body, image)
+
+        wait = rpm_wait(api)
+        if wait or rng.random() < args.rate_429:
+            stats[f"{api}_429"] += 1
+            # A short delay even for errors, as the real APIs take time to refuse
+            await asyncio.sleep(0.05)
+            return handlers["rate_limited"](round(wait, 1) if wait else args.retry_hint)
+
+        recorded = recordings.find(api, image)
+        content = recorded["content"] if recorded else json.dumps(DEFAULT_ANSWER)
+        delay = latency.sample(rng, recorded.get("latency") if recorded else None)
+        if not stream:
+            await asyncio.sleep(delay)
+
+        truncated = False
+        if rng.random() < args.fence_rate:
+            stats[f"{api}_fenced"] += 1
+            content = f"Here is the diagram:\n```json\n{content}\n```"
+        if rng.random() < args.truncate_rate:
+            stats[f"{api}_truncated"] += 1
+            truncated = True
+            content = content[: rng.randint(1, max(1, len(content) - 1))]
+
+        stats[f"{api}_ok"] += 1
+        if stream:
+            stats[f"{api}_streamed"] += 1
+            return StreamingResponse(sse_chunks(api, model, content, truncated, delay), media_type="text/event-stream")
+        return JSONResponse(handlers["response"](model, content, truncated))
+
+    async def sse_chunks(api: str, model: str, content: str, truncated: bool, delay: float):
+        pieces = [content[i:i + args.stream_chunk] for i in range(0, len(content), args.stream_chunk)] or [""]
+        await asyncio.sleep(0.1 * delay)
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            chunk = API[api]["chunk"](model, piece, ("length" if truncated else "stop") if last else None)
+            yield f"data: {json.dumps(chunk)}\n\n"
+            if not last:
+                await asyncio.sleep(0.9 * delay / max(1, len(pieces) - 1))
+        if api == "openai":
+            yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        body = await request.json()
+        return await answer("openai", request, "chat/completions", body.get("model", "gpt-4o"))
+
+    @app.post("/{version}/models/{model}:generateContent")
+    async def gemini_generate(version: str, model: str, request: Request):
+        return await answer("gemini", request, f"{version}/models/{model}:generateContent", model)
+
+    @app.post("/{version}/models/{model}:streamGenerateContent")
+    async def gemini_stream(version: str, model: str, request: Request):
+        return await answer("gemini", request, f"{version}/models/{model}:streamGenerateContent", model, stream=True)
+
+    @app.get("/_mock/stats")
+    async def get_stats():
+        return dict(stats)
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="fixed:0.5", help="fixed:S | uniform:A,B | normal:MEAN,SD | lognormal:MEDIAN,SIGMA | exp:MEAN | replay")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rpm", type=int, default=0, help="Also 429 once this many requests were served in the last minute")
+    parser.add_argument("--retry-hint", type=float, default=2.0, help="Seconds suggested in 429 responses")
+    parser.add_argument("--fence-rate", type=float, default=0.0, help="Fraction of answers wrapped in ```json fences")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fraction of answers cut off mid-JSON")
+    parser.add_argument("--stream-chunk", type=int, default=32, help="Characters per chunk of streamed answers")
+    parser.add_argument("--replay", help="Serve answers recorded with --record")
+    parser.add_argument("--record", help="Append answers from the real APIs to this file (needs --upstream)")
+    parser.add_argument("--upstream", action="store_true", help="Forward requests to the real APIs instead of answering")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.record and not args.upstream:
+        parser.error("--record needs --upstream")
+    Latency(args.latency) # Fail fast on a bad spec
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
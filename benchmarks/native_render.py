@@ -0,0 +1,119 @@
+"""
+Latency of the built-in (native) renderer on synthetic flowcharts: layout,
+SVG and PNG separately, plus the edge crossings left after ordering.
+Diagrams are the synthetic ground truth, with yes/no labels on decision
+edges and a few back edges (loops) so cycle removal is exercised.
+
+With --mermaid the same diagrams also go through Mermaid CLI (uncached,
+needs `mmdc`) for comparison.
+
+    python benchmarks/native_render.py
+    python benchmarks/native_render.py --nodes 8 --nodes 60 --repeat 50 --mermaid
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.app.core.config import settings  # noqa: E402
+from backend.app.services.inference import Diagram, Edge, Node  # noqa: E402
+from backend.app.services.mermaid.generator import MermaidGenerator  # noqa: E402
+from backend.app.services.native.layout import SugiyamaLayout  # noqa: E402
+from backend.app.services.native.renderer import NativeRenderer  # noqa: E402
+from synthetic import generate_flowchart  # noqa: E402
+
+def build_diagram(nodes: int, seed: int) -> Diagram:
+    # The image itself isn't needed, so it's drawn small
+    _, truth = generate_flowchart(nodes, nodes + nodes // 3, 400, 300, noise=0.0, seed=seed)
+    rng = random.Random(seed)
+    shapes = {n["id"]: n["shape"] for n in truth["nodes"]}
+    edges, answers = [], {}
+    for e in truth["edges"]:
+        label = None
+        if shapes[e["from"]] == "diamond":
+            answers[e["from"]] = answers.get(e["from"], -1) + 1
+            label = "yes" if answers[e["from"]] % 2 == 0 else "no"
+        edges.append(Edge(source=e["from"], target=e["to"], label=label, type=rng.choice(["arrow", "arrow", "dotted"])))
+    ids = [n["id"] for n in truth["nodes"]]
+    for _ in range(max(1, nodes // 10)):
+        a, b = sorted(rng.sample(range(len(ids)), 2))
+        edges.append(Edge(source=ids[b], target=ids[a], label="retry"))
+    return Diagram(
+        nodes=[Node(id=n["id"], label=n["label"], shape=n["shape"]) for n in truth["nodes"]],
+        edges=edges,
+    )
+
+def timed(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, action="append", help="Diagram size (repeatable, default 6, 15, 40)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=float, default=settings.NATIVE_RENDER_SCALE, help="PNG pixels per SVG unit")
+    parser.add_argument("--mermaid", action="store_true", help="Also time Mermaid CLI (one-shot, no render cache)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    for nodes in args.nodes or [6, 15, 40]:
+        diagram = build_diagram(nodes, args.seed)
+        layout = SugiyamaLayout.layout(diagram)
+        png = NativeRenderer.to_png(layout, args.scale)
+        row = {
+            "nodes": len(layout.nodes),
+            "edges": len(layout.edges),
+            "crossings": layout.crossings,
+            "canvas": f"{layout.width:.0f}x{layout.height:.0f}",
+            "layout_ms": timed(lambda: SugiyamaLayout.layout(diagram), args.repeat),
+            "svg_ms": timed(lambda: NativeRenderer.to_svg(SugiyamaLayout.layout(diagram)), args.repeat),
+            "png_ms": timed(lambda: NativeRenderer.to_png(SugiyamaLayout.layout(diagram), args.scale), args.repeat),
+            "png_bytes": len(png),
+        }
+        if args.mermaid:
+            row["mermaid_png_ms"] = mermaid_ms(diagram, max(1, args.repeat // 10))
+        rows.append(row)
+        print(
+            f"{row['nodes']:3} nodes {row['edges']:3} edges ({row['crossings']} crossings, {row['canvas']}): "
+            f"layout {row['layout_ms']:6.2f}ms, SVG {row['svg_ms']:6.2f}ms, PNG {row['png_ms']:7.2f}ms ({row['png_bytes'] / 1024:.0f} KiB)"
+            + (f", Mermaid CLI {row['mermaid_png_ms']:8.1f}ms" if "mermaid_png_ms" in row else "")
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Wrote {args.json}")
+
+def mermaid_ms(diagram: Diagram, repeat: int) -> float:
+    from backend.app.services.cache import render_cache
+    from backend.app.services.mermaid.renderer import MermaidRenderer
+
+    render_cache.enabled = False
+    code = MermaidGenerator.generate_code(diagram)
+    renderer = MermaidRenderer()
+    loop = asyncio.new_event_loop()
+
+    def render():
+        os.remove(loop.run_until_complete(renderer.render(code)))
+
+    try:
+        return timed(render, repeat)
+    finally:
+        loop.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cost of matching OCR text boxes to vision nodes: the grid-indexed, vectorized
+matcher against a plain nested loop over every (text, node) pair. Runs on
+generated layouts, no images needed.
+
+    python benchmarks/ocr_reconcile.py --nodes 100 300 --texts 1000 5000 --repeat 50
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.app.core.config import settings  # noqa: E402
+from backend.app.services import reconcile  # noqa: E402
+from backend.app.services.inference import Edge, InferenceEngine, Node  # noqa: E402
+
+def layout(nodes: int, texts: int, seed: int = 0):
+    """Nodes on a grid, ~90% of the words inside nodes and the rest floating between them."""
+    rng = np.random.default_rng(seed)
+    cols = int(np.ceil(np.sqrt(nodes)))
+    idx = np.arange(nodes)
+    node_xywh = np.stack([idx % cols * 300 + 20, idx // cols * 200 + 20, np.full(nodes, 220), np.full(nodes, 110)], axis=1)
+
+    inside = int(texts * 0.9)
+    owner = rng.integers(0, nodes, inside)
+    x = node_xywh[owner, 0] + rng.uniform(5, 150, inside)
+    y = node_xywh[owner, 1] + rng.uniform(5, 80, inside)
+    fx = rng.uniform(0, cols * 300, texts - inside)
+    fy = rng.uniform(0, (nodes // cols + 1) * 200, texts - inside)
+    x, y = np.concatenate([x, fx]), np.concatenate([y, fy])
+    w, h = rng.uniform(20, 60, texts), rng.uniform(15, 25, texts)
+    ocr = [
+        {"text": f"w{i}", "bbox": [[x[i], y[i]], [x[i] + w[i], y[i]], [x[i] + w[i], y[i] + h[i]], [x[i], y[i] + h[i]]], "confidence": 0.9}
+        for i in range(texts)
+    ]
+    return node_xywh.astype(np.float32), ocr
+
+def naive_match(text_boxes, node_boxes, min_containment):
+    """The straightforward O(n*m) loop the index replaces."""
+    result = []
+    for tx1, ty1, tx2, ty2 in text_boxes.tolist():
+        best, best_iou = -1, -1.0
+        text_area = max((tx2 - tx1) * (ty2 - ty1), 1e-6)
+        for j, (nx1, ny1, nx2, ny2) in enumerate(node_boxes.tolist()):
+            inter = max(0.0, min(tx2, nx2) - max(tx1, nx1)) * max(0.0, min(ty2, ny2) - max(ty1, ny1))
+            if inter / text_area < min_containment:
+                continue
+            iou = inter / (text_area + (nx2 - nx1) * (ny2 - ny1) - inter)
+            if iou > best_iou:
+                best, best_iou = j, iou
+        result.append(best)
+    return np.asarray(result)
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--texts", type=int, nargs="+", default=[500, 2000, 5000])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--naive-limit", type=int, default=2_000_000, help="Skip the nested loop above this many pairs")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for nodes in args.nodes:
+        for texts in args.texts:
+            node_xywh, ocr = layout(nodes, texts)
+            boxes, _, _ = reconcile.ocr_boxes(ocr)
+            node_boxes = reconcile.xywh_to_xyxy(node_xywh)
+            containment = settings.OCR_NODE_CONTAINMENT
+
+            matched = reconcile.match_boxes(boxes, node_boxes, containment)
+            row = {
+                "nodes": nodes,
+                "texts": texts,
+                "match_ms": median_ms(lambda: reconcile.match_boxes(boxes, node_boxes, containment), args.repeat),
+                # Reading OCR's per-box dicts into arrays; linear Python work, shared by any matcher
+                "parse_ms": median_ms(lambda: reconcile.ocr_boxes(ocr), args.repeat),
+            }
+
+            # Whole reconciliation (labels, edge labels) as build_graph runs it
+            def full():
+                graph_nodes = [Node(id=f"n{i}", label="Node", bbox=[int(v) for v in b]) for i, b in enumerate(node_xywh)]
+                graph_edges = [Edge(source=f"n{i}", target=f"n{i + 1}") for i in range(nodes - 1)]
+                start = time.perf_counter()
+                InferenceEngine().reconcile_ocr(graph_nodes, graph_edges, ocr)
+                return time.perf_counter() - start
+            row["reconcile_ms"] = statistics.median(full() for _ in range(args.repeat)) * 1000
+
+            if nodes * texts <= args.naive_limit:
+                naive = naive_match(boxes, node_boxes, containment)
+                assert (naive == matched).all(), "vectorized and naive matching disagree"
+                row["naive_ms"] = median_ms(lambda: naive_match(boxes, node_boxes, containment), max(1, args.repeat // 10))
+
+            naive_text = f", naive loop {row['naive_ms']:9.2f}ms ({row['naive_ms'] / row['match_ms']:.0f}x)" if "naive_ms" in row else ""
+            print(f"{nodes:4} nodes {texts:5} texts: match {row['match_ms']:6.3f}ms, parse {row['parse_ms']:5.2f}ms, full reconcile {row['reconcile_ms']:6.2f}ms{naive_text}")
+            results.append(row)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Single-pass against tiled OCR on large synthetic whiteboards (4K-8K).
+
+Each mode runs in a fresh Python process, so peak RSS (VmHWM, Linux only)
+reflects that mode alone. Readers are loaded before timing; `loaded_rss_mb` is the
+footprint with the models in memory, `peak_rss_mb` the high-water mark
+after recognizing the image. Recall is the share of node labels found
+(case-insensitive substring of some detected text).
+
+    python benchmarks/ocr_tiles.py --size 3840x2160 --size 7680x4320 --parallelism 4
+    python benchmarks/ocr_tiles.py --tile-size 1280 --overlap 160 --json tiles.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+def _status_mb(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def rss_mb() -> float:
+    return _status_mb("VmRSS")
+
+def peak_rss_mb() -> float:
+    # VmHWM starts over at exec; ru_maxrss would carry the parent's peak across fork + exec
+    return _status_mb("VmHWM")
+
+def run_mode(mode: str, image_path: str, repeat: int) -> dict:
+    """Runs in the child process: one mode on one preprocessed image."""
+    import cv2
+    from backend.app.services.ocr import extract_text_pooled, extract_text_tiled, ocr_pool, tile_parallelism
+
+    binary = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    # Tiled mode loads one reader per tile in flight; done here so it isn't timed
+    parallel = tile_parallelism() if mode == "tiled" else 1
+    ocr_pool.grow(parallel)
+    loaded = rss_mb()
+
+    loop = asyncio.new_event_loop()
+    samples, results = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if mode == "tiled":
+            results = loop.run_until_complete(extract_text_tiled(binary))
+        else:
+            results = extract_text_pooled(binary)
+        samples.append((time.perf_counter() - start) * 1000)
+    loop.close()
+    return {
+        "mode": mode,
+        "parallel": parallel,
+        "p50_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "detections": len(results),
+        "texts": [r["text"].lower() for r in results],
+        "loaded_rss_mb": loaded,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", action="append", help="WIDTHxHEIGHT (repeatable, default 3840x2160 and 7680x4320)")
+    parser.add_argument("--nodes", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--parallelism", type=int, default=None, help="Overrides OCR_TILE_PARALLELISM (tiles recognized at once; 0 = one per CPU core)")
+    parser.add_argument("--tile-size", type=int, default=None, help="Overrides OCR_TILE_SIZE")
+    parser.add_argument("--overlap", type=int, default=None, help="Overrides OCR_TILE_OVERLAP")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "IMAGE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child[0], args.child[1], args.repeat)))
+        return
+
+    import cv2
+    from backend.app.services.preprocessing import ImagePreprocessor
+    from synthetic import generate_flowchart, parse_size
+
+    env = dict(os.environ, CPU_EXECUTOR="thread", OCR_TILE_THRESHOLD="1")
+    if args.tile_size:
+        env["OCR_TILE_SIZE"] = str(args.tile_size)
+    if args.overlap:
+        env["OCR_TILE_OVERLAP"] = str(args.overlap)
+    if args.parallelism is not None:
+        env["OCR_TILE_PARALLELISM"] = str(args.parallelism)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.size or ["3840x2160", "7680x4320"]:
+            # Drawn and preprocessed here so the children's peak memory is OCR only
+            width, height = parse_size(size)
+            image, truth = generate_flowchart(args.nodes, args.nodes + args.nodes // 2, width, height, noise=0.3, seed=args.seed)
+            image_path = os.path.join(workdir, f"{size}.png")
+            cv2.imwrite(image_path, ImagePreprocessor.preprocess(image))
+            labels = [n["label"].lower() for n in truth["nodes"]]
+            del image
+
+            for mode in ("single", "tiled"):
+                # The single pass only ever uses one reader; the tiled one adds readers as it needs them
+                child_env = dict(env, OCR_POOL_SIZE="1")
+                command = [sys.executable, __file__, "--child", mode, image_path, "--repeat", str(args.repeat)]
+                out = subprocess.run(command, env=child_env, capture_output=True, text=True)
+                if out.returncode != 0:
+                    raise SystemExit(f"{mode} {size} failed:\n{out.stderr[-2000:]}")
+                row = json.loads(out.stdout.strip().splitlines()[-1])
+                texts = row.pop("texts")
+                row.update(size=size, recall=sum(1 for label in labels if any(label in t for t in texts)) / len(labels))
+                rows.append(row)
+                print(
+                    f"{size:>10} {mode:<7} ({row['parallel']} tiles at once): p50 {row['p50_ms']:9.1f}ms, "
+                    f"{row['detections']:4} detections, recall {row['recall']:.0%}, "
+                    f"RSS loaded {row['loaded_rss_mb']:7.1f}MB peak {row['peak_rss_mb']:7.1f}MB "
+                    f"(+{row['peak_rss_mb'] - row['loaded_rss_mb']:.1f}MB)"
+                )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
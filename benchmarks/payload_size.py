@@ -0,0 +1,102 @@
+"""
+Compares the image sent to vision providers before and after the payload
+optimizer: encoded size, encode time, estimated image tokens and upload
+time at a given uplink speed. Runs offline, no API keys needed.
+
+    python benchmarks/payload_size.py test_images/*.png --uplink-mbps 10
+    python benchmarks/payload_size.py photo.jpg --format webp --json results.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.app.services.preprocessing import ImagePreprocessor  # noqa: E402
+from backend.app.services.vision.gemini import GeminiVisionProvider  # noqa: E402
+from backend.app.services.vision.openai import OpenAIVisionProvider  # noqa: E402
+from backend.app.services.vision.payload import PayloadOptimizer  # noqa: E402
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+def baseline_payload(image):
+    # What the providers sent before: the full-resolution image as JPEG (OpenCV default quality)
+    return PayloadOptimizer.prepare(image, max_long_edge=0, image_format="jpeg", quality=95, autocrop=False)
+
+def measure(path, args):
+    image = ImagePreprocessor.load_image(str(path))
+    ink_mask = ImagePreprocessor.preprocess(image)
+    # Token estimates only need the pricing rules, not a configured client
+    gemini = GeminiVisionProvider.__new__(GeminiVisionProvider)
+    openai = OpenAIVisionProvider.__new__(OpenAIVisionProvider)
+
+    rows = {}
+    candidates = {
+        "baseline": lambda: baseline_payload(image),
+        "optimized": lambda: PayloadOptimizer.prepare(
+            image, ink_mask, max_long_edge=args.max_long_edge, image_format=args.format, quality=args.quality
+        ),
+    }
+    for name, build in candidates.items():
+        payload, seconds = timed(build, args.repeat)
+        rows[name] = {
+            "width": payload.width,
+            "height": payload.height,
+            "bytes": len(payload.data),
+            "base64_bytes": len(payload.base64()),
+            "encode_ms": seconds * 1000,
+            "upload_ms": len(payload.base64()) * 8 / (args.uplink_mbps * 1_000_000) * 1000,
+            "gemini_image_tokens": gemini.image_token_cost(payload.width, payload.height),
+            "openai_image_tokens": openai.image_token_cost(payload.width, payload.height),
+        }
+    return {"image": str(path), "original": [image.shape[1], image.shape[0]], **rows}
+
+def report(result):
+    base, opt = result["baseline"], result["optimized"]
+    print(f"{result['image']} ({result['original'][0]}x{result['original'][1]})")
+    for name, row in (("baseline", base), ("optimized", opt)):
+        print(
+            f"  {name:<9} {row['width']}x{row['height']:<5} {row['bytes'] / 1024:8.1f} KiB  "
+            f"encode {row['encode_ms']:6.1f}ms  upload {row['upload_ms']:7.1f}ms  "
+            f"tokens gemini={row['gemini_image_tokens']} openai={row['openai_image_tokens']}"
+        )
+    print(f"  bytes saved: {100 * (1 - opt['bytes'] / base['bytes']):.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", default=["test_images/sample_flowchart.png"])
+    parser.add_argument("--max-long-edge", type=int, default=None)
+    parser.add_argument("--format", default=None, choices=["jpeg", "webp", "png"])
+    parser.add_argument("--quality", type=int, default=None)
+    parser.add_argument("--uplink-mbps", type=float, default=10.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for path in args.images:
+        if cv2.imread(path) is None:
+            print(f"Skipping {path}: not an image")
+            continue
+        result = measure(path, args)
+        report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Offline benchmark of the pipeline stages on synthetic flowcharts.
+
+Each case draws a diagram with benchmarks/synthetic.py, replays its ground
+truth as the vision response (no network, no API keys) and measures
+throughput, latency percentiles and peak Python memory of:
+
+    preprocess  ImagePreprocessor.preprocess
+    ocr         OCRService.extract_text            (skipped without easyocr)
+    inference   InferenceEngine.build_graph
+    generate    MermaidGenerator.generate_code
+    render      MermaidRenderer.render             (skipped without mmdc; render cache bypassed)
+    render_cached  MermaidRenderer.render on a render cache hit
+    render_native  NativeRenderer.draw to PNG (no subprocess)
+
+Results are written as JSON; pass an earlier file to --compare to flag
+stages whose median latency regressed:
+
+    python benchmarks/pipeline_stages.py --json before.json
+    python benchmarks/pipeline_stages.py --case small --case "nodes=30,edges=40,size=2400x1800,noise=0.5" \\
+        --compare before.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.app.core.config import settings  # noqa: E402
+from backend.app.services.inference import InferenceEngine  # noqa: E402
+from backend.app.services.mermaid.generator import MermaidGenerator  # noqa: E402
+from backend.app.services.preprocessing import ImagePreprocessor  # noqa: E402
+from backend.app.services.vision.prompts import FLOWCHART_PROMPT  # noqa: E402
+from backend.app.services.vision.replay import ReplayVisionProvider  # noqa: E402
+from backend.app.services.vision.stub import StubVisionProvider  # noqa: E402
+from synthetic import generate_flowchart, parse_size  # noqa: E402
+
+CASES = {
+    "small": {"nodes": 5, "edges": 5, "size": "800x600", "noise": 0.2},
+    "medium": {"nodes": 12, "edges": 15, "size": "1600x1200", "noise": 0.3},
+    "large": {"nodes": 30, "edges": 40, "size": "3000x2250", "noise": 0.4},
+}
+
+STAGES = ["preprocess", "ocr", "inference", "generate", "render", "render_cached", "render_native"]
+
+# Relative regressions smaller than this many milliseconds are treated as noise
+MIN_REGRESSION_MS = 0.5
+
+class Skip(Exception):
+    pass
+
+def parse_case(spec: str):
+    if spec in CASES:
+        return spec, dict(CASES[spec])
+    params = dict(CASES["medium"])
+    for item in spec.split(","):
+        key, _, value = item.partition("=")
+        if key not in params:
+            raise SystemExit(f"Unknown case parameter {key!r} (use nodes, edges, size, noise)")
+        params[key] = value if key == "size" else type(params[key])(value)
+    return spec, params
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = (len(ordered) - 1) * q
+    low, high = int(index), min(int(index) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (index - low)
+
+def measure(fn, repeat, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    total = time.perf_counter() - started
+
+    # Separate run: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    ms = [s * 1000 for s in samples]
+    return {
+        "runs": repeat,
+        "throughput_per_s": repeat / total if total else None,
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": percentile(ms, 0.5),
+        "p90_ms": percentile(ms, 0.9),
+        "p99_ms": percentile(ms, 0.99),
+        "min_ms": min(ms),
+        "max_ms": max(ms),
+        "peak_alloc_mb": peak / 1024 / 1024,
+    }
+
+def build_stages(loop, image, vision_data, selected):
+    """Stage name -> zero-argument callable, wired with the previous stage's real output."""
+    binary = ImagePreprocessor.preprocess(image)
+
+    ocr_data = []
+    ocr = None
+    if "ocr" in selected:
+        try:
+            from backend.app.services.ocr import OCRService
+            ocr = OCRService()
+            ocr_data = ocr.extract_text(binary)
+        except Exception as e:
+            ocr = e
+
+    engine = InferenceEngine()
+    diagram = engine.build_graph(vision_data, ocr_data)
+    code = MermaidGenerator.generate_code(diagram)
+
+    def run_ocr():
+        if isinstance(ocr, Exception):
+            raise Skip(f"OCR unavailable: {ocr}")
+        ocr.extract_text(binary)
+
+    from backend.app.services.mermaid.renderer import MermaidRenderer
+    from backend.app.services.native.renderer import NativeRenderer
+    renderer = MermaidRenderer()
+
+    def run_render(cached=False):
+        from backend.app.services.cache import render_cache
+        enabled = render_cache.enabled
+        render_cache.enabled = cached and enabled
+        try:
+            path = loop.run_until_complete(renderer.render(code))
+        except Exception as e:
+            raise Skip(f"Render unavailable: {getattr(e, 'message', e)}")
+        finally:
+            render_cache.enabled = enabled
+        os.remove(path)
+
+    return {
+        "preprocess": lambda: ImagePreprocessor.preprocess(image),
+        "ocr": run_ocr,
+        "inference": lambda: engine.build_graph(vision_data, ocr_data),
+        "generate": lambda: MermaidGenerator.generate_code(diagram),
+        "render": run_render,
+        # The first run fills the cache; the rest measure hits
+        "render_cached": lambda: run_render(cached=True),
+        "render_native": lambda: NativeRenderer.draw(diagram, "png"),
+    }
+
+def run_case(loop, name, params, args):
+    width, height = parse_size(params["size"])
+    image, truth = generate_flowchart(params["nodes"], params["edges"], width, height, params["noise"], args.seed)
+
+    # The vision stage is replaced by its recorded answer, exactly as the pipeline would receive it
+    if args.vision == "replay":
+        provider = ReplayVisionProvider()
+        provider.record(image, truth)
+    else:
+        provider = StubVisionProvider()
+    vision_data = loop.run_until_complete(provider.analyze(image, FLOWCHART_PROMPT))
+
+    stages = build_stages(loop, image, vision_data, args.stages)
+    results = {}
+    for stage in args.stages:
+        repeat = args.render_repeat if stage == "render" else args.repeat
+        try:
+            results[stage] = measure(stages[stage], repeat, args.warmup)
+        except Skip as e:
+            results[stage] = {"skipped": str(e)}
+    return {"params": params, "stages": results}
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parents[1],
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def compare(current, baseline, threshold):
+    """Prints p50 changes against a previous run; returns the regressions."""
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} (threshold {threshold:.0%})")
+    for case, data in current["cases"].items():
+        before_case = baseline["cases"].get(case)
+        if not before_case:
+            continue
+        for stage, now in data["stages"].items():
+            before = before_case["stages"].get(stage)
+            if not before or "p50_ms" not in before or "p50_ms" not in now:
+                continue
+            change = now["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+            regressed = change > threshold and now["p50_ms"] - before["p50_ms"] > MIN_REGRESSION_MS
+            print(f"  {case:<10} {stage:<10} {before['p50_ms']:9.2f}ms -> {now['p50_ms']:9.2f}ms {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append((case, stage, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", action="append", help=f"Preset ({', '.join(CASES)}) or nodes=N,edges=N,size=WxH,noise=F (repeatable)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated subset of stages")
+    parser.add_argument("--vision", choices=["replay", "stub"], default="replay", help="replay = the synthetic ground truth")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--render-repeat", type=int, default=3, help="Renders spawn Chromium, so fewer runs")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results here (default benchmarks/results/stages_<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative p50 slowdown counted as a regression")
+    args = parser.parse_args()
+
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    cases = [parse_case(spec) for spec in (args.case or list(CASES))]
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "vision": args.vision,
+            "repeat": args.repeat,
+            "settings": {
+                "ENABLE_PREPROCESSING": settings.ENABLE_PREPROCESSING,
+                "PREPROCESS_OUTPUT": settings.PREPROCESS_OUTPUT,
+                "MERMAID_RENDER_MODE": settings.MERMAID_RENDER_MODE,
+            },
+        },
+        "cases": {},
+    }
+
+    loop = asyncio.new_event_loop()
+    try:
+        for name, params in cases:
+            print(f"{name}: {params['nodes']} nodes, {params['edges']} edges, {params['size']}, noise {params['noise']}")
+            result = run_case(loop, name, params, args)
+            report["cases"][name] = result
+            for stage, stats in result["stages"].items():
+                if "skipped" in stats:
+                    print(f"  {stage:<10} skipped ({stats['skipped']})")
+                else:
+                    print(
+                        f"  {stage:<10} p50 {stats['p50_ms']:9.2f}ms  p90 {stats['p90_ms']:9.2f}ms  p99 {stats['p99_ms']:9.2f}ms"
+                        f"  {stats['throughput_per_s']:8.1f}/s  peak {stats['peak_alloc_mb']:7.1f}MB"
+                    )
+    finally:
+        from backend.app.services.mermaid.worker_pool import render_pool
+        loop.run_until_complete(render_pool.close())
+        loop.close()
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["meta"]["max_rss_mb"] = max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+    path = args.json or str(Path(__file__).resolve().parent / "results" / f"stages_{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Per-operator cost of preprocessing, and what the lean chain saves over the
+old behaviour (every operator, including the unused Canny pass, plus three
+debug PNGs written for every job). Runs offline.
+
+    python benchmarks/preprocess_ops.py test_images/*.png --repeat 10
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.app.core.config import settings  # noqa: E402
+from backend.app.services.preprocessing import DEBUG_ARTIFACTS, OPERATORS, ImagePreprocessor  # noqa: E402
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def measure(path, repeat):
+    image = ImagePreprocessor.load_image(str(path))
+    operators = {}
+    for _ in range(repeat):
+        _, timings = ImagePreprocessor.run_chain(image, list(OPERATORS))
+        for name, seconds in timings.items():
+            operators.setdefault(name, []).append(seconds * 1000)
+
+    with tempfile.TemporaryDirectory() as debug_dir:
+        legacy = median_ms(lambda: ImagePreprocessor.preprocess(image, debug_output_dir=debug_dir), repeat)
+        debug_only = median_ms(lambda: ImagePreprocessor.write_debug_artifacts(image, debug_dir), repeat)
+    lean = median_ms(lambda: ImagePreprocessor.preprocess(image), repeat)
+    return {
+        "image": str(path),
+        "size": [image.shape[1], image.shape[0]],
+        "operators_ms": {name: statistics.median(values) for name, values in operators.items()},
+        "legacy_ms": legacy,
+        "lean_ms": lean,
+        "debug_artifacts_ms": debug_only,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", default=["test_images/sample_flowchart.png"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    print(f"Output: {settings.PREPROCESS_OUTPUT}, debug artifacts: {', '.join(DEBUG_ARTIFACTS.values())}")
+    results = []
+    for path in args.images:
+        result = measure(path, args.repeat)
+        print(f"{result['image']} ({result['size'][0]}x{result['size'][1]})")
+        for name, ms in result["operators_ms"].items():
+            print(f"  {name:<8} {ms:8.2f}ms")
+        saved = 100 * (1 - result["lean_ms"] / result["legacy_ms"])
+        print(f"  legacy (all operators + debug PNGs) {result['legacy_ms']:.2f}ms, lean {result['lean_ms']:.2f}ms ({saved:.0f}% less)")
+        print(f"  debug artifacts alone (off the critical path when enabled) {result['debug_artifacts_ms']:.2f}ms")
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Synthetic hand-drawn-style flowcharts with known structure, for offline
+benchmarks. Each diagram comes with its ground truth in the same JSON shape
+the vision providers return, so it can be replayed instead of calling an API.
+
+    python benchmarks/synthetic.py --nodes 12 --edges 15 --size 1600x1200 --noise 0.4 -o sample.png
+"""
+import argparse
+import json
+import math
+import random
+import sys
+from typing import Any, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+LABELS = [
+    "Start", "End", "Read input", "Validate", "Valid?", "Retry", "Save record", "Send email",
+    "Load config", "Parse file", "Is empty?", "Log error", "Compute total", "Notify user",
+    "Update cache", "Done?", "Fetch data", "Resize", "Approve", "Reject", "Wait", "Merge",
+]
+
+SHAPES = ["rectangle", "rectangle", "rectangle", "diamond", "parallelogram"]
+
+def _wobbly_line(img, p1, p2, rng: random.Random, jitter: float, thickness: int):
+    """A slightly shaky stroke from p1 to p2, drawn as short segments."""
+    (x1, y1), (x2, y2) = p1, p2
+    length = math.hypot(x2 - x1, y2 - y1)
+    steps = max(2, int(length / 12))
+    # Perpendicular direction for the wobble
+    nx, ny = (-(y2 - y1) / length, (x2 - x1) / length) if length else (0.0, 0.0)
+    phase, waves = rng.uniform(0, math.pi), rng.uniform(0.5, 2.0)
+    points = []
+    for i in range(steps + 1):
+        t = i / steps
+        offset = jitter * (math.sin(phase + t * waves * math.pi) + rng.uniform(-0.3, 0.3))
+        points.append((x1 + (x2 - x1) * t + nx * offset, y1 + (y2 - y1) * t + ny * offset))
+    pts = np.array(points, dtype=np.int32).reshape(-1, 1, 2)
+    cv2.polylines(img, [pts], False, 0, thickness, cv2.LINE_AA)
+
+def _polygon(img, corners, rng, jitter, thickness):
+    for i, start in enumerate(corners):
+        end = corners[(i + 1) % len(corners)]
+        # Hand-drawn boxes rarely close exactly: overshoot the corner a little
+        over = rng.uniform(0, jitter)
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        norm = math.hypot(dx, dy) or 1.0
+        _wobbly_line(img, start, (end[0] + dx / norm * over, end[1] + dy / norm * over), rng, jitter, thickness)
+
+def _draw_shape(img, shape: str, box: Tuple[int, int, int, int], rng, jitter, thickness):
+    x, y, w, h = box
+    if shape == "diamond":
+        _polygon(img, [(x + w / 2, y), (x + w, y + h / 2), (x + w / 2, y + h), (x, y + h / 2)], rng, jitter, thickness)
+    elif shape == "parallelogram":
+        skew = w * 0.15
+        _polygon(img, [(x + skew, y), (x + w, y), (x + w - skew, y + h), (x, y + h)], rng, jitter, thickness)
+    elif shape == "circle":
+        cx, cy = x + w / 2, y + h / 2
+        points = []
+        for i in range(48):
+            angle = 2 * math.pi * i / 48
+            r = 1 + rng.uniform(-0.03, 0.03)
+            points.append((cx + w / 2 * r * math.cos(angle), cy + h / 2 * r * math.sin(angle)))
+        cv2.polylines(img, [np.array(points, dtype=np.int32).reshape(-1, 1, 2)], True, 0, thickness, cv2.LINE_AA)
+    else:
+        _polygon(img, [(x, y), (x + w, y), (x + w, y + h), (x, y + h)], rng, jitter, thickness)
+
+def _draw_label(img, text: str, box: Tuple[int, int, int, int], thickness: int, fill: float):
+    x, y, w, h = box
+    font = cv2.FONT_HERSHEY_SCRIPT_SIMPLEX
+    (tw, th), _ = cv2.getTextSize(text, font, 1.0, thickness)
+    scale = min(fill * w / tw, 0.4 * h / th)
+    (tw, th), _ = cv2.getTextSize(text, font, scale, thickness)
+    cv2.putText(img, text, (int(x + (w - tw) / 2), int(y + (h + th) / 2)), font, scale, 0, thickness, cv2.LINE_AA)
+
+def _draw_arrow(img, p1, p2, rng, jitter, thickness, head: float):
+    _wobbly_line(img, p1, p2, rng, jitter, thickness)
+    angle = math.atan2(p2[1] - p1[1], p2[0] - p1[0])
+    for side in (-1, 1):
+        a = angle + math.pi + side * math.radians(rng.uniform(20, 35))
+        _wobbly_line(img, p2, (p2[0] + head * math.cos(a), p2[1] + head * math.sin(a)), rng, jitter / 3, thickness)
+
+def _edge_pairs(nodes: int, edges: int, rng: random.Random) -> List[Tuple[int, int]]:
+    """A chain through all nodes first (so the chart is connected), then random forward edges."""
+    pairs = [(i, i + 1) for i in range(min(nodes - 1, edges))]
+    candidates = [(a, b) for a in range(nodes) for b in range(a + 2, nodes)]
+    rng.shuffle(candidates)
+    return pairs + candidates[:max(0, edges - len(pairs))]
+
+def generate_flowchart(
+    nodes: int = 8,
+    edges: int = None,
+    width: int = 1600,
+    height: int = 1200,
+    noise: float = 0.3,
+    seed: int = 0,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Draws a top-down flowchart and returns (BGR image, ground truth).
+    `noise` (0..1) scales stroke wobble, uneven lighting and sensor noise.
+    """
+    rng = random.Random(seed)
+    edges = nodes - 1 if edges is None else edges
+    scale = min(width, height) / 1000
+    thickness = max(1, round(2 * scale))
+    jitter = (1 + 5 * noise) * scale
+
+    cols = max(1, round(math.sqrt(nodes * width / height / 2)))
+    rows = math.ceil(nodes / cols)
+    cell_w, cell_h = width / cols, height / rows
+    box_w, box_h = int(cell_w * 0.6), int(cell_h * 0.45)
+
+    labels = rng.sample(LABELS[2:], len(LABELS) - 2)
+    canvas = np.full((height, width), 255, np.uint8)
+    truth_nodes, boxes = [], []
+    for i in range(nodes):
+        row, col = divmod(i, cols)
+        box = (
+            int(col * cell_w + (cell_w - box_w) / 2 + rng.uniform(-0.1, 0.1) * box_w),
+            int(row * cell_h + (cell_h - box_h) / 2 + rng.uniform(-0.1, 0.1) * box_h),
+            box_w,
+            box_h,
+        )
+        shape = "circle" if i in (0, nodes - 1) else rng.choice(SHAPES)
+        label = "Start" if i == 0 else "End" if i == nodes - 1 else labels[(i - 1) % len(labels)]
+        _draw_shape(canvas, shape, box, rng, jitter, thickness)
+        _draw_label(canvas, label, box, thickness, fill=0.45 if shape == "diamond" else 0.65)
+        boxes.append(box)
+        truth_nodes.append({"id": f"N{i + 1}", "label": label, "shape": shape, "bbox": list(box)})
+
+    truth_edges = []
+    for a, b in _edge_pairs(nodes, edges, rng):
+        (ax, ay, aw, ah), (bx, by, bw, bh) = boxes[a], boxes[b]
+        start, end = (ax + aw / 2, ay + ah), (bx + bw / 2, by)
+        if by <= ay:
+            # Same row: connect the sides instead
+            start, end = (ax + aw, ay + ah / 2), (bx, by + bh / 2)
+        _draw_arrow(canvas, start, end, rng, jitter, thickness, head=18 * scale)
+        truth_edges.append({"from": f"N{a + 1}", "to": f"N{b + 1}", "type": "arrow", "label": ""})
+
+    # Paper: uneven lighting, sensor noise and a little blur, as in a phone photo
+    image = canvas.astype(np.float32)
+    if noise > 0:
+        gradient = np.linspace(1.0, 1.0 - 0.35 * noise, width, dtype=np.float32)[None, :]
+        image = image * gradient
+        image += np.random.default_rng(seed).normal(0, 25 * noise, image.shape).astype(np.float32)
+        image = cv2.GaussianBlur(image, (3, 3), 0)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+
+    truth = {"diagram_type": "flowchart", "nodes": truth_nodes, "edges": truth_edges}
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR), truth
+
+def parse_size(value: str) -> Tuple[int, int]:
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--edges", type=int, default=None)
+    parser.add_argument("--size", default="1600x1200", help="WIDTHxHEIGHT")
+    parser.add_argument("--noise", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="synthetic.png")
+    args = parser.parse_args()
+
+    width, height = parse_size(args.size)
+    image, truth = generate_flowchart(args.nodes, args.edges, width, height, args.noise, args.seed)
+    cv2.imwrite(args.output, image)
+    json.dump(truth, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Lets `python -m pytest tests` import the backend package from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Needs the API running on localhost:8000; run it directly with `python tests/integration_test.py`
+collect_ignore = ["integration_test.py"]
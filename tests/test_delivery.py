@@ -0,0 +1,95 @@
+import gzip
+import os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from backend.app.core.config import settings
+from backend.app.services import delivery
+
+TEXT = "flowchart TD\n" + "".join(f"    n{i}[Step {i}] --> n{i + 1}[Step {i + 1}]\n" for i in range(200))
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "diagram.mmd"
+    path.write_text(TEXT)
+    return str(path)
+
+@pytest.fixture
+def client(artifact):
+    app = FastAPI()
+
+    @app.get("/mermaid")
+    async def mermaid(request: Request):
+        return await delivery.file_response(request, artifact, "text/plain", None, "mermaid", compressible=True)
+
+    return TestClient(app)
+
+def get(client, accept_encoding="identity", **headers):
+    return client.get("/mermaid", headers={"accept-encoding": accept_encoding, **headers})
+
+def test_etag_is_content_hash(artifact, client):
+    response = get(client)
+    assert response.status_code == 200
+    assert response.text == TEXT
+    assert response.headers["etag"] == delivery.etag(artifact)
+    assert delivery.version(artifact) == delivery.etag(artifact).strip('"')
+
+def test_if_none_match_returns_304(client):
+    tag = get(client).headers["etag"]
+    for if_none_match in (tag, f"W/{tag}", f'"other", {tag}', "*"):
+        response = get(client, **{"if-none-match": if_none_match})
+        assert response.status_code == 304, if_none_match
+        assert response.headers["etag"] == tag
+        assert response.content == b""
+    assert get(client, **{"if-none-match": '"other"'}).status_code == 200
+
+def test_etag_changes_with_content(artifact, client):
+    tag = get(client).headers["etag"]
+    with open(artifact, "a") as f:
+        f.write("    n0 --> n200\n")
+    os.utime(artifact, ns=(0, os.stat(artifact).st_mtime_ns + 10 ** 9))
+    response = get(client, **{"if-none-match": tag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != tag
+
+def test_serves_precompressed_variant(artifact, client):
+    delivery.precompress(artifact)
+    identity_tag = get(client).headers["etag"]
+
+    response = get(client, "gzip, deflate")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == f'{identity_tag[:-1]}-gzip"'
+    assert response.text == TEXT # Decoded by the client
+    with open(artifact + ".gz", "rb") as f:
+        assert gzip.decompress(f.read()).decode() == TEXT
+
+def test_negotiation_follows_q_values(artifact, client):
+    delivery.precompress(artifact)
+    if delivery.brotli is not None:
+        assert get(client, "gzip, br").headers["content-encoding"] == "br"
+        assert get(client, "br;q=0.5, gzip").headers["content-encoding"] == "gzip"
+    # "*" covers br but not gzip, which was turned down explicitly
+    assert get(client, "gzip;q=0, *;q=0.1").headers.get("content-encoding") == ("br" if delivery.brotli else None)
+    assert "content-encoding" not in get(client, "deflate").headers
+    assert "content-encoding" not in get(client, "gzip;q=0").headers
+
+def test_stale_variant_is_not_served(artifact, client):
+    delivery.precompress(artifact)
+    assert delivery.precompressed(artifact)
+    os.utime(artifact, ns=(0, os.stat(artifact).st_mtime_ns + 10 ** 9))
+    assert not delivery.precompressed(artifact)
+    assert "content-encoding" not in get(client, "gzip, br").headers
+
+def test_304_per_encoding(artifact, client):
+    delivery.precompress(artifact)
+    gzip_tag = get(client, "gzip").headers["etag"]
+    assert get(client, "gzip", **{"if-none-match": gzip_tag}).status_code == 304
+    # The identity body has a different ETag, so a cached gzip copy doesn't validate it
+    assert get(client, **{"if-none-match": gzip_tag}).status_code == 200
+
+def test_versioned_urls_are_immutable(artifact, client):
+    current = delivery.version(artifact)
+    assert client.get(f"/mermaid?v={current}").headers["cache-control"] == settings.RESULTS_VERSIONED_CACHE_CONTROL
+    assert client.get("/mermaid?v=stale").headers["cache-control"] == settings.RESULTS_CACHE_CONTROL
+    assert client.get("/mermaid").headers["cache-control"] == settings.RESULTS_CACHE_CONTROL
@@ -0,0 +1,78 @@
+import pytest
+from backend.app.services.jobs.base import QUEUED, RUNNING, DONE, FAILED
+from backend.app.services.jobs.sqlite import SQLiteJobQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / "jobs.db"), max_attempts=2)
+
+def test_claim_leases_oldest_job(queue):
+    queue.enqueue("a")
+    queue.enqueue("b")
+    job = queue.claim("w1", 60)
+    assert job.job_id == "a"
+    assert job.state == RUNNING
+    assert job.lease_owner == "w1"
+    assert job.attempts == 1
+    assert queue.claim("w2", 60).job_id == "b"
+    assert queue.claim("w3", 60) is None
+
+def test_only_lease_owner_can_complete(queue):
+    queue.enqueue("a")
+    queue.claim("w1", 60)
+    assert not queue.complete("a", "completed", worker_id="w2")
+    assert queue.get("a").state == RUNNING
+    assert queue.complete("a", "completed", worker_id="w1")
+    job = queue.get("a")
+    assert (job.state, job.status, job.lease_owner) == (DONE, "completed", None)
+
+def test_only_lease_owner_can_release_or_set_status(queue):
+    queue.enqueue("a")
+    queue.claim("w1", 60)
+    assert not queue.release("a", "boom", worker_id="w2")
+    assert not queue.set_status("a", "ocr", worker_id="w2")
+    assert not queue.heartbeat("a", "w2", 60)
+    assert queue.get("a").status == "processing"
+    assert queue.set_status("a", "ocr", worker_id="w1")
+    assert queue.release("a", "boom", worker_id="w1")
+    assert queue.get("a").state == QUEUED
+
+def test_release_fails_job_after_last_attempt(queue):
+    queue.enqueue("a")
+    for _ in range(2):
+        queue.claim("w1", 60)
+        queue.release("a", "boom", worker_id="w1")
+    job = queue.get("a")
+    assert (job.state, job.status) == (FAILED, "failed: boom")
+
+def test_expired_lease_is_taken_over(queue):
+    queue.enqueue("a")
+    queue.claim("w1", -1) # Lease already expired
+    job = queue.claim("w2", 60)
+    assert (job.job_id, job.lease_owner, job.attempts) == ("a", "w2", 2)
+    # The first worker's late result is dropped
+    assert not queue.complete("a", "completed", worker_id="w1")
+    assert queue.complete("a", "completed", worker_id="w2")
+
+def test_abandoned_job_fails_after_last_attempt(queue):
+    queue.enqueue("a")
+    queue.claim("w1", -1)
+    queue.claim("w2", -1)
+    assert queue.claim("w3", 60) is None
+    job = queue.get("a")
+    assert (job.state, job.status) == (FAILED, "failed: worker stopped responding")
+
+def test_claim_caps_running_jobs_per_batch(queue):
+    for job_id in ("b1", "b2", "b3"):
+        queue.enqueue(job_id, payload={"parallelism": 2}, batch_id="batch")
+    queue.enqueue("solo")
+    claimed = [queue.claim("w", 60).job_id for _ in range(3)]
+    assert claimed == ["b1", "b2", "solo"]
+    assert queue.claim("w", 60) is None
+    queue.complete("b1", "completed", worker_id="w")
+    assert queue.claim("w", 60).job_id == "b3"
+
+def test_batch_without_parallelism_is_not_capped(queue):
+    for job_id in ("b1", "b2", "b3"):
+        queue.enqueue(job_id, batch_id="batch")
+    assert [queue.claim("w", 60).job_id for _ in range(3)] == ["b1", "b2", "b3"]
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from backend.app.services.ocr import merge_tiles, plan_tiles
+
+def quad(x1, y1, x2, y2):
+    return [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+
+def detection(text, x1, y1, x2, y2, confidence=0.9):
+    return {"text": text, "bbox": quad(x1, y1, x2, y2), "confidence": confidence}
+
+def test_plan_tiles_cover_image_with_overlap():
+    width, height, size, overlap = 2500, 1100, 1000, 100
+    tiles = plan_tiles(width, height, size, overlap)
+    xs = sorted({x for x, _, _, _ in tiles})
+    ys = sorted({y for _, y, _, _ in tiles})
+    assert len(tiles) == len(xs) * len(ys)
+    assert xs[0] == 0 and xs[-1] + size == width
+    assert ys[0] == 0 and ys[-1] + size == height
+    assert all(b - a <= size - overlap for a, b in zip(xs, xs[1:]))
+    assert all(b - a <= size - overlap for a, b in zip(ys, ys[1:]))
+
+def test_plan_tiles_small_image_is_one_tile():
+    assert plan_tiles(300, 200, 1000, 100) == [(0, 0, 300, 200)]
+
+def test_plan_tiles_rejects_overlap_as_large_as_tile():
+    with pytest.raises(ValueError):
+        plan_tiles(3000, 3000, 100, 100)
+
+def test_merge_moves_detections_to_image_coordinates():
+    tiles = [(0, 0, 100, 100), (80, 0, 100, 100)]
+    results = [[detection("left", 10, 10, 40, 20)], [detection("right", 50, 10, 90, 20)]]
+    merged = merge_tiles(tiles, results, 180, 100)
+    assert [r["text"] for r in merged] == ["left", "right"]
+    assert merged[1]["bbox"] == quad(130, 10, 170, 20)
+
+def test_merge_keeps_one_copy_of_text_read_twice():
+    # "both" lies in the overlap (x 60-100) and is read whole by each tile
+    tiles = [(0, 0, 100, 100), (60, 0, 100, 100)]
+    results = [
+        [detection("both", 70, 40, 90, 50, 0.6)],
+        [detection("BOTH", 10, 40, 30, 50, 0.9)],
+    ]
+    merged = merge_tiles(tiles, results, 160, 100)
+    assert [r["text"] for r in merged] == ["BOTH"]
+
+def test_merge_prefers_whole_copy_over_cut_one():
+    # The left tile cuts the word at its right side; the right tile sees it whole
+    tiles = [(0, 0, 100, 100), (60, 0, 100, 100)]
+    results = [
+        [detection("overl", 70, 40, 100, 50, 0.99)],
+        [detection("overlap", 10, 40, 50, 50, 0.7)],
+    ]
+    merged = merge_tiles(tiles, results, 160, 100)
+    assert [r["text"] for r in merged] == ["overlap"]
+
+def test_merge_keeps_distinct_text_in_overlap():
+    tiles = [(0, 0, 100, 100), (60, 0, 100, 100)]
+    results = [
+        [detection("top", 65, 10, 90, 20), detection("bottom", 65, 70, 90, 80)],
+        [detection("top", 5, 10, 30, 20)],
+    ]
+    merged = merge_tiles(tiles, results, 160, 100)
+    assert sorted(r["text"] for r in merged) == ["bottom", "top"]
+
+def test_merge_grid_of_tiles_matches_untiled_reading():
+    # Words on a grid, each reported by every tile holding it whole
+    width = height = 1000
+    tiles = plan_tiles(width, height, 400, 120)
+    rng = np.random.default_rng(0)
+    words = [(x, y) for x in range(20, 960, 70) for y in range(20, 970, 45)]
+    results = []
+    for tx, ty, tw, th in tiles:
+        results.append([
+            detection(f"{x},{y}", x - tx, y - ty, x - tx + 30, y - ty + 12, float(rng.uniform(0.5, 1)))
+            for x, y in words
+            if tx <= x and x + 30 <= tx + tw and ty <= y and y + 12 <= ty + th
+        ])
+    merged = merge_tiles(tiles, results, width, height)
+    assert sorted(r["text"] for r in merged) == sorted(f"{x},{y}" for x, y in words)
+
+def test_merge_empty_tiles():
+    assert merge_tiles([(0, 0, 100, 100)], [[]], 100, 100) == []
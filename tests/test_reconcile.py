@@ -0,0 +1,88 @@
+import numpy as np
+from backend.app.services import reconcile
+from backend.app.services.inference import Edge, InferenceEngine, Node
+
+def random_boxes(rng, n, extent=1000, max_side=120):
+    corners = rng.uniform(0, extent, (n, 2))
+    sides = rng.uniform(5, max_side, (n, 2))
+    return np.concatenate([corners, corners + sides], axis=1).astype(np.float32)
+
+def test_grid_candidates_include_every_box_holding_the_point():
+    rng = np.random.default_rng(1)
+    boxes = random_boxes(rng, 300)
+    points = rng.uniform(-50, 1150, (500, 2)).astype(np.float32)
+    p, b = reconcile.GridIndex(boxes, 60).candidates(points)
+    found = set(zip(p.tolist(), b.tolist()))
+    inside = (
+        (points[:, None, 0] >= boxes[None, :, 0]) & (points[:, None, 0] <= boxes[None, :, 2])
+        & (points[:, None, 1] >= boxes[None, :, 1]) & (points[:, None, 1] <= boxes[None, :, 3])
+    )
+    expected = set(zip(*(axis.tolist() for axis in np.nonzero(inside))))
+    assert expected <= found
+
+def test_grid_caps_cell_count_for_tiny_cells():
+    boxes = np.array([[0, 0, 1, 1], [1e6, 1e6, 1e6 + 1, 1e6 + 1]], np.float32)
+    index = reconcile.GridIndex(boxes, 1)
+    assert index.cols * index.rows <= 2 * reconcile._MAX_CELLS
+    p, b = index.candidates(boxes[:, :2])
+    assert set(zip(p.tolist(), b.tolist())) >= {(0, 0), (1, 1)}
+
+def brute_force_match(text_boxes, node_boxes, min_containment):
+    result = []
+    for t in text_boxes:
+        best, best_iou = -1, -1.0
+        text_area = max((t[2] - t[0]) * (t[3] - t[1]), 1e-6)
+        center = (t[:2] + t[2:]) / 2
+        for k, n in enumerate(node_boxes):
+            if not (n[0] <= center[0] <= n[2] and n[1] <= center[1] <= n[3]):
+                continue
+            inter = max(min(t[2], n[2]) - max(t[0], n[0]), 0) * max(min(t[3], n[3]) - max(t[1], n[1]), 0)
+            iou = inter / max(text_area + (n[2] - n[0]) * (n[3] - n[1]) - inter, 1e-6)
+            if inter >= min_containment * text_area and iou > best_iou:
+                best, best_iou = k, iou
+        result.append(best)
+    return result
+
+def test_match_boxes_matches_brute_force():
+    rng = np.random.default_rng(2)
+    node_boxes = random_boxes(rng, 80, max_side=200)
+    text_boxes = random_boxes(rng, 400, max_side=40)
+    assignment = reconcile.match_boxes(text_boxes, node_boxes, 0.6)
+    assert assignment.tolist() == brute_force_match(text_boxes, node_boxes, 0.6)
+
+def test_match_boxes_prefers_tightest_node():
+    node_boxes = np.array([[0, 0, 400, 400], [100, 100, 200, 160]], np.float32)
+    text_boxes = np.array([[120, 120, 180, 140], [300, 300, 350, 320], [500, 500, 520, 510]], np.float32)
+    assert reconcile.match_boxes(text_boxes, node_boxes, 0.6).tolist() == [1, 0, -1]
+
+def test_nearest_segments_matches_brute_force():
+    rng = np.random.default_rng(3)
+    segments = rng.uniform(0, 1000, (60, 4)).astype(np.float32)
+    points = rng.uniform(0, 1000, (300, 2)).astype(np.float32)
+    max_distance = np.full(len(points), 25.0)
+    nearest = reconcile.nearest_segments(points, segments, max_distance)
+
+    start, direction = segments[:, :2], segments[:, 2:] - segments[:, :2]
+    for point, found in zip(points, nearest.tolist()):
+        along = np.clip(((point - start) * direction).sum(axis=1) / (direction ** 2).sum(axis=1), 0, 1)
+        distance = np.hypot(*(point - start - along[:, None] * direction).T)
+        expected = int(distance.argmin()) if distance.min() <= 25 else -1
+        assert found == expected
+
+def test_reconcile_fills_generic_labels_and_labels_edges():
+    nodes = [
+        Node(id="a", label="?", bbox=[0, 0, 200, 80]),
+        Node(id="b", label="Finish", bbox=[0, 400, 200, 80]),
+    ]
+    edges = [Edge(source="a", target="b")]
+    ocr = [
+        {"text": "Check", "bbox": [[20, 20], [90, 20], [90, 50], [20, 50]], "confidence": 0.9},
+        {"text": "input", "bbox": [[100, 20], [170, 20], [170, 50], [100, 50]], "confidence": 0.9},
+        {"text": "yes", "bbox": [[110, 250], [150, 250], [150, 270], [110, 270]], "confidence": 0.9},
+        {"text": "noise", "bbox": [[600, 600], [650, 600], [650, 620], [600, 620]], "confidence": 0.1},
+    ]
+    changes = InferenceEngine().reconcile_ocr(nodes, edges, ocr)
+    assert nodes[0].label == "Check input"
+    assert nodes[1].label == "Finish"
+    assert edges[0].label == "yes"
+    assert changes == {"labels_filled": 1, "labels_corrected": 0, "edge_labels": 1}
@@ -0,0 +1,90 @@
+import json
+from backend.app.services.inference import InferenceEngine
+from backend.app.services.vision.stream import StreamingJsonParser
+
+RESPONSE = {
+    "diagram_type": "flowchart",
+    "nodes": [
+        {"id": "A", "label": "Start {here}", "shape": "oval", "bbox": [0, 0, 10, 10]},
+        {"id": "B", "label": "Say \"hi\", then [wait]", "shape": "rectangle"},
+    ],
+    "edges": [{"from": "A", "to": "B", "label": "}"}],
+}
+
+def parse(chunks):
+    items = []
+    parser = StreamingJsonParser(lambda kind, item: items.append((kind, item)))
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser, items
+
+def expected_items():
+    return [("node", node) for node in RESPONSE["nodes"]] + [("edge", edge) for edge in RESPONSE["edges"]]
+
+def test_reports_items_from_whole_response():
+    parser, items = parse([json.dumps(RESPONSE)])
+    assert items == expected_items()
+    assert parser.counts == {"node": 2, "edge": 1}
+    assert parser.done
+
+def test_tokens_split_across_every_chunk_boundary():
+    text = json.dumps(RESPONSE)
+    for size in (1, 2, 3, 7):
+        parser, items = parse([text[i:i + size] for i in range(0, len(text), size)])
+        assert items == expected_items(), size
+        assert parser.text == text
+
+def test_item_reported_as_soon_as_it_closes():
+    text = json.dumps(RESPONSE)
+    first_node_end = text.index("]}") + 2 # After the bbox; the label has a brace too
+    parser, items = parse([text[:first_node_end]])
+    assert items == [("node", RESPONSE["nodes"][0])]
+    assert not parser.done
+
+def test_escaped_quotes_and_brackets_inside_strings():
+    text = '{"nodes": [{"id": "x", "label": "a \\"}\\" ]b"}], "edges": []}'
+    _, items = parse([text[:22], text[22:]])
+    assert items == [("node", {"id": "x", "label": 'a "}" ]b'})]
+
+def test_skips_fences_and_trailing_text():
+    text = "```json\n" + json.dumps(RESPONSE) + "\n```\n{\"nodes\": [{\"id\": \"Z\"}]}"
+    parser, items = parse([text])
+    assert items == expected_items()
+    assert parser.done
+
+def test_nested_objects_are_part_of_their_item():
+    text = '{"nodes": [{"id": "A", "style": {"fill": "red"}}], "meta": {"nodes": [{"id": "no"}]}}'
+    _, items = parse([text])
+    assert items == [("node", {"id": "A", "style": {"fill": "red"}})]
+
+def test_unparseable_item_is_skipped():
+    text = '{"nodes": [{"id": "A", "label": nope}, {"id": "B"}], "edges": []}'
+    parser, items = parse([text])
+    assert items == [("node", {"id": "B"})]
+    assert parser.counts["node"] == 1
+
+def test_reset_on_retry_rebuilds_from_the_new_attempt():
+    # Mirrors the vision providers: a retried stream reports "reset" and starts a fresh parser
+    engine = InferenceEngine()
+
+    def on_item(kind, item):
+        if kind == "reset":
+            engine.reset()
+        elif kind == "node":
+            engine.add_node(item)
+        else:
+            engine.add_edge(item)
+
+    text = json.dumps(RESPONSE)
+    failed = StreamingJsonParser(on_item)
+    failed.feed(text[:text.index('"edges"')]) # Both nodes reported, then the stream broke
+    assert engine.raw_node_count == 2
+
+    on_item("reset", {})
+    retry = StreamingJsonParser(on_item)
+    retry.feed(text)
+
+    assert engine.fed_all(RESPONSE)
+    diagram = engine.finish([], RESPONSE["diagram_type"])
+    assert [node.label for node in diagram.nodes] == [node["label"] for node in RESPONSE["nodes"]]
+    assert len(diagram.edges) == 1